@@ -1,10 +1,6 @@
 
-# Try importing 'ptt' first. If that fails then try 'gplately.ptt' (GPlately now contains PlateTectonicTools).
-try:
-    from ptt.utils.call_system_command import call_system_command
-except ImportError:
-    from gplately.ptt.utils.call_system_command import call_system_command
 import os, sys
+from time import time_ns
 
 from datetime import datetime
 import yaml
@@ -94,6 +90,33 @@ try:
     use_continent_contouring_workflow = PARAMS["SedimentThicknessWorfkowParameters"]["use_continent_contouring_workflow"]
     max_topological_reconstruction_time = PARAMS["SedimentThicknessWorfkowParameters"]["max_topological_reconstruction_time"]
     clamp_mean_proximity_kms = PARAMS["SedimentThicknessWorfkowParameters"]["clamp_mean_proximity_kms"]
+    # optional (defaults to not simplifying)
+    simplify_geometries = PARAMS["SedimentThicknessWorfkowParameters"].get("simplify_geometries", "False")
+    # optional (defaults to not bounding the distance search)
+    bound_distance_search_by_clamp = PARAMS["SedimentThicknessWorfkowParameters"].get("bound_distance_search_by_clamp", "False")
+    # optional (defaults to each task reconstructing its own features)
+    cache_reconstruction_snapshots = PARAMS["SedimentThicknessWorfkowParameters"].get("cache_reconstruction_snapshots", "False")
+    # optional (defaults to not splitting ocean points into spatial shards)
+    num_spatial_shards = PARAMS["SedimentThicknessWorfkowParameters"].get("num_spatial_shards", 1)
+    # optional (defaults to loading the plate model in this process)
+    plate_model_daemon_socket = PARAMS["SedimentThicknessWorfkowParameters"].get("plate_model_daemon_socket", None)
+    # optional (defaults to only the distances to the sediment thickness proximity features)
+    additional_proximity_targets = PARAMS["SedimentThicknessWorfkowParameters"].get("additional_proximity_targets", None)
+    # optional (defaults to not writing the mean distance statistics)
+    output_proximity_statistics = PARAMS["SedimentThicknessWorfkowParameters"].get("output_proximity_statistics", "False")
+    # optional (defaults to only the mean distance grids)
+    output_distance_percentiles = PARAMS["SedimentThicknessWorfkowParameters"].get("output_distance_percentiles", None)
+    # optional (defaults to 64-bit distance statistics and 32-bit float distance grids)
+    reduced_precision = PARAMS["SedimentThicknessWorfkowParameters"].get("reduced_precision", "False")
+    # optional (defaults to running part 2 separately after this script has finished)
+    overlap_sedimentation_prediction = PARAMS["SedimentThicknessWorfkowParameters"].get("overlap_sedimentation_prediction", "False")
+    # optional (defaults to predicting sedimentation from the mean distance grids in part 2)
+    fuse_sedimentation_prediction = PARAMS["SedimentThicknessWorfkowParameters"].get("fuse_sedimentation_prediction", "False")
+    # optional (defaults to only writing the mean distance grids when they're needed by part 2)
+    write_mean_distance_grids = PARAMS["SedimentThicknessWorfkowParameters"].get("write_mean_distance_grids", "False")
+    # these are only used by part 2 (unless 'fuse_sedimentation_prediction' is set)
+    generate_sediment_thickness_grids = PARAMS["SedimentThicknessWorfkowParameters"].get("generate_sediment_thickness_grids", "True")
+    generate_sedimentation_rate_grids = PARAMS["SedimentThicknessWorfkowParameters"].get("generate_sedimentation_rate_grids", "True")
 
 except IndexError:
     print('*** No yaml file given. Make sure you specify it ***')
@@ -228,84 +251,154 @@ max_topological_reconstruction_time = max_topological_reconstruction_time  # can
 # Optionally clamp mean distances to this value (in kms).
 #clamp_mean_proximity_kms = None
 clamp_mean_proximity_kms = clamp_mean_proximity_kms
-# ------------------------------------------
-# END parameters
-# ------------------------------------------
 
-if not os.path.exists(output_dir):
-    print('{} does not exist, creating now... '.format(output_dir))
-    os.makedirs(output_dir, exist_ok=True)
+# Optionally simplify the (reconstructed) continent obstacles and proximity features to the resolution of the
+# internal shortest path grid (about 1.4 degrees) used to calculate distances around the continent obstacles.
+# This speeds up distance calculations for highly detailed obstacles (eg, coastlines, contoured continents).
+if str(simplify_geometries).lower() in ['true', '1', 't', 'y', 'yes']:
+    simplify_geometries = True
+else:
+    simplify_geometries = False
 
-# ----- 
-def generate_distance_grids(times):
-    
-    # Calling the ocean basin proximity script.
-    command_line = [sys.executable, 'ocean_basin_proximity.py']
-
-    # Rotation files.
-    command_line.append('-r')
-    command_line.extend('{}'.format(rotation_filename) for rotation_filename in rotation_filenames)
-
-    # Proximity files.
-    command_line.append('-m')
-    command_line.extend('{}'.format(proximity_features_file) for proximity_features_file in proximity_features_files)
-    # Proximity features are non-topological.
-    command_line.append('-n')
-
-    # If using continent obstacles.
-    if continent_obstacle_files:
-        command_line.append('--continent_obstacle_filenames')
-        command_line.extend('{}'.format(continent_obstacle_file) for continent_obstacle_file in continent_obstacle_files)
-        # Plate boundary obstacles (feature types).
-        # Can only be specified if "--continent_obstacle_filenames" is also specified.
-        command_line.append('--plate_boundary_obstacle_feature_types')
-        command_line.extend('{}'.format(plate_boundary_obstacle) for plate_boundary_obstacle in plate_boundary_obstacles)
-    
-    # Topological files.
-    command_line.append('-s')
-    command_line.extend('{}'.format(topology_filename) for topology_filename in topology_filenames)
+# Optionally only search distances up to where the clamped mean distance of each ocean point is guaranteed to be
+# 'clamp_mean_proximity_kms' (further distances don't change the clamped mean distances, so they're not calculated).
+# This is ignored if 'clamp_mean_proximity_kms' is not specified.
+if str(bound_distance_search_by_clamp).lower() in ['true', '1', 't', 'y', 'yes']:
+    bound_distance_search_by_clamp = True
+else:
+    bound_distance_search_by_clamp = False
 
-    # Anchor plate ID.
-    command_line.extend(['--anchor', '{}'.format(anchor_plate_id)])
+# Optionally reconstruct the proximity features and continent obstacles once per time (and share them with all tasks),
+# rather than each task (group of age grids) reconstructing them at all its times. This uses temporary disk space.
+if str(cache_reconstruction_snapshots).lower() in ['true', '1', 't', 'y', 'yes']:
+    cache_reconstruction_snapshots = True
+else:
+    cache_reconstruction_snapshots = False
 
-    # Age grid filenames format.
-    command_line.extend(['--age_grid_filenames_format', age_grid_filenames_format])
-    # Age grid paleo times.
-    command_line.append('--age_grid_paleo_times')
-    command_line.extend(['{}'.format(time) for time in times])
+# Optionally split the ocean points into this many spatial shards (latitude bands) processed by separate CPUs.
+# This helps when there are fewer times (age grids) than CPUs (eg, only generating present day).
+num_spatial_shards = int(num_spatial_shards) if num_spatial_shards else 1
 
-    # Use all feature types in proximity file (according to Dietmar)...
-    #command_line.extend(['-b', 'PassiveContinentalBoundary'])
+# Only generate ocean points (and output distance grids) inside the 'GridParameters' lon/lat region.
+# The ocean points are still reconstructed globally (with distances to all passive margins, including those outside the region).
+# If the region is global then it's not used (the grids are global).
+if (float(lon_min), float(lon_max), float(lat_min), float(lat_max)) == (-180.0, 180.0, -90.0, 90.0):
+    region = None
+else:
+    region = (float(lon_min), float(lon_max), float(lat_min), float(lat_max))
+
+# Optionally submit the distance grid generation to a plate model daemon (see 'plate_model_daemon.py') listening on this Unix socket.
+# The daemon keeps the plate model (rotations, features, shortest path grid) loaded between runs, so repeated runs skip loading it.
+# Set to 'True' to use the daemon's default socket. The daemon must be started separately (eg, "python plate_model_daemon.py start").
+if str(plate_model_daemon_socket).lower() in ['', 'none', 'false', '0', 'f', 'n', 'no']:
+    plate_model_daemon_socket = None
+elif str(plate_model_daemon_socket).lower() in ['true', '1', 't', 'y', 'yes']:
+    plate_model_daemon_socket = True
+
+# Optionally also generate distance grids to other named (non-topological) proximity features, eg, {'river_mouths': 'river_mouths.gpmlz'},
+# in the same pass (the ocean points are reconstructed once for all of them). Their grids are prefixed by their name (eg, "river_mouths_mean_distance_...").
+# Each name maps to a proximity file or a list of proximity files.
+if additional_proximity_targets:
+    additional_proximity_targets = {
+            target_name : [target_filenames] if isinstance(target_filenames, str) else list(target_filenames)
+            for target_name, target_filenames in additional_proximity_targets.items()}
+else:
+    additional_proximity_targets = None
 
-    # Time increment is 1 Myr (this is for topological reconstruction of the ocean points).
-    command_line.extend(['--time_increment', '1'])
-    
-    # If limiting the max topological reconstruction time.
-    if max_topological_reconstruction_time is not None:
-        command_line.extend(['-x', '{}'.format(max_topological_reconstruction_time)])
-    
-    # Internal grid spacing (for internal distance calculations).
-    command_line.extend(['--ocean_basin_grid_spacing', '{}'.format(internal_grid_spacing)])
-    
-    # Grid spacing (for final output mean distance grids).
-    command_line.extend(['--upscale_mean_std_dev_grid_spacing', '{}'.format(grid_spacing)])
+# Optionally also write the distance statistics (number, sum and sum-of-squares of distances) of each time, so the mean distance grids
+# can later be regenerated (eg, with a different 'clamp_mean_proximity_kms' or 'grid_spacing') with 'regenerate_proximity_grids.py'.
+if str(output_proximity_statistics).lower() in ['true', '1', 't', 'y', 'yes']:
+    output_proximity_statistics = True
+else:
+    output_proximity_statistics = False
+
+# Optionally also generate percentile distance grids, eg, [10, 50, 90] for "p10_distance_...", "median_distance_..." and "p90_distance_..." grids.
+# Each ocean point accumulates a fixed-size sketch of its distances over time (so memory doesn't grow with the number of times).
+if output_distance_percentiles:
+    output_distance_percentiles = [float(percentile) for percentile in output_distance_percentiles]
+else:
+    output_distance_percentiles = None
+
+# Optionally accumulate the distance statistics in reduced (32-bit) precision and write 16-bit integer (km) distance grids.
+# This uses less memory (so more times are processed per task) and disk space. The error against 64-bit is printed for each time.
+if str(reduced_precision).lower() in ['true', '1', 't', 'y', 'yes']:
+    reduced_precision = True
+else:
+    reduced_precision = False
 
-    # Optionally clamp mean proximity.
-    if clamp_mean_proximity_kms:
-        command_line.extend(['--clamp_mean_distance', str(clamp_mean_proximity_kms)])
+# Optionally also run part 2 ('02_generate_predicted_sedimentation_grids.py') at the same time, so that it predicts the sedimentation
+# of each time as soon as its mean distance grid has been written (rather than waiting for all distance grids).
+if str(overlap_sedimentation_prediction).lower() in ['true', '1', 't', 'y', 'yes']:
+    overlap_sedimentation_prediction = True
+else:
+    overlap_sedimentation_prediction = False
 
-    # Don't output distance grids for all reconstruction times.
-    # Only outputting a single "mean" (over all reconstruction times) distance grid.
-    #command_line.append('--output_distance_with_time')
+# Optionally predict the sediment thickness and/or rate grids (of part 2) directly from the mean distances in memory, instead of
+# writing mean distance grids and having part 2 read them back. Part 2 then doesn't need to be run.
+# The mean distance grids are then only written if 'write_mean_distance_grids' is also set.
+if str(fuse_sedimentation_prediction).lower() in ['true', '1', 't', 'y', 'yes']:
+    fuse_sedimentation_prediction = True
+else:
+    fuse_sedimentation_prediction = False
+if str(write_mean_distance_grids).lower() in ['true', '1', 't', 'y', 'yes']:
+    write_mean_distance_grids = True
+else:
+    write_mean_distance_grids = False
+
+sediment_predictions = None
+if fuse_sedimentation_prediction:
+    # Use the same trained relationships, and output filenames, as part 2.
+    import sediment_prediction
+    sediment_output_dir = os.path.join(os.path.dirname(output_dir), 'sedimentation_output')
+    sediment_predictions = []
+    if str(generate_sedimentation_rate_grids).lower() in ['true', '1', 't', 'y', 'yes']:
+        sediment_predictions.append((
+                sediment_prediction.SEDIMENTATION_RATE_MODEL,
+                os.path.join(sediment_output_dir, 'predicted_rate', 'sed_rate_{:.1f}d'.format(grid_spacing))))
+    if str(generate_sediment_thickness_grids).lower() in ['true', '1', 't', 'y', 'yes']:
+        sediment_predictions.append((
+                sediment_prediction.SEDIMENT_THICKNESS_MODEL,
+                os.path.join(sediment_output_dir, 'predicted_thickness', 'sed_thick_{:.1f}d'.format(grid_spacing))))
+    for _, sediment_output_filename_prefix in sediment_predictions:
+        os.makedirs(os.path.dirname(sediment_output_filename_prefix), exist_ok=True)
+    
+    # Part 2 is not needed (the sediment grids are generated here).
+    overlap_sedimentation_prediction = False
+else:
+    # Part 2 reads the mean distance grids.
+    write_mean_distance_grids = True
+
+# File written when this script starts generating distance grids. It contains a token identifying the run, and its modification time
+# is when the run started (so part 2 ignores distance grids left over from previous runs, which are older).
+# Note: This must match the filename that part 2 reads.
+distance_grids_run_token_filename = os.path.join(output_dir, 'distance_grids_run_token')
+# File written when all distance grids have been generated (so part 2 knows to stop waiting for distance grids).
+# It contains the token of the run that completed.
+# Note: This must match the filename that part 2 waits for.
+distance_grids_completed_filename = os.path.join(output_dir, 'distance_grids_completed')
+
+
+def write_distance_grids_run_token(filename, run_token):
+    """Write the run token to the specified file (atomically, so part 2 never reads a partially written token)."""
+
+    temporary_filename = '{}.{}.tmp'.format(filename, os.getpid())
+    with open(temporary_filename, 'w') as temporary_file:
+        temporary_file.write(run_token)
+    os.replace(temporary_filename, filename)
+# ------------------------------------------
+# END parameters
+# ------------------------------------------
 
-    # Output a "mean" (over all reconstruction times) distance grid.
-    command_line.append('--output_mean_distance')
+if not os.path.exists(output_dir):
+    print('{} does not exist, creating now... '.format(output_dir))
+    os.makedirs(output_dir, exist_ok=True)
 
-    # Don't output "standard deviation" (over all reconstruction times) distance grid.
-    #command_line.append('--output_std_dev_distance')
+# ----- 
+def generate_distance_grids(times):
 
-    # Generate grd (".nc") files instead of xyz (".xy") files.
-    command_line.append('--output_grd_files')
+    # Running the ocean basin proximity script in this process (rather than as a separate Python interpreter)
+    # avoids re-parsing its command line and lets us report the progress (and timing) of each task as it completes.
+    import ocean_basin_proximity
 
     if use_all_cpus:
         # If 'use_all_cpus' is a bool (and therefore must be True) then use all available CPUs...
@@ -318,22 +411,99 @@ def generate_distance_grids(times):
             raise TypeError('use_all_cpus: {} is neither a bool nor a positive integer'.format(use_all_cpus))
     else:
         num_cpus = 1
-    
-    # Number of cores.
-    # If None then not specified, and defaults to using all available cores.
-    if num_cpus:
-        command_line.extend(['--num_cpus', '{}'.format(num_cpus)])
-    
-    # The maximum amount of memory (in GB) to use (divided across the CPUs).
-    if max_memory_usage_in_gb:
-        command_line.extend(['--max_memory_usage', '{}'.format(max_memory_usage_in_gb)])
 
-    # Distance grids output directory.
-    command_line.append(output_dir)
-    
-    #print(' '.join(command_line))
-    call_system_command(command_line)
+    proximity_options = ocean_basin_proximity.ProximityOptions(
+            rotation_filenames=rotation_filenames,
+            proximity_filenames=proximity_features_files,
+            topological_reconstruction_filenames=topology_filenames,
+            age_grid_filenames_format=age_grid_filenames_format,
+            age_grid_paleo_times=list(times),
+            output_directory=output_dir,
+            # Proximity features are non-topological.
+            proximity_features_are_topological=False,
+            # Use all feature types in proximity file (according to Dietmar)...
+            #proximity_feature_types=['PassiveContinentalBoundary'],
+            anchor_plate_id=anchor_plate_id,
+            # If using continent obstacles.
+            continent_obstacle_filenames=continent_obstacle_files if continent_obstacle_files else None,
+            # Plate boundary obstacles (feature types).
+            # Can only be specified if continent obstacles are also specified.
+            plate_boundary_obstacle_feature_types=plate_boundary_obstacles if continent_obstacle_files else None,
+            # If limiting the max topological reconstruction time.
+            max_topological_reconstruction_time=max_topological_reconstruction_time,
+            # Time increment is 1 Myr (this is for topological reconstruction of the ocean points).
+            time_increment=1,
+            # Optionally clamp mean proximity.
+            clamp_mean_distance_kms=clamp_mean_proximity_kms if clamp_mean_proximity_kms else None,
+            # Optionally simplify obstacle and proximity geometries.
+            simplify_geometries=simplify_geometries,
+            # Optionally cache the reconstructed proximity features and continent obstacles (shared by all tasks).
+            cache_reconstruction_snapshots=cache_reconstruction_snapshots,
+            # Optionally split the ocean points into spatial shards (processed by separate CPUs).
+            num_spatial_shards=num_spatial_shards,
+            # Optionally bound the distance search by the mean distance clamp (only supported when just outputting mean distances).
+            bound_distance_search_by_clamp=bool(clamp_mean_proximity_kms) and bound_distance_search_by_clamp and not output_distance_percentiles,
+            # Number of cores.
+            # If None then not specified, and defaults to using all available cores.
+            num_cpus=num_cpus,
+            # The maximum amount of memory (in GB) to use (divided across the CPUs).
+            max_memory_usage_in_gb=max_memory_usage_in_gb if max_memory_usage_in_gb else None,
+            # Don't output distance grids for all reconstruction times.
+            # Only outputting a single "mean" (over all reconstruction times) distance grid.
+            output_distance_with_time=False,
+            # Output a "mean" (over all reconstruction times) distance grid (unless only predicting sediment grids from them).
+            output_mean_distance=write_mean_distance_grids,
+            # Don't output "standard deviation" (over all reconstruction times) distance grid.
+            output_std_dev_distance=False,
+            # Generate grd (".nc") files instead of xyz (".xy") files.
+            output_grd_files=True,
+            # Internal grid spacing (for internal distance calculations).
+            ocean_basin_grid_spacing=internal_grid_spacing,
+            # Grid spacing (for final output mean distance grids).
+            upscale_mean_std_dev_grid_spacing=grid_spacing,
+            # Optional lon/lat region (None if global).
+            region=region,
+            # Optional named (non-topological) proximity features whose distance grids are also generated.
+            additional_proximity_targets=[
+                    ocean_basin_proximity.ProximityTarget(target_name, target_filenames, proximity_features_are_topological=False)
+                    for target_name, target_filenames in additional_proximity_targets.items()] if additional_proximity_targets else None,
+            # Optionally write the distance statistics (to regenerate the mean distance grids without recalculating distances).
+            output_proximity_statistics=output_proximity_statistics,
+            # Optionally output percentile (eg, median) distance grids.
+            output_distance_percentiles=output_distance_percentiles,
+            # Optionally use reduced precision distance statistics and grids.
+            reduced_precision=reduced_precision,
+            # Optionally predict sediment grids directly from the mean distances (in memory).
+            sediment_predictions=[
+                    ocean_basin_proximity.SedimentPrediction(sediment_prediction_model, sediment_output_filename_prefix)
+                    for sediment_prediction_model, sediment_output_filename_prefix in sediment_predictions] if sediment_predictions else None)
+
+    num_times = len(proximity_options.age_grid_paleo_times)
+    num_times_completed = 0
+    def print_task_progress(task_metrics):
+        nonlocal num_times_completed
+        num_times_completed += len(task_metrics.age_grid_paleo_times)
+        print('Distance grids {:.0f}-{:.0f} Ma took {:.1f} seconds (process {}, plate model cache {} hits, {} misses), {}/{} times completed'.format(
+                min(task_metrics.age_grid_paleo_times), max(task_metrics.age_grid_paleo_times),
+                task_metrics.elapsed_seconds, task_metrics.process_id,
+                task_metrics.num_plate_model_cache_hits, task_metrics.num_plate_model_cache_misses,
+                num_times_completed, num_times), flush=True)
+
+    if plate_model_daemon_socket:
+        # The daemon returns the metrics of all tasks when the job has completed.
+        import plate_model_daemon
+        task_metrics_list = plate_model_daemon.submit_job(
+                'proximity',
+                proximity_options,
+                socket_filename=plate_model_daemon_socket if isinstance(plate_model_daemon_socket, str) else None)
+        for task_metrics in task_metrics_list:
+            print_task_progress(task_metrics)
+    else:
+        task_metrics_list = ocean_basin_proximity.generate_and_write_proximity_data_from_options(proximity_options, print_task_progress)
 
+    if task_metrics_list:
+        print('Completed {} tasks ({:.1f} task seconds in total)'.format(
+                len(task_metrics_list), sum(task_metrics.elapsed_seconds for task_metrics in task_metrics_list)))
 
 if __name__ == '__main__':
 
@@ -346,11 +516,39 @@ if __name__ == '__main__':
     times = range(min_time, max_time + 1, time_step)
     #times = range(max_time, min_time - 1, -time_step) # Go backwards (can see results sooner).
 
+    # Start a new run (before part 2 starts waiting for its distance grids).
+    #
+    # Part 2 only accepts distance grids modified at or after the run token was written, and only a completion file containing the run token
+    # (so it never predicts from the distance grids, or stops at the completion file, of a previous run into the same output directory).
+    distance_grids_run_token = '{}-{}'.format(os.getpid(), time_ns())
+    write_distance_grids_run_token(distance_grids_run_token_filename, distance_grids_run_token)
+    # Remove the completion file of any previous run.
+    if os.path.exists(distance_grids_completed_filename):
+        os.remove(distance_grids_completed_filename)
+
+    # Optionally start part 2 now, so it predicts sedimentation as distance grids are written (its workers use spare cores).
+    sedimentation_prediction_process = None
+    if overlap_sedimentation_prediction:
+        import subprocess
+        print('Predicting sedimentation grids as distance grids are generated...')
+        sedimentation_prediction_process = subprocess.Popen([
+                sys.executable,
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), '02_generate_predicted_sedimentation_grids.py'),
+                config_file,
+                # Part 2 follows this run (rather than the latest run it finds).
+                distance_grids_run_token])
+
     # Generate the distance grids.
     try:
         generate_distance_grids(times)
     except KeyboardInterrupt:
         pass
+    finally:
+        # Let part 2 know that there are no more distance grids (of this run) to wait for.
+        write_distance_grids_run_token(distance_grids_completed_filename, distance_grids_run_token)
+        # Wait for part 2 to predict sedimentation for the last distance grids.
+        if sedimentation_prediction_process:
+            sedimentation_prediction_process.wait()
     
     #tprof_end = time_prof.perf_counter()
     #print(f"Total time: {tprof_end - tprof_start:.2f} seconds")
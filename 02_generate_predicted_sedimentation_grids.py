@@ -1,12 +1,12 @@
 
-# Try importing 'ptt' first. If that fails then try 'gplately.ptt' (GPlately now contains PlateTectonicTools).
-try:
-    from ptt.utils.call_system_command import call_system_command
-except ImportError:
-    from gplately.ptt.utils.call_system_command import call_system_command
+from dataclasses import dataclass
 import multiprocessing
+import numpy as np
 import os
+import predict_sediment_thickness
+import sediment_prediction
 import sys
+from time import perf_counter, sleep
 
 from datetime import datetime
 import yaml
@@ -21,18 +21,19 @@ This script creates grids (netcdfs) of sediment thickness and sediment rate thro
 
 Requirements amd Inputs:
     - Python
-    - Python scripts (predict_sediment_thickness.py, predict sedimentation_rate.py) - should be in this directory
+    - Python scripts (predict_sediment_thickness.py, sediment_prediction.py) - should be in this directory
     - GMT 5 (or later)
     - Files associated with a tectonic model, in particular, the agegrids
     - PlateTectonicTools
     - pyGPlates
 
 To modify the sediment thickness relationship (e.g. for a new present-day agegrid or sediment thickness grid),
-you will need to relcalculate the polynomial coefficients, and enter them into this script.
+you will need to relcalculate the polynomial coefficients, and enter them into 'sediment_prediction.py'.
 
 The polynomial coefficients are calculated in the folder 'python_notebooks_and_input_data_archive', in the jupyter
 notebooks 'sediment_thick.ipynb' and 'sediment_rate.ipynb'. The values printed by the last cell of this notebook
-can be entered into lines 215-222 (for sedimentation rate) and 278-284 (for sediment thickness) of this script.
+can be entered into 'SEDIMENTATION_RATE_MODEL' (for sedimentation rate) and 'SEDIMENT_THICKNESS_MODEL' (for sediment thickness)
+in 'sediment_prediction.py'.
 
 Outputs:
     - folder named 'sedimentation_output' (or desired name, if changed), with 
@@ -108,6 +109,10 @@ try:
 
     generate_sediment_thickness_grids = PARAMS["SedimentThicknessWorfkowParameters"]["generate_sediment_thickness_grids"]
     generate_sedimentation_rate_grids = PARAMS["SedimentThicknessWorfkowParameters"]["generate_sedimentation_rate_grids"]
+    # optional (defaults to waiting for part 1 to generate all distance grids before running this script)
+    overlap_sedimentation_prediction = PARAMS["SedimentThicknessWorfkowParameters"].get("overlap_sedimentation_prediction", "False")
+    # optional (defaults to sampling the age and distance grids at each ocean basin point)
+    raster_sedimentation_prediction = PARAMS["SedimentThicknessWorfkowParameters"].get("raster_sedimentation_prediction", "False")
 
 except IndexError:
     print('*** No yaml file given. Make sure you specify it ***')
@@ -172,6 +177,36 @@ grid_spacing = grid_spacing   # grid spacing of output sedimentation grids
 #     The "{}" parts are substituted here now (in this str.format() call) whereas the escaped "{{...}}" part is subsituted later (with each 'time').
 distance_grid_filenames_format = '{0}/distances_{1:.1f}d/mean_distance_{1:.1f}d_{{:.1f}}.nc'.format(output_base_dir, distance_grid_spacing)
 
+# Whether to predict the sedimentation of each time as soon as its distance grid is written by part 1 (while part 1 is still running).
+#
+# Part 1 writes each distance grid atomically (so a grid that exists is complete) and, when it has finished, writes the
+# 'distance_grids_completed_filename' file (so we stop waiting for distance grids that part 1 did not generate).
+# Part 1 starts this script itself (in this mode) if 'overlap_sedimentation_prediction' is also set in its config.
+#
+# When part 1 starts it writes a run token to 'distance_grids_run_token_filename'. Only distance grids modified at or after then,
+# and only a completion file containing the same run token, belong to the run (others are left over from previous runs).
+# Part 1 passes its run token as the second command-line argument when it starts this script.
+if str(overlap_sedimentation_prediction).lower() in ['true', '1', 't', 'y', 'yes']:
+    overlap_sedimentation_prediction = True
+else:
+    overlap_sedimentation_prediction = False
+# Note: These must match the filenames written by part 1.
+distance_grids_run_token_filename = os.path.join(os.path.dirname(distance_grid_filenames_format), 'distance_grids_run_token')
+distance_grids_completed_filename = os.path.join(os.path.dirname(distance_grid_filenames_format), 'distance_grids_completed')
+# The run token of the part 1 run that started this script (if any).
+distance_grids_run_token = sys.argv[2] if len(sys.argv) > 2 else None
+# How often (in seconds) to check for new distance grids.
+distance_grid_poll_interval_seconds = 5
+
+# Whether to predict on whole grids (raster algebra) rather than sampling the age and distance grids at each ocean basin point.
+#
+# This is fastest when the age and distance grids are on the same uniform lon/lat grid as the output sedimentation grids
+# (ie, global gridline registered grids with a spacing of 'grid_spacing'). Otherwise they are first resampled onto it.
+if str(raster_sedimentation_prediction).lower() in ['true', '1', 't', 'y', 'yes']:
+    raster_sedimentation_prediction = True
+else:
+    raster_sedimentation_prediction = False
+
 # Output directory name.
 sediment_output_sub_dir = 'sedimentation_output'
 
@@ -195,70 +230,165 @@ if not os.path.exists(os.path.join(output_base_dir, sediment_output_sub_dir)):
 
 
 # ----- 
-def generate_predicted_sedimentation_grid(
+# The lattice of ocean basin points (at 'grid_spacing') of the current process (see 'get_input_points_grid()').
+_input_points_grid = None
+
+
+def get_input_points_grid():
+    """
+    Return the 3-tuple (input_points, num_grid_longitudes, num_grid_latitudes) of the lattice of ocean basin points at 'grid_spacing'.
+
+    The lattice is generated only once per process (and shared by all times predicted by the process).
+    """
+    
+    global _input_points_grid
+    if _input_points_grid is None:
+        # Note: The helper functions (for generating the lattice, sampling the age/distance grids and writing the predicted grids) are
+        #       the same in both 'predict_sediment_thickness.py' and 'predict_sedimentation_rate.py' (so it doesn't matter which one we use).
+        _input_points_grid = predict_sediment_thickness.generate_input_points_grid(grid_spacing)
+    return _input_points_grid
+
+
+@dataclass
+class PredictionTaskMetrics:
+    """Metrics of a task (the predictions of a single time) processed by 'generate_predicted_sedimentation_grids()'."""
+    
+    # The paleo time of the predicted grids.
+    time: float
+    # Time taken to process the task.
+    elapsed_seconds: float
+    # Time taken to sample the age and distance grids (shared by all predictions of the task).
+    sample_seconds: float
+    # Time taken to evaluate the predictions.
+    predict_seconds: float
+    # Time taken to write the predicted grids.
+    write_seconds: float
+    # The process that predicted the grids.
+    process_id: int
+    
+    @property
+    def overhead_seconds(self):
+        """The time taken by everything except sampling, predicting and writing (eg, generating the lattice of ocean basin points)."""
+        return self.elapsed_seconds - self.sample_seconds - self.predict_seconds - self.write_seconds
+
+
+def generate_predicted_sedimentation_grids(
         time,
-        predict_sedimentation_script,
-        scale_sedimentation_rate,
-        mean_age,
-        mean_distance,
-        variance_age,
-        variance_distance,
-        max_age,
-        max_distance,
-        age_distance_polynomial_coefficients,
-        output_file_basename_prefix):
+        predictions):
+    """
+    Predict all the requested sedimentation grids (eg, sediment thickness and sedimentation rate) of the specified time.
+
+    The age and distance grids are sampled only once (and shared by all predictions).
+    Each prediction is a 2-tuple of its trained relationship (a 'sediment_prediction.SedimentPredictionModel') and output file basename prefix.
     
-    command_line = [
-            sys.executable,  # python
-            predict_sedimentation_script,
-            '-d',
-            distance_grid_filenames_format.format(time),
-            '-g',
+    Returns the task's 'PredictionTaskMetrics'.
+    """
+    
+    task_start_time = perf_counter()
+    
+    if raster_sedimentation_prediction:
+        return generate_predicted_sedimentation_grids_from_rasters(time, predictions, task_start_time)
+    
+    input_points, num_grid_longitudes, num_grid_latitudes = get_input_points_grid()
+    
+    # Sample the age and distance grids once for all predictions.
+    #
+    # Note: Ages and distances are not clamped here (each prediction clamps to the maximum age/distance of its trained relationship).
+    sample_start_time = perf_counter()
+    lon_lat_age_distance_array = predict_sediment_thickness.get_ages_and_distances(
+            input_points,
             age_grid_filenames_format.format(time),
-            '-i',
-            str(grid_spacing),
-            '-w',
-            '-m',
-            str(mean_age),
-            str(mean_distance),
-            '-v',
-            str(variance_age),
-            str(variance_distance),
-            '-x',
-            str(max_age),
-            str(max_distance),
-            '-f']
-    command_line.extend(str(coeff) for coeff in age_distance_polynomial_coefficients)
-    # Only sediment rate requires scaling (sediment thickness does not)...
-    if scale_sedimentation_rate is not None:
-        command_line.extend([
-                '-s',
-                str(scale_sedimentation_rate)])
+            distance_grid_filenames_format.format(time))
+    # Note: Reshape in case there are no ocean basin points (ie, an empty array).
+    lon_lat_age_distance_array = lon_lat_age_distance_array.reshape(-1, 4)
+    sample_seconds = perf_counter() - sample_start_time
     
-    output_filename_prefix = '{}_{:.1f}'.format(output_file_basename_prefix, time)
-    command_line.extend([
-            '--',
-            output_filename_prefix])
+    predict_seconds = 0.0
+    write_seconds = 0.0
+    for sediment_prediction_model, output_file_basename_prefix in predictions:
+        
+        predict_start_time = perf_counter()
+        # Note: Only sediment rate is scaled by its model (sediment thickness is not).
+        predicted_sedimentation = sediment_prediction_model.predict(
+                lon_lat_age_distance_array[:, 2],  # ages
+                lon_lat_age_distance_array[:, 3])  # distances
+        predict_seconds += perf_counter() - predict_start_time
+        
+        write_start_time = perf_counter()
+        output_filename_prefix = '{}_{:.1f}'.format(output_file_basename_prefix, time)
+        predict_sediment_thickness.write_sediment_data(
+                np.column_stack((lon_lat_age_distance_array[:, 0], lon_lat_age_distance_array[:, 1], predicted_sedimentation)),
+                output_filename_prefix,
+                (grid_spacing, num_grid_longitudes, num_grid_latitudes))
+        write_seconds += perf_counter() - write_start_time
     
-    #print('Time:', time)
-    #print(command_line)
+    return PredictionTaskMetrics(
+            time,
+            perf_counter() - task_start_time,
+            sample_seconds,
+            predict_seconds,
+            write_seconds,
+            os.getpid())
 
-    #print(' '.join(command_line))
+
+def generate_predicted_sedimentation_grids_from_rasters(
+        time,
+        predictions,
+        task_start_time):
+    """
+    Same as 'generate_predicted_sedimentation_grids()' but predicts on whole grids (raster algebra) rather than on sampled points.
+
+    The age and distance grids are read once as 2D arrays (resampled if they're not on the output grid) and the predicted grids
+    are written directly from 2D arrays (without xyz points).
+    """
     
-    # Execute the command.
-    call_system_command(command_line)
+    num_grid_longitudes, num_grid_latitudes = sediment_prediction.get_input_points_grid_shape(grid_spacing)
+    
+    # Read the age and distance grids once for all predictions.
+    sample_start_time = perf_counter()
+    age_array, distance_array = sediment_prediction.get_age_and_distance_arrays(
+            age_grid_filenames_format.format(time),
+            distance_grid_filenames_format.format(time),
+            grid_spacing, num_grid_longitudes, num_grid_latitudes)
+    sample_seconds = perf_counter() - sample_start_time
+    
+    predict_seconds = 0.0
+    write_seconds = 0.0
+    for sediment_prediction_model, output_file_basename_prefix in predictions:
+        
+        predict_start_time = perf_counter()
+        # Note: Nodes outside the age grid or distance grid are NaN (and hence so are their predictions).
+        predicted_sedimentation_array = sediment_prediction_model.predict(
+                age_array.ravel(),
+                distance_array.ravel()).reshape(age_array.shape)
+        predict_seconds += perf_counter() - predict_start_time
+        
+        write_start_time = perf_counter()
+        sediment_prediction.write_grd_array_file(
+                '{}_{:.1f}.nc'.format(output_file_basename_prefix, time),
+                predicted_sedimentation_array,
+                grid_spacing)
+        write_seconds += perf_counter() - write_start_time
+    
+    return PredictionTaskMetrics(
+            time,
+            perf_counter() - task_start_time,
+            sample_seconds,
+            predict_seconds,
+            write_seconds,
+            os.getpid())
 
 
-# Wraps around 'generate_predicted_sedimentation_grid()' so can be used by multiprocessing.Pool.map()
+# Wraps around 'generate_predicted_sedimentation_grids()' so can be used by multiprocessing.Pool.map()
 # which requires a single-argument function.
-def generate_predicted_sedimentation_grid_parallel_pool_function(args):
+def generate_predicted_sedimentation_grids_parallel_pool_function(args):
     try:
-        return generate_predicted_sedimentation_grid(*args)
+        return generate_predicted_sedimentation_grids(*args)
     except KeyboardInterrupt:
         pass
 
 
-def low_priority():
+def low_priority(niceness=1):
     """ Set the priority of the process to below-normal."""
 
     import sys
@@ -280,7 +410,126 @@ def low_priority():
     else:
         import os
 
-        os.nice(1)
+        os.nice(niceness)
+
+
+def prediction_pool_worker_initializer(niceness=1):
+    """Initialize each worker process of a pool that calls 'generate_predicted_sedimentation_grids()'."""
+    
+    low_priority(niceness)
+    
+    # Each worker process is given several times to predict, so generate the lattice of ocean basin points once per worker
+    # (rather than once per time). This does nothing if the worker inherited the lattice from the main process (when forked).
+    # Note: The lattice is not needed when predicting on whole grids.
+    if not raster_sedimentation_prediction:
+        get_input_points_grid()
+
+
+def print_prediction_task_metrics(task_metrics):
+    """Print the metrics of a completed 'generate_predicted_sedimentation_grids()' task."""
+    
+    print('Sedimentation grids {:.0f} Ma took {:.2f} seconds (sampling {:.2f}, predicting {:.2f}, writing {:.2f}, overhead {:.2f}; process {})'.format(
+            task_metrics.time, task_metrics.elapsed_seconds,
+            task_metrics.sample_seconds, task_metrics.predict_seconds, task_metrics.write_seconds, task_metrics.overhead_seconds,
+            task_metrics.process_id), flush=True)
+
+
+def print_prediction_summary(task_metrics_list, elapsed_seconds):
+    """Print the total and average per-time metrics of all completed 'generate_predicted_sedimentation_grids()' tasks."""
+    
+    num_tasks = len(task_metrics_list)
+    if num_tasks == 0:
+        return
+    
+    print('Predicted sedimentation grids of {} times in {:.1f} seconds ({:.1f} task seconds in total). Per time: '
+          'sampling {:.2f}, predicting {:.2f}, writing {:.2f}, overhead {:.3f} seconds on average'.format(
+            num_tasks, elapsed_seconds, sum(task_metrics.elapsed_seconds for task_metrics in task_metrics_list),
+            sum(task_metrics.sample_seconds for task_metrics in task_metrics_list) / num_tasks,
+            sum(task_metrics.predict_seconds for task_metrics in task_metrics_list) / num_tasks,
+            sum(task_metrics.write_seconds for task_metrics in task_metrics_list) / num_tasks,
+            sum(task_metrics.overhead_seconds for task_metrics in task_metrics_list) / num_tasks))
+
+
+def read_distance_grids_run_token(filename):
+    """
+    Return the run token in the specified file (written by part 1) and the file's modification time (in nanoseconds).
+
+    Returns (None, None) if the file does not exist.
+    """
+
+    try:
+        with open(filename) as run_token_file:
+            # Note: Get the modification time of the file we read (part 1 could replace the file after we opened it).
+            return run_token_file.read().strip(), os.fstat(run_token_file.fileno()).st_mtime_ns
+    except FileNotFoundError:
+        return None, None
+
+
+def wait_for_distance_grids_run(run_token=None):
+    """
+    Return the run token, and start time (in nanoseconds), of the part 1 run to predict the sedimentation of.
+
+    If 'run_token' is None (ie, this script was not started by part 1) then follow the run of part 1 that is currently generating
+    distance grids, or wait for the next run to start if the latest run has already completed (or no run has started yet).
+    """
+
+    if run_token is None:
+        latest_run_token, _ = read_distance_grids_run_token(distance_grids_run_token_filename)
+        completed_run_token, _ = read_distance_grids_run_token(distance_grids_completed_filename)
+        if latest_run_token and latest_run_token != completed_run_token:
+            # Part 1 is currently generating distance grids.
+            run_token = latest_run_token
+        else:
+            print('Waiting for part 1 to start generating distance grids '
+                  '(set "overlap_sedimentation_prediction" to False to predict from existing distance grids)...')
+
+    while True:
+        current_run_token, run_start_time_ns = read_distance_grids_run_token(distance_grids_run_token_filename)
+        if current_run_token:
+            if run_token is not None:
+                if current_run_token == run_token:
+                    return run_token, run_start_time_ns
+            elif current_run_token != latest_run_token:
+                # A new run of part 1 has started.
+                return current_run_token, run_start_time_ns
+        sleep(distance_grid_poll_interval_seconds)
+
+
+def wait_for_distance_grids(times, run_token=None):
+    """
+    Yield each time as soon as its distance grid has been written by the part 1 run (in the order they appear).
+
+    Distance grids left over from previous runs (ie, modified before the run started) are not yielded.
+    Stops waiting when the run has finished (see 'distance_grids_completed_filename'), even if some distance grids are missing.
+    See 'wait_for_distance_grids_run()' for which run is followed if 'run_token' is None.
+    """
+
+    run_token, run_start_time_ns = wait_for_distance_grids_run(run_token)
+
+    def is_distance_grid_available(time):
+        try:
+            return os.stat(distance_grid_filenames_format.format(time)).st_mtime_ns >= run_start_time_ns
+        except FileNotFoundError:
+            return False
+
+    remaining_times = list(times)
+    while remaining_times:
+        # Check whether part 1 has finished *before* looking for distance grids, so that we don't miss any grids written just before it finished.
+        completed_run_token, _ = read_distance_grids_run_token(distance_grids_completed_filename)
+        distance_grids_completed = (completed_run_token == run_token)
+
+        available_times = [time for time in remaining_times if is_distance_grid_available(time)]
+        for time in available_times:
+            remaining_times.remove(time)
+            yield time
+
+        if distance_grids_completed:
+            break
+        if not available_times:
+            sleep(distance_grid_poll_interval_seconds)
+
+    if remaining_times:
+        print('WARNING: No distance grids were generated for times: {}'.format(', '.join(str(time) for time in remaining_times)), file=sys.stderr)
 
 
 
@@ -288,11 +537,16 @@ if __name__ == '__main__':
 
     times = range(min_time, max_time + 1, time_step)
 
+    # The predictions to generate for each time (all predictions of a time share the same sampling of its age and distance grids).
+    # Each is a tuple of the trained relationship and output file basename prefix (see 'generate_predicted_sedimentation_grids()').
+    predictions = []
+
     # Machine learning training parameters.
     # These come from the "sediment_rate_decomp" IPython notebook (using sklearn Python module).
+    # The current parameters are in 'sediment_prediction.py' (shared with the fused distance/sedimentation path of part 1).
 
     #
-    # Predict sedimentation *rate* results in "sediment_rate_decomp_v5.ipynb" from:
+    # Previous parameters to predict sedimentation *rate* results in "sediment_rate_decomp_v5.ipynb" from:
     #     
     #     _, regressor_trained_no_river =  geo_preprocess3.regression(data=data_train, 
     #                                                                     regressor=regressor_no_river, 
@@ -318,36 +572,10 @@ if __name__ == '__main__':
     # age_distance_polynomial_coefficients = [
     #         0.0 , -0.52275531, -0.51023915,  0.34082993, -0.08491046, 0.5764176 , -0.0704285 , -0.01460767,  0.1403967 , -0.24019863]
 
-    #
-    # Predict sedimentation *rate* results in "sediment_rate_decomp_v5.ipynb" from:
-    #
-    #     dataq = data[:, [lon_ind, lat_ind, age_ind, passive_dis_ind, sedrate_ind]]
-    #     geo_preprocess3.two_feature_analysis(dataq, regressor, 2, 3, 'age', 
-    #                                          'distance to passive margin', 'predicted log sedrate',
-    #                                          query_size=20)
-    #     
-    #     print('Mean of age and distance:', regressor.named_steps['stand'].mean_)
-    #     print('Variance of age and distance:', regressor.named_steps['stand'].var_)
-    #     print('Polynomial coefficients:', regressor.named_steps['linear'].coef_)
-    #     print('Polynomial intercept:', regressor.named_steps['linear'].intercept_)
-    #     print('Polynomial feature names:', regressor.named_steps['poly'].get_feature_names())
-    #
-    #
     if generate_sedimentation_rate_grids:
         
-        # updated for GlobSed and TRUNK agegrids
-        predict_sedimentation_script = 'predict_sedimentation_rate.py'
-        #scale_sedimentation_rate = 1.0  # Keep predicted rate in (cm/Ky).
-        scale_sedimentation_rate = 10.0  # Scale predicted rate (cm/Ky) to (m/My).
-        mean_age = 61.17716597
-        mean_distance = 1835.10750592
-        variance_age =  1934.78513885
-        variance_distance = 1207587.8548734
-        max_age = 191.87276
-        max_distance = 3000.
-        age_distance_polynomial_coefficients = [
-                1.350082937086441, -0.26385415, -0.07516542,  0.39197707, -0.15475392,
-            0.        , -0.13196083,  0.02481208, -0.        , -0.47570021]
+        # The trained relationship (see 'sediment_prediction.py').
+        sediment_prediction_model = sediment_prediction.SEDIMENTATION_RATE_MODEL
         
         output_dir = os.path.join(output_base_dir, sediment_output_sub_dir, 'predicted_rate')
         output_file_basename_prefix = os.path.join(output_dir, 'sed_rate_{:.1f}d'.format(grid_spacing))
@@ -357,96 +585,12 @@ if __name__ == '__main__':
             print('{} does not exist, creating now... '.format(output_dir))
             os.mkdir(output_dir)
 
-        print('Generating predicted sedimentation rate grids...')
-
-        if use_all_cpus:
-        
-            # If 'use_all_cpus' is a bool (and therefore must be True) then use all available CPUs...
-            if isinstance(use_all_cpus, bool):
-                try:
-                    num_cpus = multiprocessing.cpu_count()
-                except NotImplementedError:
-                    num_cpus = 1
-            # else 'use_all_cpus' is a positive integer specifying the number of CPUs to use...
-            elif isinstance(use_all_cpus, int) and use_all_cpus > 0:
-                num_cpus = use_all_cpus
-            else:
-                raise TypeError('use_all_cpus: {} is neither a bool nor a positive integer'.format(use_all_cpus))
-            
-            try:
-                # Split the workload across the CPUs.
-                pool = multiprocessing.Pool(num_cpus, initializer=low_priority)
-                pool_map_async_result = pool.map_async(
-                        generate_predicted_sedimentation_grid_parallel_pool_function,
-                        (
-                            (
-                                time,
-                                predict_sedimentation_script,
-                                scale_sedimentation_rate,
-                                mean_age,
-                                mean_distance,
-                                variance_age,
-                                variance_distance,
-                                max_age,
-                                max_distance,
-                                age_distance_polynomial_coefficients,
-                                output_file_basename_prefix
-                            ) for time in times
-                        ),
-                        1) # chunksize
-
-                # Apparently if we use pool.map_async instead of pool.map and then get the results
-                # using a timeout, then we avoid a bug in Python where a keyboard interrupt does not work properly.
-                # See http://stackoverflow.com/questions/1408356/keyboard-interrupts-with-pythons-multiprocessing-pool
-                pool_map_async_result.get(999999)
-            except KeyboardInterrupt:
-                # Note: 'finally' block below gets executed before returning.
-                pass
-            finally:
-                pool.close()
-                pool.join()
-
-        else:
-            for time in times:
-                generate_predicted_sedimentation_grid(
-                        time,
-                        predict_sedimentation_script, scale_sedimentation_rate,
-                        mean_age, mean_distance,
-                        variance_age, variance_distance,
-                        max_age, max_distance,
-                        age_distance_polynomial_coefficients,
-                        output_file_basename_prefix)
+        predictions.append((sediment_prediction_model, output_file_basename_prefix))
     
-    #
-    # Predict sediment *thickness* results in "sediment_thick_v5.ipynb" from:
-    #
-    #     dataq = data[:, [lon_ind, lat_ind, age_ind, passive_dis_ind, sedthick_ind]]
-    #     geo_preprocess3.two_feature_analysis(dataq, regressor, 2, 3, 'age', 
-    #                                          'distance to passive margin', 'predicted log thickness',
-    #                                          query_size=20)
-    #     
-    #     print('Mean of age and distance:', regressor.named_steps['stand'].mean_)
-    #     print('Variance of age and distance:', regressor.named_steps['stand'].var_)
-    #     print('Max of age and distance:', np.max(data[:, [age_ind, passive_dis_ind]], axis=0))
-    #     print('Polynomial coefficients:', regressor.named_steps['linear'].coef_)
-    #     print('Polynomial intercept:', regressor.named_steps['linear'].intercept_)
-    #     print('Polynomial feature names:', regressor.named_steps['poly'].get_feature_names())
-    #
-    #
     if generate_sediment_thickness_grids:
         
-        # updated for GlobSed and TRUNK agegrids (NW 20220826)
-        predict_sedimentation_script = 'predict_sediment_thickness.py'
-        scale_sedimentation_rate = None  # No scaling - we're predicting sediment thickness (not rate).
-        mean_age =  61.18406823
-        mean_distance = 1835.28118479
-        variance_age = 1934.6999014
-        variance_distance = 1207521.8995806
-        max_age = 191.87276
-        max_distance = 3000.
-        age_distance_polynomial_coefficients = [
-                5.441401190368497,  0.46893096, -0.07320928, -0.24077496, -0.10840657,
-            0.00381672,  0.06831728,  0.01179914,  0.01158149, -0.39880562]
+        # The trained relationship (see 'sediment_prediction.py').
+        sediment_prediction_model = sediment_prediction.SEDIMENT_THICKNESS_MODEL
 
         output_dir = os.path.join(output_base_dir, sediment_output_sub_dir, 'predicted_thickness')
         output_file_basename_prefix = os.path.join(output_dir, 'sed_thick_{:.1f}d'.format(grid_spacing))
@@ -455,48 +599,58 @@ if __name__ == '__main__':
         if not os.path.exists(output_dir):
             print('{} does not exist, creating now... '.format(output_dir))
             os.mkdir(output_dir)
-        print('Generating predicted sediment thickness grids...')
+        predictions.append((sediment_prediction_model, output_file_basename_prefix))
 
-        if use_all_cpus:
+    if use_all_cpus:
+
+        # If 'use_all_cpus' is a bool (and therefore must be True) then use all available CPUs...
+        if isinstance(use_all_cpus, bool):
+            try:
+                num_cpus = multiprocessing.cpu_count()
+            except NotImplementedError:
+                num_cpus = 1
+        # else 'use_all_cpus' is a positive integer specifying the number of CPUs to use...
+        elif isinstance(use_all_cpus, int) and use_all_cpus > 0:
+            num_cpus = use_all_cpus
+        else:
+            raise TypeError('use_all_cpus: {} is neither a bool nor a positive integer'.format(use_all_cpus))
+
+    # Generate the lattice of ocean basin points once (in this process) so that, if the pool workers are forked, they inherit it.
+    # Otherwise each pool worker generates it once (see 'prediction_pool_worker_initializer()'), rather than once per time.
+    # Note: The lattice is not needed when predicting on whole grids.
+    if not raster_sedimentation_prediction:
+        get_input_points_grid()
 
-            # If 'use_all_cpus' is a bool (and therefore must be True) then use all available CPUs...
-            if isinstance(use_all_cpus, bool):
-                try:
-                    num_cpus = multiprocessing.cpu_count()
-                except NotImplementedError:
-                    num_cpus = 1
-            # else 'use_all_cpus' is a positive integer specifying the number of CPUs to use...
-            elif isinstance(use_all_cpus, int) and use_all_cpus > 0:
-                num_cpus = use_all_cpus
-            else:
-                raise TypeError('use_all_cpus: {} is neither a bool nor a positive integer'.format(use_all_cpus))
-            
+    # The metrics of each completed task (one task per time).
+    task_metrics_list = []
+    def add_task_metrics(task_metrics):
+        if task_metrics is None:  # None if task was interrupted
+            return
+        task_metrics_list.append(task_metrics)
+        print_prediction_task_metrics(task_metrics)
+
+    start_time = perf_counter()
+
+    if overlap_sedimentation_prediction:
+        print('Generating predicted sedimentation grids as distance grids are generated...')
+
+        if use_all_cpus:
             try:
-                # Split the workload across the CPUs.
-                pool = multiprocessing.Pool(num_cpus, initializer=low_priority)
-                pool_map_async_result = pool.map_async(
-                        generate_predicted_sedimentation_grid_parallel_pool_function,
-                        (
-                            (
-                                time,
-                                predict_sedimentation_script,
-                                scale_sedimentation_rate,
-                                mean_age,
-                                mean_distance,
-                                variance_age,
-                                variance_distance,
-                                max_age,
-                                max_distance,
-                                age_distance_polynomial_coefficients,
-                                output_file_basename_prefix
-                            ) for time in times
-                        ),
-                        1) # chunksize
-
-                # Apparently if we use pool.map_async instead of pool.map and then get the results
-                # using a timeout, then we avoid a bug in Python where a keyboard interrupt does not work properly.
-                # See http://stackoverflow.com/questions/1408356/keyboard-interrupts-with-pythons-multiprocessing-pool
-                pool_map_async_result.get(999999)
+                # Queue the predictions of each time as soon as its distance grid is available.
+                #
+                # The workers have a lower priority than those of part 1 (which is generating distance grids at the same time)
+                # so that they mostly use spare cores (eg, while part 1 is writing grids or waiting for its last tasks).
+                pool = multiprocessing.Pool(num_cpus, initializer=prediction_pool_worker_initializer, initargs=(10,))
+                pool_async_results = []
+                for time in wait_for_distance_grids(times, distance_grids_run_token):
+                    pool_async_results.append(pool.apply_async(
+                            generate_predicted_sedimentation_grids_parallel_pool_function,
+                            ((time, predictions),)))
+
+                # Wait for the queued predictions (and raise any exception raised by them).
+                # Using a timeout avoids a bug in Python where a keyboard interrupt does not work properly (see 'imap_unordered' below).
+                for pool_async_result in pool_async_results:
+                    add_task_metrics(pool_async_result.get(999999))
             except KeyboardInterrupt:
                 # Note: 'finally' block below gets executed before returning.
                 pass
@@ -505,12 +659,41 @@ if __name__ == '__main__':
                 pool.join()
 
         else:
-            for time in times:
-                generate_predicted_sedimentation_grid(
-                        time,
-                        predict_sedimentation_script, scale_sedimentation_rate,
-                        mean_age, mean_distance,
-                        variance_age, variance_distance,
-                        max_age, max_distance,
-                        age_distance_polynomial_coefficients,
-                        output_file_basename_prefix)
+            for time in wait_for_distance_grids(times, distance_grids_run_token):
+                add_task_metrics(generate_predicted_sedimentation_grids(time, predictions))
+
+    elif use_all_cpus:
+
+        print('Generating predicted sedimentation grids...')
+
+        try:
+            # Split the workload across the CPUs.
+            pool = multiprocessing.Pool(num_cpus, initializer=prediction_pool_worker_initializer)
+            pool_imap_result = pool.imap_unordered(
+                    generate_predicted_sedimentation_grids_parallel_pool_function,
+                    (
+                        (time, predictions)
+                            for time in times
+                    ),
+                    1) # chunksize
+
+            # Get the metrics of each task as it completes (in any order).
+            #
+            # Getting the results using a timeout avoids a bug in Python where a keyboard interrupt does not work properly.
+            # See http://stackoverflow.com/questions/1408356/keyboard-interrupts-with-pythons-multiprocessing-pool
+            for _ in range(len(times)):
+                add_task_metrics(pool_imap_result.next(999999))
+        except KeyboardInterrupt:
+            # Note: 'finally' block below gets executed before returning.
+            pass
+        finally:
+            pool.close()
+            pool.join()
+
+    else:
+        print('Generating predicted sedimentation grids...')
+
+        for time in times:
+            add_task_metrics(generate_predicted_sedimentation_grids(time, predictions))
+
+    print_prediction_summary(task_metrics_list, perf_counter() - start_time)
@@ -2,6 +2,7 @@
 import math
 import multiprocessing
 import os
+import plate_model_cache
 import pygplates
 import raster_query
 import subduction_convergence
@@ -13,6 +14,11 @@ topology_dir = 'E:/Users/John/Downloads/GPlates/data/vector/Muller_etal_AREPS_Su
 #topology_dir = 'D:/Users/john/Downloads/gplates/data/PlateModels/Muller_etal_AREPS_Supplement'
 sediment_thickness_grid_dir = 'E:/Users/John/Downloads/GPlates/data/PythonWorkflows/SedimentationRate/sedimentation_output/predicted_thickness'
 
+topology_filenames = (
+        topology_dir + '/Global_EarthByte_230-0Ma_GK07_AREPS_PlateBoundaries.gpml',
+        topology_dir + '/Global_EarthByte_230-0Ma_GK07_AREPS_Topology_BuildingBlocks.gpml')
+sediment_thickness_grid_filename_format = sediment_thickness_grid_dir + '/sed_thick_0.2d_{0}.grd'
+
 tessellation_threshold_radians = math.radians(0.5)
 search_radius_radians = math.radians(20.0)
 smoothing_radius_radians = None
@@ -21,15 +27,22 @@ min_time = 0
 max_time = 230
 time_step = 1
 
+# Optionally run in a plate model daemon (see 'plate_model_daemon.py') listening on this Unix socket, so that
+# repeated runs on the same plate model don't need to load it each time (the daemon must be started separately).
+plate_model_daemon_socket = None
+
 
-def calc_subducting_sediment_volume(time):
+def calc_subducting_sediment_volume(
+        time,
+        rotation_filename,
+        topology_filenames,
+        sediment_thickness_grid_filename_format):
 
-    rotation_model = pygplates.RotationModel(rotation_filename)
-    topology_features = pygplates.FeaturesFunctionArgument(
-            (topology_dir + '/Global_EarthByte_230-0Ma_GK07_AREPS_PlateBoundaries.gpml',
-            topology_dir + '/Global_EarthByte_230-0Ma_GK07_AREPS_Topology_BuildingBlocks.gpml')).get_features()
+    # Note: These are only loaded once per process if the plate model cache is enabled (eg, in a plate model daemon).
+    rotation_model = plate_model_cache.load_rotation_model(rotation_filename)
+    topology_features = plate_model_cache.load_features(topology_filenames)
 
-    sediment_thickness_grid_filename = sediment_thickness_grid_dir + '/sed_thick_0.2d_{0}.grd'.format(time)
+    sediment_thickness_grid_filename = sediment_thickness_grid_filename_format.format(time)
     
     subduction_convergence_data = subduction_convergence.subduction_convergence(
                 rotation_model,
@@ -123,32 +136,76 @@ def calc_subducting_sediment_volume_parallel_pool_function(args):
         pass
 
 
-if __name__ == '__main__':
+# Calculate subducting sediment volumes at the specified times (in parallel) and return them sorted by time.
+def calc_subducting_sediment_volumes(
+        times,
+        rotation_filename,
+        topology_filenames,
+        sediment_thickness_grid_filename_format,
+        num_cpus = None):  # if None then defaults to all available CPUs
     
-    #calc_subducting_sediment_volume(0)
-    #sys.exit(0)
+    # If the user requested all available CPUs then attempt to find out how many there are.
+    if not num_cpus:
+        try:
+            num_cpus = multiprocessing.cpu_count()
+        except NotImplementedError:
+            num_cpus = 1
     
-    try:
-        num_cpus = multiprocessing.cpu_count()
-    except NotImplementedError:
-        num_cpus = 1
+    # If the plate model cache is enabled (eg, in a plate model daemon) then load the plate model before the pool
+    # forks its workers, so that the workers inherit it (rather than each worker loading it again).
+    if plate_model_cache.get_cache() is not None:
+        plate_model_cache.load_rotation_model(rotation_filename)
+        plate_model_cache.load_features(topology_filenames)
     
     # Split the workload across the CPUs.
     pool = multiprocessing.Pool(num_cpus)
-    pool_map_async_result = pool.map_async(
-            calc_subducting_sediment_volume_parallel_pool_function,
-            (
-                (
-                    time,
-                ) for time in range(min_time, max_time + 1, time_step)
-            ),
-            1) # chunksize
-
-    # Apparently if we use pool.map_async instead of pool.map and then get the results
-    # using a timeout, then we avoid a bug in Python where a keyboard interrupt does not work properly.
-    # See http://stackoverflow.com/questions/1408356/keyboard-interrupts-with-pythons-multiprocessing-pool
     try:
+        pool_map_async_result = pool.map_async(
+                calc_subducting_sediment_volume_parallel_pool_function,
+                (
+                    (
+                        time,
+                        rotation_filename,
+                        topology_filenames,
+                        sediment_thickness_grid_filename_format
+                    ) for time in times
+                ),
+                1) # chunksize
+
+        # Apparently if we use pool.map_async instead of pool.map and then get the results
+        # using a timeout, then we avoid a bug in Python where a keyboard interrupt does not work properly.
+        # See http://stackoverflow.com/questions/1408356/keyboard-interrupts-with-pythons-multiprocessing-pool
         subduction_datas = pool_map_async_result.get(99999)
+    finally:
+        pool.close()
+        pool.join()
+    
+    return sorted(subduction_datas)
+
+
+if __name__ == '__main__':
+    
+    #calc_subducting_sediment_volume(0, rotation_filename, topology_filenames, sediment_thickness_grid_filename_format)
+    #sys.exit(0)
+    
+    times = range(min_time, max_time + 1, time_step)
+    
+    try:
+        if plate_model_daemon_socket:
+            import plate_model_daemon
+            subduction_datas = plate_model_daemon.submit_job(
+                    'calc_subducting_sediment_volumes',
+                    list(times),
+                    rotation_filename,
+                    topology_filenames,
+                    sediment_thickness_grid_filename_format,
+                    socket_filename=plate_model_daemon_socket)
+        else:
+            subduction_datas = calc_subducting_sediment_volumes(
+                    times,
+                    rotation_filename,
+                    topology_filenames,
+                    sediment_thickness_grid_filename_format)
     except KeyboardInterrupt:
         sys.exit(1)
     
@@ -168,7 +225,7 @@ if __name__ == '__main__':
         mean_sed_thickness,
         std_dev_sed_thickness,
         total_subducting_length_metres,
-        total_subducting_sediment_volume_metres_3_per_year) in sorted(subduction_datas):
+        total_subducting_sediment_volume_metres_3_per_year) in subduction_datas:
         
         # Print the statistics for the current time.
         print('{0:<10.0f} {1:<40.2f} {2:<40.2f} {3:<40.2f} {4:<40.2f}'.format(
@@ -24,10 +24,15 @@
 
 
 import argparse
+from dataclasses import dataclass
+import itertools
 import math
 import multiprocessing
 import numpy as np
+import operator
 import os
+import shutil
+import tempfile
 # Try importing 'ptt' first. If that fails then try 'gplately.ptt' (GPlately now contains PlateTectonicTools).
 try:
     from ptt.utils.call_system_command import call_system_command
@@ -35,17 +40,30 @@ try:
 except ImportError:
     from gplately.ptt.utils.call_system_command import call_system_command
     import gplately.ptt.utils.proximity_query as proximity_query
+import plate_model_cache
 import pygplates
 from scipy.spatial import KDTree
 import shortest_path
 import sys
 import time as time_profile
+from typing import Any, Callable, List, Optional, Tuple
 
 
 # Default plate boundary feature types used as obstacles that the shortest distance path
 # must go around (ie, water must flow around these).
 DEFAULT_PLATE_BOUNDARY_OBSTACLE_FEATURE_TYPES = ["MidOceanRidge", "SubductionZone"]
 
+# Subdivision depth of the shortest path grid (used when there are continent obstacles).
+SHORTEST_PATH_GRID_SUBDIVISION_DEPTH = 6  # grid spacing of ~ 1.4 degrees
+
+# GMT grid format of the distance grids written in reduced precision mode (see 'reduced_precision' in 'proximity()').
+# Distances (in kms) are rounded to 16-bit integers (ie, to the nearest km), which halves the size of GMT's default 32-bit float grids.
+REDUCED_PRECISION_DISTANCE_GRID_FORMAT = 'ns+n-32768'
+
+# In reduced precision mode every this many ocean basin points also accumulate statistics in full (64-bit) precision,
+# to measure the error of the reduced precision statistics.
+REDUCED_PRECISION_ERROR_SAMPLE_STRIDE = 64
+
 
 # Enable CPU/memory profiling.
 ENABLE_CPU_PROFILING = False
@@ -69,12 +87,17 @@ class CpuProfile(object):
             self.time_usage_reconstruct_proximity = 0.0
             self.time_usage_calculate_distances = 0.0
             self.time_usage_obstacle_reconstruct_resolve = 0.0
+            self.time_usage_simplify_geometries = 0.0
+            self.num_vertices_before_simplify_geometries = 0
+            self.num_vertices_after_simplify_geometries = 0
             self.time_usage_create_obstacle_grids = 0.0
             self.time_usage_calculate_obstacle_distances = 0.0
             self.time_usage_obstacle_create_obstacle_grid = 0.0
             self.time_usage_obstacle_create_distance_grid = 0.0
             self.time_usage_obstacle_calc_distances = 0.0
             self.time_usage_reconstruct_time_step = 0.0
+            self.num_resolve_topologies = 0
+            self.num_resolve_topologies_reused = 0
     def end_proximity(self):
         """Call at the end of proximity()."""
         if self.enable_profiling:
@@ -122,6 +145,25 @@ class CpuProfile(object):
         if self.enable_profiling:
             self.time_usage_obstacle_reconstruct_resolve += self.profile() - self.time_snapshot_start_obstacle_reconstruct_resolve
     
+    def start_simplify_geometries(self):
+        if self.enable_profiling:
+            self.time_snapshot_start_simplify_geometries = self.profile()
+    def end_simplify_geometries(self):
+        if self.enable_profiling:
+            self.time_usage_simplify_geometries += self.profile() - self.time_snapshot_start_simplify_geometries
+    
+    def add_simplified_geometries(self, geometries, simplified_geometries):
+        """Accumulate the number of vertices before and after simplifying geometries."""
+        if self.enable_profiling:
+            self.num_vertices_before_simplify_geometries += self.num_vertices(geometries)
+            self.num_vertices_after_simplify_geometries += self.num_vertices(simplified_geometries)
+    
+    def add_resolve_topologies(self, num_resolved, num_reused):
+        """Accumulate the number of times topologies were resolved, and the number of times a resolve was avoided by reusing a topological snapshot."""
+        if self.enable_profiling:
+            self.num_resolve_topologies += num_resolved
+            self.num_resolve_topologies_reused += num_reused
+    
     def start_create_obstacle_grids(self):
         if self.enable_profiling:
             self.time_snapshot_start_create_obstacle_grids = self.profile()
@@ -249,6 +291,13 @@ class CpuProfile(object):
             print(f"        Reconstruct proximity: {self.time_usage_reconstruct_proximity * scale_to_seconds:.2f} seconds")
             print(f"        Calculate distances: {self.time_usage_calculate_distances * scale_to_seconds:.2f} seconds")
             print(f"          Obstacle reconstruct/resolve: {self.time_usage_obstacle_reconstruct_resolve * scale_to_seconds:.2f} seconds")
+            if self.num_resolve_topologies + self.num_resolve_topologies_reused:
+                print(f"          Resolve topologies: {self.num_resolve_topologies} resolved, {self.num_resolve_topologies_reused} reused "
+                      f"({100.0 * self.num_resolve_topologies_reused / (self.num_resolve_topologies + self.num_resolve_topologies_reused):.1f}% reduction)")
+            if self.num_vertices_before_simplify_geometries:
+                print(f"          Simplify geometries: {self.time_usage_simplify_geometries * scale_to_seconds:.2f} seconds "
+                      f"({self.num_vertices_before_simplify_geometries} -> {self.num_vertices_after_simplify_geometries} vertices, "
+                      f"{100.0 * (1 - self.num_vertices_after_simplify_geometries / self.num_vertices_before_simplify_geometries):.1f}% reduction)")
             print(f"          Obstacle create obstacle grids: {self.time_usage_create_obstacle_grids * scale_to_seconds:.2f} seconds")
             print(f"          Obstacle calculate distances: {self.time_usage_calculate_obstacle_distances * scale_to_seconds:.2f} seconds")
             print(f"        Reconstruct time steps: {self.time_usage_reconstruct_time_step * scale_to_seconds:.2f} seconds")
@@ -267,6 +316,16 @@ class CpuProfile(object):
     @staticmethod
     def profile():
         return time_profile.perf_counter_ns()  # in nanoseconds
+    
+    @staticmethod
+    def num_vertices(geometries):
+        num_vertices = 0
+        for geometry in geometries:
+            try:
+                num_vertices += len(geometry.get_points())
+            except AttributeError:  # PointOnSphere
+                num_vertices += 1
+        return num_vertices
 
 # Profile CPU usage (currently just the profile() function).
 cpu_profile = CpuProfile(ENABLE_CPU_PROFILING)
@@ -376,11 +435,57 @@ def read_input_points(input_points_filename):
     return np.array(input_points)  # numpy array uses less memory
 
 
-def generate_input_points_grid(grid_spacing_degrees):
+# Returns the (lon_min, lon_max, lat_min, lat_max) extent of a uniform lon-lat grid with the specified grid spacing.
+#
+# If 'region' (a (lon_min, lon_max, lat_min, lat_max) tuple) is specified then the grid only contains those points of the global grid
+# (the grid points starting at -180 longitude and -90 latitude) that are inside the region, otherwise the grid is global.
+def get_grid_region(grid_spacing_degrees, region=None):
+    
+    if region is None:
+        return -180, 180, -90, 90
+    
+    region_lon_min, region_lon_max, region_lat_min, region_lat_max = region
+    if region_lon_min >= region_lon_max or region_lat_min >= region_lat_max:
+        raise ValueError('Region {} must have minimum longitude/latitude less than maximum longitude/latitude.'.format(region))
+    
+    # Index range of the global grid points inside the region.
+    # The small tolerance includes points on the region boundary (despite numerical round-off).
+    max_lon_index = int(math.floor(360.0 / grid_spacing_degrees))
+    max_lat_index = int(math.floor(180.0 / grid_spacing_degrees))
+    min_region_lon_index = max(0, int(math.ceil((region_lon_min + 180) / grid_spacing_degrees - 1e-6)))
+    max_region_lon_index = min(max_lon_index, int(math.floor((region_lon_max + 180) / grid_spacing_degrees + 1e-6)))
+    min_region_lat_index = max(0, int(math.ceil((region_lat_min + 90) / grid_spacing_degrees - 1e-6)))
+    max_region_lat_index = min(max_lat_index, int(math.floor((region_lat_max + 90) / grid_spacing_degrees + 1e-6)))
+    if min_region_lon_index > max_region_lon_index or min_region_lat_index > max_region_lat_index:
+        raise ValueError('Region {} contains no grid points at a grid spacing of {} degrees.'.format(region, grid_spacing_degrees))
+    
+    return (-180 + min_region_lon_index * grid_spacing_degrees,
+            -180 + max_region_lon_index * grid_spacing_degrees,
+            -90 + min_region_lat_index * grid_spacing_degrees,
+            -90 + max_region_lat_index * grid_spacing_degrees)
+
+
+# Returns the points (and number of longitudes and latitudes) of a uniform lon-lat grid with the specified grid spacing.
+#
+# If 'region' (a (lon_min, lon_max, lat_min, lat_max) tuple) is specified then only the global grid points inside it are returned.
+def generate_input_points_grid(grid_spacing_degrees, region=None):
     
     if grid_spacing_degrees == 0:
         raise ValueError('Grid spacing cannot be zero.')
     
+    if region is not None:
+        lon_min, lon_max, lat_min, lat_max = get_grid_region(grid_spacing_degrees, region)
+        num_latitudes = int(round((lat_max - lat_min) / grid_spacing_degrees)) + 1
+        num_longitudes = int(round((lon_max - lon_min) / grid_spacing_degrees)) + 1
+        
+        # Generate the input points on the regional grid.
+        input_points_mesh_grid = np.meshgrid(
+                np.linspace(lon_min, lon_max, num_longitudes),
+                np.linspace(lat_min, lat_max, num_latitudes))
+        input_points = np.array(input_points_mesh_grid).reshape(2, -1).T
+        
+        return (input_points, num_longitudes, num_latitudes)
+    
     # Data points start *on* dateline (-180).
     # If 180 is an integer multiple of grid spacing then final longitude also lands on dateline (+180).
     num_latitudes = int(math.floor(180.0 / grid_spacing_degrees)) + 1
@@ -461,12 +566,35 @@ def write_xyz_file(output_filename, output_data):
     #print('..generated: {}'.format(os.path.basename(output_filename)))
 
 
-def write_grd_file(grd_filename, output_data, grid_spacing, use_nearneighbor = True):
+def get_grd_filename_with_format(grd_filename, grid_format = None):
+    """Append the optional GMT grid format (eg, 'ns' for 16-bit integers) to a grid filename (for a GMT '-G' option)."""
+    
+    if grid_format is None:
+        return grd_filename  # GMT's default format (32-bit float netCDF)
+    return '{}={}'.format(grd_filename, grid_format)
+
+
+def get_temporary_grd_filename(grd_filename):
+    """
+    A temporary filename (unique to the current process) to write a grid file to before renaming it to 'grd_filename'.
+    
+    Writing to a temporary file and then renaming means other processes (eg, a pipelined sediment prediction) never read a partially written grid.
+    The extension is kept since GMT uses it to determine the grid format.
+    """
+    
+    grd_filename_root, grd_filename_ext = os.path.splitext(grd_filename)
+    return '{}.{}.tmp{}'.format(grd_filename_root, os.getpid(), grd_filename_ext)
+
+
+def write_grd_file(grd_filename, output_data, grid_spacing, use_nearneighbor = True, region = None, grid_format = None):
     cpu_profile.start_write_grd_file()
 
     # Convert array to a string for standard-input to GMT.
     xyz_data = ''.join('{} {} {}\n'.format(lon, lat, scalar) for lon, lat, scalar in output_data)
     
+    # Write to a temporary file and then rename (see 'get_temporary_grd_filename()').
+    temporary_grd_filename = get_temporary_grd_filename(grd_filename)
+    
     if use_nearneighbor:
         # The command-line strings to execute GMT 'nearneighbor'.
         # For example "nearneighbor output_mean_distance.xy -R-179.5/179.5/-89.5/89.5 -I1 -N4 -S1d -Goutput_mean_distance.nc".
@@ -479,9 +607,9 @@ def write_grd_file(grd_filename, output_data, grid_spacing, use_nearneighbor = T
                 # Use GMT gridline registration since our input point grid has data points on the grid lines.
                 # Gridline registration is the default so we don't need to force pixel registration...
                 # "-r", # Force pixel registration since data points are at centre of cells.
-                "-R{}/{}/{}/{}".format(-180, 180, -90, 90),
+                "-R{}/{}/{}/{}".format(*get_grid_region(grid_spacing, region)),
                 "-fg",
-                "-G{}".format(grd_filename)]
+                "-G{}".format(get_grd_filename_with_format(temporary_grd_filename, grid_format))]
     else:
         # The command-line strings to execute GMT 'xyz2grd'.
         # For example "xyz2grd output_mean_distance.xy -R-179.5/179.5/-89.5/89.5 -I1 -Goutput_mean_distance.nc".
@@ -492,18 +620,21 @@ def write_grd_file(grd_filename, output_data, grid_spacing, use_nearneighbor = T
                 # Use GMT gridline registration since our input point grid has data points on the grid lines.
                 # Gridline registration is the default so we don't need to force pixel registration...
                 # "-r", # Force pixel registration since data points are at centre of cells.
-                "-R{}/{}/{}/{}".format(-180, 180, -90, 90),
+                "-R{}/{}/{}/{}".format(*get_grid_region(grid_spacing, region)),
                 "-fg",
-                "-G{}".format(grd_filename)]
+                "-G{}".format(get_grd_filename_with_format(temporary_grd_filename, grid_format))]
     
     call_system_command(gmt_command_line, stdin=xyz_data)
+    os.replace(temporary_grd_filename, grd_filename)
 
     cpu_profile.end_write_grd_file()
 
     #print('..generated: {}'.format(os.path.basename(grd_filename)))
 
 
-def calculate_upscaled_mask_interpolation_params(src_lon_lats, src_grid_spacing, upscaled_lon_lats_string, age_grid_filename):
+# If 'output_ages' is True then a 2-tuple is returned containing the upscaled points (and their interpolation params) and
+# a numpy array of their ages (sampled from the age grid).
+def calculate_upscaled_mask_interpolation_params(src_lon_lats, src_grid_spacing, upscaled_lon_lats_string, age_grid_filename, reduced_precision = False, output_ages = False):
     cpu_profile.start_calculate_upscaled_mask_interpolation_params()
     cpu_profile.start_upscaled_sample_age_grid()
 
@@ -526,12 +657,16 @@ def calculate_upscaled_mask_interpolation_params(src_lon_lats, src_grid_spacing,
     del upscaled_masked_lon_lat_ages_string  # free memory
     num_upscaled_points = len(upscaled_masked_lon_lat_ages_lines)
     upscaled_masked_lon_lats = np.empty((num_upscaled_points, 2), dtype=float)
+    if output_ages:
+        upscaled_masked_ages = np.empty(num_upscaled_points, dtype=float)
     for line_index, line in enumerate(upscaled_masked_lon_lat_ages_lines):
         # Each line returned by GMT grdtrack contains "longitude latitude age_grid_value".
         # Note that due to "-s" option to "gmt grdtrack" we will only get non-NaN age grid values.
-        lon_str, lat_str, _ = line.split()
+        lon_str, lat_str, age_str = line.split()
         lon, lat = float(lon_str), float(lat_str)
         upscaled_masked_lon_lats[line_index] = (lon, lat)
+        if output_ages:
+            upscaled_masked_ages[line_index] = float(age_str)
     del upscaled_masked_lon_lat_ages_lines  # free memory
     #memory_profile.print_object_memory_usage(upscaled_masked_lon_lats, 'upscaled_masked_lon_lats')
     
@@ -546,8 +681,12 @@ def calculate_upscaled_mask_interpolation_params(src_lon_lats, src_grid_spacing,
     # The upscaled points (lon, lat) and their interpolation parameters (source indices and weights).
     # Each upscaled point has 4 indices (into the source points) and 4 associated inverse-distance weights.
     # Note: If not all 4 indices/weights are used then the unused ones get a weight of zero.
-    upscaled_masked_lon_lat_index6_weight6 = np.zeros(num_upscaled_points, dtype=[('lon', 'f8'), ('lat', 'f8'), ('index', 'i4', 6), ('weight', 'f8', 6)])
+    # In reduced precision mode the lon/lat and weights are 32-bit (which more than halves the memory used).
+    float_type = 'f4' if reduced_precision else 'f8'
+    upscaled_masked_lon_lat_index6_weight6 = np.zeros(num_upscaled_points, dtype=[('lon', float_type), ('lat', float_type), ('index', 'i4', 6), ('weight', float_type, 6)])
     upscaled_masked_valid_index = 0
+    # The upscaled points excluded because they have no near neighbour source points (typically there are few, if any).
+    upscaled_masked_excluded_indices = []
 
     # Query the nearest neighbours of the upscaled points in a loop.
     # This reduces memory usage quite significantly (since each loop iteration processes a subset of points and hence uses less memory).
@@ -582,6 +721,7 @@ def calculate_upscaled_mask_interpolation_params(src_lon_lats, src_grid_spacing,
             # It's possible there are no near neighbours within the search radius.
             # This can happen if the source points did not adequately capture long thin geographical structures in the ocean.
             if not src_indices:
+                upscaled_masked_excluded_indices.append(upscaled_point_base_index + upscaled_point_index)
                 continue
 
             #
@@ -661,36 +801,52 @@ def calculate_upscaled_mask_interpolation_params(src_lon_lats, src_grid_spacing,
     
     # Resize the number of upscaled points since some might not be near any source points (and hence got excluded).
     upscaled_masked_lon_lat_index6_weight6 = upscaled_masked_lon_lat_index6_weight6[:upscaled_masked_valid_index]
+    if output_ages:
+        upscaled_masked_ages = np.delete(upscaled_masked_ages, upscaled_masked_excluded_indices)
 
     # The 'copy()' avoids the above view (slice) which does not count array storage.
     #memory_profile.print_object_memory_usage(upscaled_masked_lon_lat_index6_weight6.copy(), 'upscaled_masked_lon_lat_index6_weight6')
 
     cpu_profile.end_calculate_upscaled_mask_interpolation_params()
 
+    if output_ages:
+        return upscaled_masked_lon_lat_index6_weight6, upscaled_masked_ages
     return upscaled_masked_lon_lat_index6_weight6
 
 
-def write_upscaled_grd_file(grd_filename, scalars, upscaled_lon_lat_indices_weights, upscaled_grid_spacing):
-    cpu_profile.start_write_upscaled_grd_file()
+# Return the scalars (a numpy array) at the upscaled points interpolated from the scalars at the source points.
+def calculate_upscaled_scalars(scalars, upscaled_lon_lat_indices_weights):
     cpu_profile.start_calc_upscaled_scalars()
 
     # Calculate the upscaled scalars using the upscaled interpolation weights.
     #
     # Note: We avoid iterating over the upscaled points (in a for loop) to avoid the numpy call overhead per loop iteration
     #       (around 0.25 to 1.5 microseconds per call) when looping over, eg, 6.5 million points (for 0.1 degree upscaled grid spacing).
+    #
+    # For each upscaled point weight the scalars from near neighbour source points...
+    upscaled_scalars = np.sum(scalars[upscaled_lon_lat_indices_weights['index']] * upscaled_lon_lat_indices_weights['weight'], axis=1)
+
+    cpu_profile.end_calc_upscaled_scalars()
+
+    return upscaled_scalars
+
+
+def write_upscaled_grd_file(grd_filename, scalars, upscaled_lon_lat_indices_weights, upscaled_grid_spacing, region = None, grid_format = None):
+    cpu_profile.start_write_upscaled_grd_file()
+
     upscaled_lon_lat_scalars = np.column_stack((
             upscaled_lon_lat_indices_weights['lon'],  # lons
             upscaled_lon_lat_indices_weights['lat'],  # lats
-            # For each upscaled point weight the scalars from near neighbour source points...
-            np.sum(scalars[upscaled_lon_lat_indices_weights['index']] * upscaled_lon_lat_indices_weights['weight'], axis=1)))  # scalars
+            calculate_upscaled_scalars(scalars, upscaled_lon_lat_indices_weights)))  # scalars
     #memory_profile.print_object_memory_usage(upscaled_lon_lat_scalars, 'upscaled_lon_lat_scalars')
 
-    cpu_profile.end_calc_upscaled_scalars()
-
     # Convert array to a string for standard-input to GMT.
     upscaled_xyz_data = ''.join('{} {} {}\n'.format(lon, lat, scalar) for lon, lat, scalar in upscaled_lon_lat_scalars)
     #memory_profile.print_object_memory_usage(upscaled_xyz_data, 'upscaled_xyz_data')
 
+    # Write to a temporary file and then rename (see 'get_temporary_grd_filename()').
+    temporary_grd_filename = get_temporary_grd_filename(grd_filename)
+    
     # The command-line strings to execute GMT 'xyz2grd'.
     call_system_command([
             "gmt",
@@ -699,51 +855,149 @@ def write_upscaled_grd_file(grd_filename, scalars, upscaled_lon_lat_indices_weig
             # Use GMT gridline registration since our input point grid has data points on the grid lines.
             # Gridline registration is the default so we don't need to force pixel registration...
             # "-r", # Force pixel registration since data points are at centre of cells.
-            "-R{}/{}/{}/{}".format(-180, 180, -90, 90),
+            "-R{}/{}/{}/{}".format(*get_grid_region(upscaled_grid_spacing, region)),
             "-fg",
-            "-G{}".format(grd_filename)],
+            "-G{}".format(get_grd_filename_with_format(temporary_grd_filename, grid_format))],
             stdin=upscaled_xyz_data)
+    os.replace(temporary_grd_filename, grd_filename)
     
     cpu_profile.end_write_upscaled_grd_file()
 
     #print('..generated: {}'.format(os.path.basename(grd_filename)))
 
 
+# Fixed-size streaming sketches of the distribution of proximities of each ocean basin point (over its lifetime).
+#
+# Each point has a histogram of its proximities (so memory does not grow with the number of times, unlike storing each proximity).
+# The bins cover the proximities from zero to half the Earth's circumference (the largest distance) with bin edges spaced
+# quadratically, so bins are narrow at small proximities (where they matter most) and wide at large proximities.
+# Histograms of the same point can be merged by adding them, and sketches of disjoint points by concatenating them.
+class ProximityQuantileSketches(object):
+
+    # Number of bins in each point's histogram.
+    # With quadratically spaced bin edges the bin width is about 20kms at 100kms, 70kms at 1000kms and 310kms at 20000kms.
+    NUM_BINS = 128
+
+    # The largest proximity (half the Earth's circumference). Larger proximities are added to the last bin.
+    MAX_PROXIMITY_IN_KMS = math.pi * pygplates.Earth.mean_radius_in_kms
+
+    def __init__(self, num_points):
+        # The number of proximities of a point is its number of time steps, so 16-bit counts are plenty.
+        self.bin_counts = np.zeros((num_points, ProximityQuantileSketches.NUM_BINS), dtype=np.uint16)
+
+    def add(self, point_index, proximity_in_kms):
+        bin_index = int(ProximityQuantileSketches.NUM_BINS * math.sqrt(max(proximity_in_kms, 0.0) / ProximityQuantileSketches.MAX_PROXIMITY_IN_KMS))
+        if bin_index >= ProximityQuantileSketches.NUM_BINS:
+            bin_index = ProximityQuantileSketches.NUM_BINS - 1
+        self.bin_counts[point_index, bin_index] += 1
+
+    # Return a ProximityQuantileSketches containing the points of all the specified sketches (in the order specified).
+    @staticmethod
+    def concatenate(quantile_sketches):
+        concatenated_quantile_sketches = ProximityQuantileSketches(0)
+        concatenated_quantile_sketches.bin_counts = np.concatenate([sketches.bin_counts for sketches in quantile_sketches])
+        return concatenated_quantile_sketches
+
+    # Return array of the specified quantile (in the range [0, 1]) of the proximities of the points selected by 'point_mask'
+    # (each selected point must have at least one proximity).
+    #
+    # The quantile is interpolated linearly within its histogram bin, so its error is less than the bin width.
+    def get_quantiles(self, quantile, point_mask):
+        bin_counts = self.bin_counts[point_mask]
+        cumulative_bin_counts = np.cumsum(bin_counts, axis=1, dtype=np.int32)
+        # The (fractional) number of proximities below the quantile (for each point).
+        # Ensure it's non-zero so that a zero quantile finds the first non-empty bin (rather than the first bin).
+        quantile_counts = np.maximum(quantile * cumulative_bin_counts[:, -1], 1e-6)
+
+        # The bin containing the quantile is the first bin whose cumulative count reaches the quantile count.
+        quantile_bin_indices = np.argmax(cumulative_bin_counts >= quantile_counts[:, np.newaxis], axis=1)
+        point_indices = np.arange(len(quantile_bin_indices))
+        quantile_bin_counts = bin_counts[point_indices, quantile_bin_indices]  # non-zero since cumulative count increased in this bin
+        quantile_bin_fractions = (quantile_counts - (cumulative_bin_counts[point_indices, quantile_bin_indices] - quantile_bin_counts)) / quantile_bin_counts
+
+        # Interpolate between the lower and upper edges of the quantile bin.
+        lower_bin_edges = ProximityQuantileSketches.MAX_PROXIMITY_IN_KMS * np.square(quantile_bin_indices / ProximityQuantileSketches.NUM_BINS)
+        upper_bin_edges = ProximityQuantileSketches.MAX_PROXIMITY_IN_KMS * np.square((quantile_bin_indices + 1) / ProximityQuantileSketches.NUM_BINS)
+        return lower_bin_edges + quantile_bin_fractions * (upper_bin_edges - lower_bin_edges)
+
+
+def get_distance_percentile_name(percentile):
+    """The name of a distance percentile used in output filenames (eg, 'median' for 50 and 'p10' for 10)."""
+
+    if percentile == 50:
+        return 'median'
+    return 'p{:g}'.format(percentile)
+
+
 # Class to hold all proximity data for a specific age grid paleo time.
 class ProximityData(object):
 
-    def __init__(self, point_lons, point_lats, output_mean_proximity, output_standard_deviation_proximity, output_proximity_with_time, clamp_mean_proximity_in_kms=None):
+    def __init__(self, point_lons, point_lats, output_mean_proximity, output_standard_deviation_proximity, output_proximity_with_time, clamp_mean_proximity_in_kms=None,
+                 saturated_beyond_clamp=False, output_proximity_percentiles=None, reduced_precision=False):
         self.point_lons = point_lons
         self.point_lats = point_lats
 
         self.output_mean_proximity = output_mean_proximity
         self.output_standard_deviation_proximity = output_standard_deviation_proximity
         self.output_proximity_with_time = output_proximity_with_time
+        # Optional sequence of percentiles (in the range [0, 100]) of each point's proximities over its lifetime.
+        self.output_proximity_percentiles = output_proximity_percentiles
+        # Whether to accumulate statistics in 32-bit floats (and 16-bit counts) rather than 64-bit floats.
+        self.reduced_precision = reduced_precision
 
         self.clamp_mean_proximity_in_kms = clamp_mean_proximity_in_kms
+        # Whether proximities beyond a point's saturation proximity (see 'get_saturation_proximities()') were added as saturated values
+        # (rather than actual values). If so then the accumulated statistics are only valid for mean proximities clamped to (at most) the clamp.
+        self.saturated_beyond_clamp = saturated_beyond_clamp
 
         # Accumulate proximity statistics for each ocean basin point over time.
-        if self.output_mean_proximity or self.output_standard_deviation_proximity:
+        if self.has_point_statistics():
             # Statistics to calculate mean/standard-deviation for a single ocean basin point.
             # Each ocean basin point has (num_proximities, sum_proximities, sum_square_proximities) that start at zero.
             num_points = len(self.point_lons)
-            self.num_proximities = np.zeros(num_points, dtype=float)  # numpy array uses less memory
-            self.sum_proximities = np.zeros(num_points, dtype=float)  # numpy array uses less memory
-            self.sum_square_proximities = np.zeros(num_points, dtype=float)  # numpy array uses less memory
+            if self.reduced_precision:
+                # The number of proximities of a point is its number of time steps, so 16-bit counts are plenty.
+                self.num_proximities = np.zeros(num_points, dtype=np.uint16)
+                self.sum_proximities = np.zeros(num_points, dtype=np.float32)
+                self.sum_square_proximities = np.zeros(num_points, dtype=np.float32)
+                # A sample of points also accumulate in full precision (to measure the error of reduced precision).
+                num_error_sample_points = (num_points + REDUCED_PRECISION_ERROR_SAMPLE_STRIDE - 1) // REDUCED_PRECISION_ERROR_SAMPLE_STRIDE
+                self.error_sample_point_indices = np.arange(0, num_points, REDUCED_PRECISION_ERROR_SAMPLE_STRIDE)
+                self.error_sample_num_proximities = np.zeros(num_error_sample_points, dtype=float)
+                self.error_sample_sum_proximities = np.zeros(num_error_sample_points, dtype=float)
+                self.error_sample_sum_square_proximities = np.zeros(num_error_sample_points, dtype=float)
+            else:
+                self.num_proximities = np.zeros(num_points, dtype=float)  # numpy array uses less memory
+                self.sum_proximities = np.zeros(num_points, dtype=float)  # numpy array uses less memory
+                self.sum_square_proximities = np.zeros(num_points, dtype=float)  # numpy array uses less memory
             # Not all ocean basin points will necessarily have statistics (because they might have been deactivated immediately).
             self.valid_point_statistics = np.full(num_points, False, dtype=bool)  # numpy array uses less memory
+            # Sketches of the distribution of proximities for percentiles.
+            if self.output_proximity_percentiles:
+                self.quantile_sketches = ProximityQuantileSketches(num_points)
         
         # Keep a record of all proximity over time.
         if self.output_proximity_with_time:
             self.time_datas = {}  # dict indexed by time
     
+    # Whether statistics (over time) are accumulated for each point (for mean, standard deviation and/or percentile proximities).
+    def has_point_statistics(self):
+        return bool(self.output_mean_proximity or self.output_standard_deviation_proximity or self.output_proximity_percentiles)
+    
     def add_proximity(self, proximity_in_kms, time, ocean_basin_point_index, ocean_basin_reconstructed_lon, ocean_basin_reconstructed_lat):
         # Update the proximity statistics for the current ocean basin point.
-        if self.output_mean_proximity or self.output_standard_deviation_proximity:
+        if self.has_point_statistics():
             self.valid_point_statistics[ocean_basin_point_index] = True
             self.num_proximities[ocean_basin_point_index] += 1
             self.sum_proximities[ocean_basin_point_index] += proximity_in_kms
             self.sum_square_proximities[ocean_basin_point_index] += proximity_in_kms * proximity_in_kms
+            if self.reduced_precision and ocean_basin_point_index % REDUCED_PRECISION_ERROR_SAMPLE_STRIDE == 0:
+                error_sample_index = ocean_basin_point_index // REDUCED_PRECISION_ERROR_SAMPLE_STRIDE
+                self.error_sample_num_proximities[error_sample_index] += 1
+                self.error_sample_sum_proximities[error_sample_index] += proximity_in_kms
+                self.error_sample_sum_square_proximities[error_sample_index] += proximity_in_kms * proximity_in_kms
+            if self.output_proximity_percentiles:
+                self.quantile_sketches.add(ocean_basin_point_index, proximity_in_kms)
         
         # Add proximity for the current reconstructed point to a list for the reconstruction time.
         if self.output_proximity_with_time:
@@ -754,6 +1008,64 @@ class ProximityData(object):
             # Store the data for the current ocean point.
             self.time_datas[time][ocean_basin_point_index] = (ocean_basin_reconstructed_lon, ocean_basin_reconstructed_lat, proximity_in_kms)
     
+    # Return a ProximityData containing the points of all the specified ProximityData objects (in the order specified).
+    #
+    # This merges the results of processing separate spatial shards (disjoint subsets of points) of the same age grid.
+    # All specified ProximityData objects must have the same output options and clamp.
+    @staticmethod
+    def concatenate(proximity_datas):
+        first_proximity_data = proximity_datas[0]
+        concatenated_proximity_data = ProximityData(
+                np.concatenate([proximity_data.point_lons for proximity_data in proximity_datas]),
+                np.concatenate([proximity_data.point_lats for proximity_data in proximity_datas]),
+                first_proximity_data.output_mean_proximity,
+                first_proximity_data.output_standard_deviation_proximity,
+                first_proximity_data.output_proximity_with_time,
+                first_proximity_data.clamp_mean_proximity_in_kms,
+                first_proximity_data.saturated_beyond_clamp,
+                first_proximity_data.output_proximity_percentiles,
+                first_proximity_data.reduced_precision)
+        
+        if first_proximity_data.has_point_statistics():
+            concatenated_proximity_data.num_proximities = np.concatenate([proximity_data.num_proximities for proximity_data in proximity_datas])
+            concatenated_proximity_data.sum_proximities = np.concatenate([proximity_data.sum_proximities for proximity_data in proximity_datas])
+            concatenated_proximity_data.sum_square_proximities = np.concatenate([proximity_data.sum_square_proximities for proximity_data in proximity_datas])
+            concatenated_proximity_data.valid_point_statistics = np.concatenate([proximity_data.valid_point_statistics for proximity_data in proximity_datas])
+            if first_proximity_data.output_proximity_percentiles:
+                concatenated_proximity_data.quantile_sketches = ProximityQuantileSketches.concatenate(
+                        [proximity_data.quantile_sketches for proximity_data in proximity_datas])
+            if first_proximity_data.reduced_precision:
+                # The error sample point indices of each ProximityData are offset by the number of points before it.
+                point_index_offsets = np.cumsum([0] + [len(proximity_data.point_lons) for proximity_data in proximity_datas[:-1]])
+                concatenated_proximity_data.error_sample_point_indices = np.concatenate([proximity_data.error_sample_point_indices + point_index_offset
+                        for proximity_data, point_index_offset in zip(proximity_datas, point_index_offsets)])
+                concatenated_proximity_data.error_sample_num_proximities = np.concatenate([proximity_data.error_sample_num_proximities for proximity_data in proximity_datas])
+                concatenated_proximity_data.error_sample_sum_proximities = np.concatenate([proximity_data.error_sample_sum_proximities for proximity_data in proximity_datas])
+                concatenated_proximity_data.error_sample_sum_square_proximities = np.concatenate([proximity_data.error_sample_sum_square_proximities for proximity_data in proximity_datas])
+        
+        if first_proximity_data.output_proximity_with_time:
+            times = []
+            for proximity_data in proximity_datas:
+                times.extend(time for time in proximity_data.time_datas.keys() if time not in times)
+            for time in times:
+                # Points (of a ProximityData) not reconstructed to 'time' are invalid.
+                concatenated_proximity_data.time_datas[time] = np.ma.concatenate([
+                        proximity_data.time_datas[time] if time in proximity_data.time_datas
+                            else np.ma.masked_all((len(proximity_data.point_lons), 3), dtype=float)
+                        for proximity_data in proximity_datas])
+        
+        return concatenated_proximity_data
+    
+    # Return the proximity (in kms), for each specified point, above which its clamped mean proximity is guaranteed to be the clamp value
+    # (regardless of its remaining proximities) given an upper bound on its total number of proximities (over its lifetime).
+    #
+    # The returned proximities can be negative (if a point's clamped mean proximity is already guaranteed to be the clamp value).
+    # Note: This requires that mean proximities are clamped.
+    def get_saturation_proximities(self, point_indices, max_num_proximities):
+        # Proximities are non-negative, so if the sum of proximities reaches 'clamp * max_num_proximities' then the mean
+        # proximity (sum divided by actual number of proximities) will be at least the clamp value.
+        return self.clamp_mean_proximity_in_kms * max_num_proximities - self.sum_proximities[point_indices]
+    
     # Return the list of times (added with 'add_proximity()').
     def get_times(self):
         return list(self.time_datas.keys())
@@ -783,7 +1095,8 @@ class ProximityData(object):
             valid_stats_mask = self.valid_point_statistics
 
             # Calculate a mean proximity over time for each ocean basin point (that has statistics).
-            mean_proximity = self.sum_proximities[valid_stats_mask] / self.num_proximities[valid_stats_mask]
+            # Note: Converting to 64-bit (if reduced precision) means only the accumulation is in reduced precision.
+            mean_proximity = self.sum_proximities[valid_stats_mask].astype(float) / self.num_proximities[valid_stats_mask]
 
             # Clamp mean proximity if requested.
             if self.clamp_mean_proximity_in_kms is not None:
@@ -801,20 +1114,577 @@ class ProximityData(object):
             valid_stats_mask = self.valid_point_statistics
 
             # Calculate a standard deviation proximity over time for each ocean basin point.
-            mean_proximity = self.sum_proximities[valid_stats_mask] / self.num_proximities[valid_stats_mask]
-            standard_deviation_proximity = np.sqrt(
-                    # Ensure >= 0 since numerical precision can result in a slightly negative value (when standard deviation is zero)...
-                    np.maximum((self.sum_square_proximities[valid_stats_mask] / self.num_proximities[valid_stats_mask]) - (mean_proximity * mean_proximity),
-                               0.0))
-
-            # Ensure not negative due to numerical precision (ie, sqrt(negative_number)).
-            standard_deviation_proximity[np.isnan(standard_deviation_proximity)] = 0.0
-            
-            return standard_deviation_proximity
+            return ProximityData._calculate_standard_deviations(
+                    self.num_proximities[valid_stats_mask],
+                    self.sum_proximities[valid_stats_mask],
+                    self.sum_square_proximities[valid_stats_mask])
+        else:
+            return []
+    
+    @staticmethod
+    def _calculate_standard_deviations(num_proximities, sum_proximities, sum_square_proximities):
+        # Note: Converting to 64-bit (if reduced precision) means only the accumulation is in reduced precision.
+        num_proximities = num_proximities.astype(float)
+        mean_proximity = sum_proximities / num_proximities
+        standard_deviation_proximity = np.sqrt(
+                # Ensure >= 0 since numerical precision can result in a slightly negative value (when standard deviation is zero)...
+                np.maximum((sum_square_proximities / num_proximities) - (mean_proximity * mean_proximity),
+                           0.0))
+
+        # Ensure not negative due to numerical precision (ie, sqrt(negative_number)).
+        standard_deviation_proximity[np.isnan(standard_deviation_proximity)] = 0.0
+        
+        return standard_deviation_proximity
+    
+    # Return the 2-tuple (max_mean_error, max_standard_deviation_error) in kms of the (unclamped) mean and standard deviation proximities
+    # accumulated in reduced precision, measured against full precision at a sample of the points (see 'REDUCED_PRECISION_ERROR_SAMPLE_STRIDE').
+    # Returns (0, 0) if not in reduced precision mode (or no sampled point has statistics).
+    def get_reduced_precision_errors(self):
+        if not self.reduced_precision or not self.has_point_statistics():
+            return 0.0, 0.0
+        
+        sample_mask = self.error_sample_num_proximities > 0
+        if not np.any(sample_mask):
+            return 0.0, 0.0
+        sample_point_indices = self.error_sample_point_indices[sample_mask]
+        
+        # Reduced precision (at the sampled points).
+        reduced_means = self.sum_proximities[sample_point_indices].astype(float) / self.num_proximities[sample_point_indices]
+        reduced_standard_deviations = ProximityData._calculate_standard_deviations(
+                self.num_proximities[sample_point_indices],
+                self.sum_proximities[sample_point_indices].astype(float),
+                self.sum_square_proximities[sample_point_indices].astype(float))
+        
+        # Full precision (at the sampled points).
+        full_means = self.error_sample_sum_proximities[sample_mask] / self.error_sample_num_proximities[sample_mask]
+        full_standard_deviations = ProximityData._calculate_standard_deviations(
+                self.error_sample_num_proximities[sample_mask],
+                self.error_sample_sum_proximities[sample_mask],
+                self.error_sample_sum_square_proximities[sample_mask])
+        
+        return (float(np.max(np.abs(reduced_means - full_means))),
+                float(np.max(np.abs(reduced_standard_deviations - full_standard_deviations))))
+    
+    # Return the number of bytes used by the accumulated statistics (excluding any quantile sketches and error samples).
+    def get_statistics_nbytes(self):
+        if not self.has_point_statistics():
+            return 0
+        return (self.num_proximities.nbytes + self.sum_proximities.nbytes + self.sum_square_proximities.nbytes +
+                self.valid_point_statistics.nbytes)
+    
+    # Return array of the specified percentile (in the range [0, 100]) of proximities (over time).
+    # Each array element is a single percentile proximity (accurate to within the width of a sketch histogram bin).
+    # The order and number of elements is same as 'get_mean_standard_deviation_lon_lats()'.
+    def get_percentiles(self, percentile):
+        if self.output_proximity_percentiles:
+            return self.quantile_sketches.get_quantiles(percentile / 100.0, self.valid_point_statistics)
         else:
             return []
 
 
+@dataclass
+class ProximityStatistics:
+    """The mean/standard-deviation accumulators of an age grid read from a file written by 'write_proximity_statistics_file()'."""
+
+    # Contains only the ocean basin points that have statistics (with mean and standard deviation outputs enabled).
+    proximity_data: ProximityData
+    age_grid_filename: str
+    age_grid_paleo_time: float
+    # Prefix of the output filenames (eg, the name of an additional proximity target followed by '_').
+    output_filename_prefix: str
+    # The (ocean_basin_grid_spacing, upscale_mean_std_dev_grid_spacing, region) tuple of the grid files written with the statistics,
+    # or None if xyz files were written (see 'output_grd_files' in 'write_proximity_data()').
+    output_grd_files: Optional[Tuple[float, Optional[float], Optional[Tuple[float, float, float, float]]]]
+
+
+def write_proximity_statistics_file(
+        statistics_filename,
+        proximity_data,
+        age_grid_filename,
+        age_grid_paleo_time,
+        output_grd_files = None,
+        output_filename_prefix = ''):
+    """
+    Write the mean/standard-deviation accumulators (number, sum and sum-of-squares of proximities) of the ocean basin points in 'proximity_data'
+    (and their quantile sketches, if percentiles are output).
+
+    Only points that have statistics are written (in a compressed '.npz' file). The mean, standard deviation and percentile grids can later be
+    regenerated from the file (eg, with a different clamp or upscaled grid spacing) without recalculating the proximities.
+    See 'read_proximity_statistics_file()' and 'regenerate_proximity_grids()'.
+    """
+
+    valid_stats_mask = proximity_data.valid_point_statistics
+    statistics_arrays = {
+        'point_lons' : proximity_data.point_lons[valid_stats_mask],
+        'point_lats' : proximity_data.point_lats[valid_stats_mask],
+        # The number of proximities of a point is its number of time steps, so 32-bit is plenty.
+        'num_proximities' : proximity_data.num_proximities[valid_stats_mask].astype(np.uint32),
+        'sum_proximities' : proximity_data.sum_proximities[valid_stats_mask],
+        'sum_square_proximities' : proximity_data.sum_square_proximities[valid_stats_mask],
+        'clamp_mean_proximity_in_kms' : proximity_data.clamp_mean_proximity_in_kms if proximity_data.clamp_mean_proximity_in_kms is not None else np.nan,
+        'saturated_beyond_clamp' : proximity_data.saturated_beyond_clamp,
+        'age_grid_filename' : age_grid_filename,
+        'age_grid_paleo_time' : age_grid_paleo_time,
+        'output_filename_prefix' : output_filename_prefix,
+    }
+    if proximity_data.output_proximity_percentiles:
+        statistics_arrays['quantile_sketch_bin_counts'] = proximity_data.quantile_sketches.bin_counts[valid_stats_mask]
+    if output_grd_files:
+        ocean_basin_grid_spacing, upscale_mean_std_dev_grid_spacing, region = output_grd_files
+        statistics_arrays['ocean_basin_grid_spacing'] = ocean_basin_grid_spacing
+        statistics_arrays['upscale_mean_std_dev_grid_spacing'] = upscale_mean_std_dev_grid_spacing if upscale_mean_std_dev_grid_spacing is not None else np.nan
+        statistics_arrays['region'] = np.array(region if region is not None else [], dtype=float)
+
+    # Write to a temporary file and then rename, so that other processes never read a partially written file.
+    temporary_filename = '{}.{}.tmp'.format(statistics_filename, os.getpid())
+    with open(temporary_filename, 'wb') as temporary_file:
+        np.savez_compressed(temporary_file, **statistics_arrays)
+    os.replace(temporary_filename, statistics_filename)
+
+
+def read_proximity_statistics_file(statistics_filename):
+    """Read a file written by 'write_proximity_statistics_file()' and return a 'ProximityStatistics'."""
+
+    with np.load(statistics_filename) as statistics_arrays:
+        clamp_mean_proximity_in_kms = float(statistics_arrays['clamp_mean_proximity_in_kms'])
+        proximity_data = ProximityData(
+                statistics_arrays['point_lons'],
+                statistics_arrays['point_lats'],
+                True,  # output_mean_proximity
+                True,  # output_standard_deviation_proximity
+                False,  # output_proximity_with_time
+                clamp_mean_proximity_in_kms if not math.isnan(clamp_mean_proximity_in_kms) else None,
+                bool(statistics_arrays['saturated_beyond_clamp']))
+        proximity_data.num_proximities = statistics_arrays['num_proximities'].astype(float)
+        proximity_data.sum_proximities = statistics_arrays['sum_proximities']
+        proximity_data.sum_square_proximities = statistics_arrays['sum_square_proximities']
+        # Only points with statistics were written.
+        proximity_data.valid_point_statistics = np.full(len(proximity_data.point_lons), True, dtype=bool)
+        # Percentiles can only be regenerated if the quantile sketches were written.
+        if 'quantile_sketch_bin_counts' in statistics_arrays:
+            proximity_data.quantile_sketches = ProximityQuantileSketches(0)
+            proximity_data.quantile_sketches.bin_counts = statistics_arrays['quantile_sketch_bin_counts']
+
+        if 'ocean_basin_grid_spacing' in statistics_arrays:
+            upscale_mean_std_dev_grid_spacing = float(statistics_arrays['upscale_mean_std_dev_grid_spacing'])
+            region = statistics_arrays['region']
+            output_grd_files = (
+                    float(statistics_arrays['ocean_basin_grid_spacing']),
+                    upscale_mean_std_dev_grid_spacing if not math.isnan(upscale_mean_std_dev_grid_spacing) else None,
+                    tuple(float(region_bound) for region_bound in region) if len(region) else None)
+        else:
+            output_grd_files = None
+
+        return ProximityStatistics(
+                proximity_data,
+                str(statistics_arrays['age_grid_filename']),
+                float(statistics_arrays['age_grid_paleo_time']),
+                str(statistics_arrays['output_filename_prefix']),
+                output_grd_files)
+
+
+def get_age_grid_max_age(age_grid_filename):
+    """Return the maximum age in the specified age grid (or None if it has no valid ages)."""
+    
+    stdout_data = call_system_command(
+            # The command-line strings to execute GMT 'grdinfo' (in tab-separated single-line format)...
+            ["gmt", "grdinfo", "-C", age_grid_filename],
+            return_stdout=True)
+    
+    # The maximum grid value is the 7th column (after the filename, the 4 region bounds and the minimum grid value).
+    for line in stdout_data.splitlines():
+        line_data = line.split('\t')
+        if len(line_data) < 7:
+            continue
+        try:
+            max_age = float(line_data[6])
+        except ValueError:
+            continue
+        if math.isnan(max_age):
+            return None
+        return max_age
+    
+    return None
+
+
+def are_same_files(filenames, other_filenames):
+    """Return True if both sequences of filenames refer to the same set of files."""
+    
+    try:
+        return (set(os.path.abspath(filename) for filename in filenames) ==
+                set(os.path.abspath(filename) for filename in other_filenames))
+    except TypeError:
+        # Not a sequence of filenames (eg, feature collections).
+        return False
+
+
+# Index of features by their valid time periods (so the features that exist at a particular time can be found quickly).
+#
+# Some feature collections (eg, those generated by the continent contouring workflow) contain a separate snapshot feature for each time.
+# Passing only the features that exist at a time to 'pygplates.reconstruct()' avoids it visiting all the other features (at every time step).
+class FeatureTimeIndex(object):
+    
+    # pyGPlates compares times using a tolerance, so include features within this tolerance of their valid time periods
+    # (any features that pyGPlates considers invalid will still get excluded by 'pygplates.reconstruct()').
+    _TIME_TOLERANCE = 1e-6
+    
+    def __init__(self, features):
+        self.features = list(features)
+        
+        valid_times = [feature.get_valid_time() for feature in self.features]
+        self.begin_times = np.array([begin_time for begin_time, _ in valid_times], dtype=float)  # distant past is +inf
+        self.end_times = np.array([end_time for _, end_time in valid_times], dtype=float)  # distant future is -inf
+    
+    def get_features_at_time(self, time):
+        """Return the features (in their original order) whose valid time periods contain 'time'."""
+        feature_indices = np.nonzero(
+                (self.begin_times >= time - FeatureTimeIndex._TIME_TOLERANCE) &
+                (self.end_times <= time + FeatureTimeIndex._TIME_TOLERANCE))[0]
+        features = self.features
+        return [features[feature_index] for feature_index in feature_indices.tolist()]
+
+
+def reconstruct_proximity_geometries(
+        proximity_features,  # FeatureTimeIndex if non-topological
+        proximity_features_are_topological,
+        proximity_feature_types,  # sequence of pygplates.FeatureType (or None)
+        rotation_model,
+        time,
+        topological_snapshot = None):
+    """
+    Return the proximity geometries (topological boundary sections or reconstructed non-topological features) at 'time'.
+    
+    If the proximity features are topological and 'topological_snapshot' is specified then its resolved topological sections are used
+    (instead of resolving the proximity features). It must be a snapshot of the proximity features at 'time'.
+    """
+    
+    if proximity_features_are_topological:
+        if topological_snapshot is not None:
+            # Reuse the topologies already resolved to the current 'time'.
+            proximity_shared_boundary_sections = topological_snapshot.get_resolved_topological_sections()
+        else:
+            # Resolve our topological plate polygons (and deforming networks) to the current 'time'.
+            # We generate both the resolved topology boundaries and the boundary sections between them.
+            proximity_resolved_topologies = []
+            proximity_shared_boundary_sections = []
+            pygplates.resolve_topologies(proximity_features, rotation_model, proximity_resolved_topologies, time, proximity_shared_boundary_sections)
+            del proximity_resolved_topologies  # free memory
+        
+        # Iterate over the shared boundary sections of all resolved topologies.
+        proximity_reconstructed_geometries = []
+        for proximity_shared_boundary_section in proximity_shared_boundary_sections:
+            # Skip sections that are not included in the list of boundary feature types (if any).
+            proximity_feature = proximity_shared_boundary_section.get_feature()
+            if (proximity_feature_types and
+                proximity_feature.get_feature_type() not in proximity_feature_types):
+                continue
+            
+            # Iterate over the shared sub-segments of the current boundary line.
+            # These are the parts of the boundary line that actually contribute to topological boundaries.
+            for proximity_shared_sub_segment in proximity_shared_boundary_section.get_shared_sub_segments():
+                proximity_reconstructed_geometries.append(proximity_shared_sub_segment.get_resolved_geometry())
+        
+    else: # non-topological features...
+        
+        # Reconstruct the non-topological features that exist at the current 'time'.
+        proximity_reconstructed_feature_geometries = []
+        pygplates.reconstruct(proximity_features.get_features_at_time(time), rotation_model, proximity_reconstructed_feature_geometries, time)
+        
+        proximity_reconstructed_geometries = []
+        for proximity_reconstructed_feature_geometry in proximity_reconstructed_feature_geometries:
+            proximity_reconstructed_geometries.append(proximity_reconstructed_feature_geometry.get_reconstructed_geometry())
+    
+    return proximity_reconstructed_geometries
+
+
+def reconstruct_obstacle_geometries(
+        obstacle_features,  # FeatureTimeIndex
+        plate_boundary_obstacle_feature_types,  # sequence of pygplates.FeatureType (or None)
+        rotation_model,
+        topological_snapshot,  # only used if 'plate_boundary_obstacle_feature_types' is not empty
+        time):
+    """Return the reconstructed continent obstacle geometries, followed by the plate boundary obstacle geometries, at 'time'."""
+    
+    # Reconstruct the continent obstacles.
+    obstacle_reconstructed_feature_geometries = []
+    pygplates.reconstruct(obstacle_features.get_features_at_time(time), rotation_model, obstacle_reconstructed_feature_geometries, time)
+    obstacle_reconstructed_geometries = [obstacle_reconstructed_feature_geometry.get_reconstructed_geometry()
+                                         for obstacle_reconstructed_feature_geometry in obstacle_reconstructed_feature_geometries]
+
+    # Get the plate boundary obstacles (if using any plate boundary feature types as obstacles).
+    if plate_boundary_obstacle_feature_types:
+        plate_boundary_obstacle_shared_boundary_sections = topological_snapshot.get_resolved_topological_sections()
+        for plate_boundary_obstacle_shared_boundary_section in plate_boundary_obstacle_shared_boundary_sections:
+            # Skip sections that are not included in the list of boundary feature types (if any).
+            plate_boundary_obstacle_feature = plate_boundary_obstacle_shared_boundary_section.get_feature()
+            if plate_boundary_obstacle_feature.get_feature_type() not in plate_boundary_obstacle_feature_types:
+                continue
+            
+            for plate_boundary_obstacle_shared_sub_segment in plate_boundary_obstacle_shared_boundary_section.get_shared_sub_segments():
+                obstacle_reconstructed_geometries.append(plate_boundary_obstacle_shared_sub_segment.get_resolved_geometry())
+    
+    return obstacle_reconstructed_geometries
+
+
+# Store of reconstructed proximity and obstacle geometries at various times (each time is a separate '.npz' file in a directory).
+#
+# Reconstructing (and resolving) the proximity and obstacle features is repeated by every task (group of age grids) that
+# covers a particular time. Instead the reconstructed geometries at each time can be written once and then read by all tasks.
+# Geometries are stored as vertex arrays (pygplates geometries are not picklable, and this is also more compact).
+class ReconstructionSnapshots(object):
+    
+    # Geometry types.
+    _POINT = 0
+    _MULTI_POINT = 1
+    _POLYLINE = 2
+    _POLYGON = 3
+    
+    def __init__(self, snapshot_directory):
+        self.snapshot_directory = snapshot_directory
+    
+    def has_snapshot(self, time):
+        return os.path.exists(self._get_snapshot_filename(time))
+    
+    def write_snapshot(self, time, proximity_geometries, obstacle_geometries):
+        snapshot_arrays = {}
+        snapshot_arrays.update(ReconstructionSnapshots._geometries_to_arrays(proximity_geometries, 'proximity_'))
+        snapshot_arrays.update(ReconstructionSnapshots._geometries_to_arrays(obstacle_geometries, 'obstacle_'))
+        
+        # Write to a temporary file and then rename, so that other processes never read a partially written file.
+        snapshot_filename = self._get_snapshot_filename(time)
+        temporary_filename = '{}.{}.tmp'.format(snapshot_filename, os.getpid())
+        with open(temporary_filename, 'wb') as temporary_file:
+            np.savez(temporary_file, **snapshot_arrays)
+        os.replace(temporary_filename, snapshot_filename)
+    
+    # Returns the 2-tuple (proximity_geometries, obstacle_geometries).
+    def read_snapshot(self, time):
+        with np.load(self._get_snapshot_filename(time)) as snapshot_arrays:
+            proximity_geometries = ReconstructionSnapshots._arrays_to_geometries(snapshot_arrays, 'proximity_')
+            obstacle_geometries = ReconstructionSnapshots._arrays_to_geometries(snapshot_arrays, 'obstacle_')
+        
+        return proximity_geometries, obstacle_geometries
+    
+    def _get_snapshot_filename(self, time):
+        return os.path.join(self.snapshot_directory, 'snapshot_{}.npz'.format(time))
+    
+    @staticmethod
+    def _geometries_to_arrays(geometries, array_name_prefix):
+        # Each geometry has one or more rings (only polygons with interior rings have more than one) and each ring has one or more points.
+        geometry_types = []
+        geometry_ring_offsets = [0]
+        ring_point_offsets = [0]
+        points_xyz = []
+        for geometry in geometries:
+            if isinstance(geometry, pygplates.PointOnSphere):
+                geometry_types.append(ReconstructionSnapshots._POINT)
+                rings_xyz = [[geometry.to_xyz()]]
+            elif isinstance(geometry, pygplates.MultiPointOnSphere):
+                geometry_types.append(ReconstructionSnapshots._MULTI_POINT)
+                rings_xyz = [geometry.to_xyz_array()]
+            elif isinstance(geometry, pygplates.PolylineOnSphere):
+                geometry_types.append(ReconstructionSnapshots._POLYLINE)
+                rings_xyz = [geometry.to_xyz_array()]
+            else:  # polygon...
+                geometry_types.append(ReconstructionSnapshots._POLYGON)
+                # Polygons with interior rings are supported by pyGPlates 0.36 and above.
+                if hasattr(geometry, 'get_number_of_interior_rings') and geometry.get_number_of_interior_rings() > 0:
+                    rings_xyz = [[point.to_xyz() for point in geometry.get_exterior_ring_points()]]
+                    for interior_ring_index in range(geometry.get_number_of_interior_rings()):
+                        rings_xyz.append([point.to_xyz() for point in geometry.get_interior_ring_points(interior_ring_index)])
+                else:
+                    rings_xyz = [geometry.to_xyz_array()]
+            
+            for ring_xyz in rings_xyz:
+                ring_xyz = np.asarray(ring_xyz, dtype=float).reshape(-1, 3)
+                points_xyz.append(ring_xyz)
+                ring_point_offsets.append(ring_point_offsets[-1] + len(ring_xyz))
+            geometry_ring_offsets.append(len(ring_point_offsets) - 1)
+        
+        return {
+            array_name_prefix + 'geometry_types' : np.array(geometry_types, dtype=np.int8),
+            array_name_prefix + 'geometry_ring_offsets' : np.array(geometry_ring_offsets, dtype=np.int64),
+            array_name_prefix + 'ring_point_offsets' : np.array(ring_point_offsets, dtype=np.int64),
+            array_name_prefix + 'points_xyz' : np.concatenate(points_xyz) if points_xyz else np.empty((0, 3), dtype=float)}
+    
+    @staticmethod
+    def _arrays_to_geometries(snapshot_arrays, array_name_prefix):
+        geometry_types = snapshot_arrays[array_name_prefix + 'geometry_types'].tolist()
+        geometry_ring_offsets = snapshot_arrays[array_name_prefix + 'geometry_ring_offsets'].tolist()
+        ring_point_offsets = snapshot_arrays[array_name_prefix + 'ring_point_offsets'].tolist()
+        points_xyz = snapshot_arrays[array_name_prefix + 'points_xyz']
+        
+        geometries = []
+        for geometry_index, geometry_type in enumerate(geometry_types):
+            # Note: The stored (x,y,z) values are already unit length (they came from pyGPlates points).
+            rings = [[pygplates.PointOnSphere(x, y, z) for x, y, z in points_xyz[ring_point_offsets[ring_index] : ring_point_offsets[ring_index + 1]].tolist()]
+                     for ring_index in range(geometry_ring_offsets[geometry_index], geometry_ring_offsets[geometry_index + 1])]
+            if geometry_type == ReconstructionSnapshots._POINT:
+                geometries.append(rings[0][0])
+            elif geometry_type == ReconstructionSnapshots._MULTI_POINT:
+                geometries.append(pygplates.MultiPointOnSphere(rings[0]))
+            elif geometry_type == ReconstructionSnapshots._POLYLINE:
+                geometries.append(pygplates.PolylineOnSphere(rings[0]))
+            elif len(rings) > 1:
+                geometries.append(pygplates.PolygonOnSphere(rings[0], rings[1:]))
+            else:
+                geometries.append(pygplates.PolygonOnSphere(rings[0]))
+        
+        return geometries
+
+
+def generate_reconstruction_snapshots(
+        reconstruction_snapshots,
+        times,
+        rotation_filenames,
+        proximity_filenames,
+        proximity_features_are_topological,
+        proximity_feature_types,
+        topological_reconstruction_filenames,
+        continent_obstacle_filenames = None,
+        plate_boundary_obstacle_feature_types = DEFAULT_PLATE_BOUNDARY_OBSTACLE_FEATURE_TYPES,  # only used in 'continent_obstacle_filenames' is not None
+        anchor_plate_id = 0):
+    """
+    Write the reconstructed proximity geometries (and obstacle geometries if continent obstacle filenames are specified) at each time in 'times'
+    to the specified ReconstructionSnapshots (only for those times that don't already have a snapshot).
+    """
+    
+    times = [time for time in times if not reconstruction_snapshots.has_snapshot(time)]
+    if not times:
+        return
+    
+    rotation_model = plate_model_cache.load_rotation_model(rotation_filenames, anchor_plate_id)
+    
+    # Load the proximity features the same way as 'proximity()' (so the snapshots match what it would reconstruct).
+    proximity_features, proximity_feature_types = load_proximity_features(
+            proximity_filenames, proximity_features_are_topological, proximity_feature_types)
+    
+    # If the topological proximity features are the topological reconstruction features then
+    # they can share the topologies resolved for the plate boundary obstacles (if any).
+    proximity_features_share_topological_model = (proximity_features_are_topological and
+            are_same_files(proximity_filenames, topological_reconstruction_filenames))
+    
+    if continent_obstacle_filenames or proximity_features_share_topological_model:
+        topology_reconstruction_features = plate_model_cache.load_features(topological_reconstruction_filenames)
+    
+    if continent_obstacle_filenames:
+        obstacle_features, plate_boundary_obstacle_feature_types = load_obstacle_features(
+                continent_obstacle_filenames, plate_boundary_obstacle_feature_types)
+    
+    for time in times:
+        # Resolve the topologies (once) if needed by the proximity features and/or the plate boundary obstacles.
+        if (proximity_features_share_topological_model or
+            (continent_obstacle_filenames and plate_boundary_obstacle_feature_types)):
+            # Create the topological model at each time step to avoid accumulating resolved topologies (see 'proximity()').
+            topological_snapshot = pygplates.TopologicalModel(topology_reconstruction_features, rotation_model).topological_snapshot(time)
+        else:
+            topological_snapshot = None
+        
+        proximity_geometries = reconstruct_proximity_geometries(
+                proximity_features, proximity_features_are_topological, proximity_feature_types, rotation_model, time,
+                topological_snapshot if proximity_features_share_topological_model else None)
+        
+        if continent_obstacle_filenames:
+            obstacle_geometries = reconstruct_obstacle_geometries(
+                    obstacle_features, plate_boundary_obstacle_feature_types, rotation_model, topological_snapshot, time)
+        else:
+            obstacle_geometries = []
+        
+        del topological_snapshot  # free memory
+        
+        reconstruction_snapshots.write_snapshot(time, proximity_geometries, obstacle_geometries)
+
+
+@dataclass
+class ProximityTarget:
+    """
+    A named set of proximity features (eg, river mouths) whose distances are calculated in addition to those of the main proximity features.
+    
+    See 'additional_proximity_targets' in 'proximity()'.
+    """
+    
+    # Used to name the output files (eg, "<name>_mean_distance_<...>.nc").
+    name: str
+    proximity_filenames: List[str]
+    proximity_features_are_topological: bool = False
+    # Defaults to all proximity features.
+    proximity_feature_types: Optional[List[str]] = None
+
+
+@dataclass
+class SedimentPrediction:
+    """
+    A sediment thickness (or sedimentation rate) predicted directly from the in-memory mean distances of each age grid.
+    
+    The prediction is written to the grid file "<output_filename_prefix>_<age_grid_paleo_time>.nc" (with the upscaled grid spacing),
+    without writing (and reading back) a mean distance grid. See 'sediment_predictions' in 'write_proximity_data()'.
+    """
+    
+    # A 'sediment_prediction.SedimentPredictionModel' (or anything with a 'predict(ages, distances)' method).
+    model: Any
+    # Eg, "sedimentation_output/predicted_thickness/sed_thick_0.1d".
+    output_filename_prefix: str
+
+
+def load_proximity_features(
+        proximity_filenames,
+        proximity_features_are_topological,
+        proximity_feature_types):
+    """
+    Load the proximity features (for 'proximity()') and return a 2-tuple of the features and their feature types (as pygplates.FeatureType's).
+    
+    Non-topological features are filtered by the feature types (if any) and indexed by their valid time (see 'FeatureTimeIndex').
+    """
+    
+    # Read/parse the proximity features once so we're not doing at each time iteration.
+    proximity_features = plate_model_cache.load_features(proximity_filenames)
+
+    if proximity_feature_types:
+        # Create pygplates.FeatureType's from the strings.
+        # We do this here since pygplates' objects are not yet pickable
+        # (which is required for objects passed via multiprocessing).
+        proximity_feature_types = [pygplates.FeatureType.create_from_qualified_string(feature_type)
+            for feature_type in proximity_feature_types]
+    
+        # For *non-topological* features we can remove those not matching the allowed feature types.
+        # Note that we can't do this for *topological* features because we need to resolve *all* topologies and
+        # then filter out the shared topology sections by feature type.
+        if not proximity_features_are_topological:
+            # Create a new list containing only features matching the allowed feature types.
+            proximity_features = [feature for feature in proximity_features
+                    if feature.get_feature_type() in proximity_feature_types]
+    
+    # Index the non-topological features by their valid time periods.
+    # Each time step then only reconstructs the features that exist at that time (rather than all features).
+    if not proximity_features_are_topological:
+        proximity_features = FeatureTimeIndex(proximity_features)
+    
+    return proximity_features, proximity_feature_types
+
+
+def load_obstacle_features(
+        continent_obstacle_filenames,
+        plate_boundary_obstacle_feature_types):
+    """
+    Load the continent obstacle features (for 'proximity()') and return a 2-tuple of the features and the plate boundary obstacle
+    feature types (as pygplates.FeatureType's).
+    
+    The obstacle features are indexed by their valid time (see 'FeatureTimeIndex').
+    """
+    
+    # Index the obstacle features by their valid time periods (same as non-topological proximity features).
+    obstacle_features = FeatureTimeIndex(plate_model_cache.load_features(continent_obstacle_filenames))
+    
+    if plate_boundary_obstacle_feature_types:
+        # Create pygplates.FeatureType's from the strings.
+        # We do this here since pygplates' objects are not yet pickable
+        # (which is required for objects passed via multiprocessing).
+        plate_boundary_obstacle_feature_types = [pygplates.FeatureType.create_from_qualified_string(feature_type)
+            for feature_type in plate_boundary_obstacle_feature_types]
+    
+    return obstacle_features, plate_boundary_obstacle_feature_types
+
+
 def proximity(
         input_points, # List of (lon, lat) tuples.
         rotation_filenames,
@@ -832,7 +1702,14 @@ def proximity(
         plate_boundary_obstacle_feature_types = DEFAULT_PLATE_BOUNDARY_OBSTACLE_FEATURE_TYPES,  # only used in 'continent_obstacle_filenames' is not None
         anchor_plate_id = 0,
         proximity_distance_threshold_radians = None,
-        clamp_mean_proximity_distance_radians = None):
+        clamp_mean_proximity_distance_radians = None,
+        simplify_geometries = False,
+        shortest_path_grid_filename = None,
+        bound_distance_search_by_clamp = False,
+        reconstruction_snapshot_directory = None,
+        additional_proximity_targets = None,
+        output_distance_percentiles = None,
+        reduced_precision = False):
     """
     Find the minimum distance of ocean basin point locations to proximity features (topological boundaries or non-topological features) over time.
     
@@ -848,6 +1725,22 @@ def proximity(
     
     A threshold distance can be specified to reject proximities exceeding it.
 
+    If 'simplify_geometries' is True (and continent obstacle filenames are specified) then the reconstructed obstacle and proximity
+    geometries are simplified to a tolerance tied to the grid spacing of the shortest path grid (since it cannot resolve finer detail).
+    This reduces the cost of creating the shortest path obstacle and distance grids (at each time step).
+
+    If 'shortest_path_grid_filename' is specified (and continent obstacle filenames are specified) then the shortest path grid is read
+    from that file (or created and written to it if it doesn't exist yet). Either way the grid is shared by all calls in the current process.
+
+    If 'bound_distance_search_by_clamp' is True (and mean distances are clamped) then, at each time step, distances are only searched up to
+    the distance beyond which the clamped mean distance of every ocean point is guaranteed to be the clamp value (based on each point's
+    accumulated distances and maximum lifetime). Distances beyond that are recorded as saturated values, so the clamped mean distances are
+    identical to those of an unbounded search. Only mean distances can be output in this mode (since the saturated values affect other outputs).
+
+    If 'reconstruction_snapshot_directory' is specified then the reconstructed proximity and obstacle geometries are read from the snapshots
+    (see 'ReconstructionSnapshots' and 'generate_reconstruction_snapshots()') in that directory at those times that have a snapshot
+    (other times are reconstructed as usual). The snapshots must have been generated with the same input files and parameters.
+
     The age grids and their paleo times are specified with 'age_grid_filenames_and_paleo_times' which should be a sequence of 2-tuples (filename, time).
     You can specify more than one age grid, and hence generate more than one returned ProximityData object, because processing multiple age grids together
     reduces the running time compared to processing them individually. If there's not enough age grids processed together
@@ -855,8 +1748,21 @@ def proximity(
     (and generating shortest path obstacle grids). This is because each age grid involves reconstructing all its ocean points back in time until they disappear
     (at mid-ocean ridge) and so there's a lot of overlap in time across the age grids (where calculations can be shared if processed together).
     
+    If 'additional_proximity_targets' is specified (a sequence of 'ProximityTarget') then the distances to each target's proximity features
+    are also calculated (in addition to the distances to the main proximity features) using the same ocean basin reconstructions
+    (and obstacle grids), so the cost of reconstructing the ocean basin points (and obstacles) is only paid once for all targets.
+    
+    If 'output_distance_percentiles' is specified (a sequence of percentiles in the range [0, 100]) then each ocean basin point also accumulates
+    a fixed-size sketch of its distances over time (see 'ProximityQuantileSketches'), from which those percentiles (eg, the median) are estimated.
+    Unlike 'output_distance_with_time' this does not store each distance (so memory does not grow with the number of times).
+    
+    If 'reduced_precision' is True then the mean/std-dev statistics of each ocean basin point are accumulated in 32-bit floats (and 16-bit counts)
+    rather than 64-bit floats. A sample of the points is also accumulated in 64-bit (see 'ProximityData.get_reduced_precision_errors()').
+    
     The proximity results are returned in as a dict mapping age grid paleo times to ProximityData objects.
     An age grid paleo time will be missing from the dict if all input points are outside the associated age grid (in masked regions).
+    If 'additional_proximity_targets' is specified then a 2-tuple is returned instead, containing the above dict and a dict mapping
+    each target name to its own dict (of age grid paleo times to ProximityData objects).
     """
     
     # Make sure pygplates has support for TopologicalModel.
@@ -874,52 +1780,72 @@ def proximity(
     
     if (not output_distance_with_time and
         not output_mean_distance and
-        not output_standard_deviation_distance):
+        not output_standard_deviation_distance and
+        not output_distance_percentiles):
         raise ValueError('No output specified for ocean basin proximity.')
     
+    if output_distance_percentiles and any(percentile < 0 or percentile > 100 for percentile in output_distance_percentiles):
+        raise ValueError('Distance percentiles must be in the range [0, 100].')
+    
     # Convert clamp-mean-proximity-distance from radians to Kms (if it was specified).
     if clamp_mean_proximity_distance_radians is not None:
         clamp_mean_proximity_distance_kms = clamp_mean_proximity_distance_radians * pygplates.Earth.mean_radius_in_kms
     else:
         clamp_mean_proximity_distance_kms = None
     
+    # Bounding the distance search by the mean distance clamp only applies if mean distances are clamped.
+    if clamp_mean_proximity_distance_kms is None:
+        bound_distance_search_by_clamp = False
+    if (bound_distance_search_by_clamp and
+        (output_distance_with_time or output_standard_deviation_distance or output_distance_percentiles)):
+        raise ValueError('Bounding the distance search by the mean distance clamp only supports outputting mean distances.')
+    
     cpu_profile.start_proximity()
     cpu_profile.start_read_input_data()
     
-    rotation_model = pygplates.RotationModel(rotation_filenames, default_anchor_plate_id=anchor_plate_id)
+    rotation_model = plate_model_cache.load_rotation_model(rotation_filenames, anchor_plate_id)
+    
+    proximity_features, proximity_feature_types = load_proximity_features(
+            proximity_filenames, proximity_features_are_topological, proximity_feature_types)
+    
+    topology_reconstruction_features = plate_model_cache.load_features(topological_reconstruction_filenames)
+    
+    # If the topological proximity features are the topological reconstruction features then they can use the topologies
+    # resolved by the topological model (at each time step) instead of resolving the same topologies again.
+    # Note: This only applies when they're the same files (resolving a subset of topologies can produce different boundary sections).
+    proximity_features_share_topological_model = (proximity_features_are_topological and
+            are_same_files(proximity_filenames, topological_reconstruction_filenames))
+    
+    # Load the features of any additional proximity targets.
+    # Each is a tuple of (target name, features, features are topological, feature types, features share topological model).
+    additional_targets = []
+    if additional_proximity_targets:
+        for additional_proximity_target in additional_proximity_targets:
+            target_features, target_feature_types = load_proximity_features(
+                    additional_proximity_target.proximity_filenames,
+                    additional_proximity_target.proximity_features_are_topological,
+                    additional_proximity_target.proximity_feature_types)
+            additional_targets.append((
+                    additional_proximity_target.name,
+                    target_features,
+                    additional_proximity_target.proximity_features_are_topological,
+                    target_feature_types,
+                    additional_proximity_target.proximity_features_are_topological and
+                        are_same_files(additional_proximity_target.proximity_filenames, topological_reconstruction_filenames)))
     
-    # Read/parse the proximity features once so we're not doing at each time iteration.
-    proximity_features = pygplates.FeaturesFunctionArgument(proximity_filenames).get_features()
-
-    if proximity_feature_types:
-        # Create pygplates.FeatureType's from the strings.
-        # We do this here since pygplates' objects are not yet pickable
-        # (which is required for objects passed via multiprocessing).
-        proximity_feature_types = [pygplates.FeatureType.create_from_qualified_string(feature_type)
-            for feature_type in proximity_feature_types]
+    if continent_obstacle_filenames:
+        #print('Creating shortest path grid...')
+        # The shortest path grid is static (doesn't change with time), so it's shared by all calls in this process
+        # (and, if a grid file is specified, read from that file instead of being created from scratch).
+        shortest_path_grid = shortest_path.get_shared_grid(SHORTEST_PATH_GRID_SUBDIVISION_DEPTH, shortest_path_grid_filename)
+        #memory_profile.print_object_memory_usage(shortest_path_grid, 'shortest_path_grid')
+        obstacle_features, plate_boundary_obstacle_feature_types = load_obstacle_features(
+                continent_obstacle_filenames, plate_boundary_obstacle_feature_types)
     
-        # For *non-topological* features we can remove those not matching the allowed feature types.
-        # Note that we can't do this for *topological* features because we need to resolve *all* topologies and
-        # then filter out the shared topology sections by feature type.
-        if not proximity_features_are_topological:
-            # Create a new list containing only features matching the allowed feature types.
-            proximity_features = [feature for feature in proximity_features
-                    if feature.get_feature_type() in proximity_feature_types]
-    
-    topology_reconstruction_features = pygplates.FeaturesFunctionArgument(topological_reconstruction_filenames).get_features()
-    
-    if continent_obstacle_filenames:
-        #print('Creating shortest path grid...')
-        shortest_path_grid = shortest_path.Grid(6)  # grid spacing of ~ 1.4 degrees
-        #memory_profile.print_object_memory_usage(shortest_path_grid, 'shortest_path_grid')
-        obstacle_features = pygplates.FeaturesFunctionArgument(continent_obstacle_filenames).get_features()
-        
-        if plate_boundary_obstacle_feature_types:
-            # Create pygplates.FeatureType's from the strings.
-            # We do this here since pygplates' objects are not yet pickable
-            # (which is required for objects passed via multiprocessing).
-            plate_boundary_obstacle_feature_types = [pygplates.FeatureType.create_from_qualified_string(feature_type)
-                for feature_type in plate_boundary_obstacle_feature_types]
+    if reconstruction_snapshot_directory is not None:
+        reconstruction_snapshots = ReconstructionSnapshots(reconstruction_snapshot_directory)
+    else:
+        reconstruction_snapshots = None
     
     cpu_profile.end_read_input_data()
     cpu_profile.start_reconstruct_and_calculate_distances()
@@ -930,27 +1856,36 @@ def proximity(
             self.age_grid_paleo_time = age_grid_paleo_time
             self.num_points = len(lon_lat_age_list)
 
-            # For each ocean basin point add lon-lat-point, time-of-appearance and initial-reconstructed-point to 3 separate lists.
+            # For each ocean basin point store its lon-lat-point, time-of-appearance and initial-reconstructed-point in separate arrays.
             # The initial reconstructed point will be updated as the ocean basin points are topologically reconstructed back into time.
-            # When a point is deactivated its entry is removed from 'current_reconstructed_points' and 'current_point_indices'
+            # When a point is deactivated its entry is removed from 'current_reconstructed_points_xyz' and 'current_point_indices'
             # such that their lengths will decrease (possibly to zero if all points have been deactivated).
-            point_lons = []
-            point_lats = []
-            point_ages = []
-            current_point_indices = []
-            current_reconstructed_points = []
-            for point_index, (lon, lat, age) in enumerate(lon_lat_age_list):
-                point_lons.append(lon)
-                point_lats.append(lat)
-                point_ages.append(age_grid_paleo_time + age)
-                current_point_indices.append(point_index)
-                current_reconstructed_points.append(pygplates.PointOnSphere(lat, lon))
-
-            self.point_lons = np.array(point_lons, dtype=float)  # numpy array uses less memory
-            self.point_lats = np.array(point_lats, dtype=float)  # numpy array uses less memory
-            self.point_ages = np.array(point_ages, dtype=float)  # numpy array uses less memory
-            self.current_point_indices = np.array(current_point_indices, dtype=int)  # numpy array uses less memory
-            self.current_reconstructed_points = current_reconstructed_points
+            lon_lat_age_array = np.array(lon_lat_age_list, dtype=float).reshape(-1, 3)
+            self.point_lons = lon_lat_age_array[:, 0].copy()  # numpy array uses less memory
+            self.point_lats = lon_lat_age_array[:, 1].copy()  # numpy array uses less memory
+            self.point_ages = age_grid_paleo_time + lon_lat_age_array[:, 2]  # numpy array uses less memory
+            self.current_point_indices = np.arange(self.num_points, dtype=int)  # numpy array uses less memory
+            # Store the current reconstructed points as an (N,3) array of (x,y,z) coordinates (rather than N pygplates.PointOnSphere objects)
+            # since this uses a lot less memory. PointOnSphere objects are only created (in bulk) when passing points to pyGPlates.
+            # Note: The initial (x,y,z) coordinates are calculated by pyGPlates (the same as creating each PointOnSphere from its lat/lon).
+            self.current_reconstructed_points_xyz = np.asarray(
+                    pygplates.MultiPointOnSphere(list(zip(self.point_lats.tolist(), self.point_lons.tolist()))).to_xyz_array(),
+                    dtype=float).reshape(-1, 3)
+            # The current reconstructed points as pygplates.PointOnSphere objects (created when first needed in a time step).
+            self.current_reconstructed_points = None
+        
+        def get_current_reconstructed_points(self):
+            # Return the current reconstructed points as a list of pygplates.PointOnSphere (created in bulk).
+            #
+            # They're only created once per time step, and then shared by the distance queries of all proximity targets
+            # and the topological reconstruction to the next time step (which releases them).
+            if self.current_reconstructed_points is None:
+                if len(self.current_reconstructed_points_xyz) == 0:
+                    self.current_reconstructed_points = []
+                else:
+                    self.current_reconstructed_points = list(
+                            pygplates.MultiPointOnSphere(list(map(tuple, self.current_reconstructed_points_xyz.tolist()))).get_points())
+            return self.current_reconstructed_points
         
         def reconstruct_time_step(self, topological_model, time, time_increment):
             # Reconstruct the current points using the topological model from 'time' to 'time + time_increment'.
@@ -960,7 +1895,7 @@ def proximity(
             #       ocean points over the full lifetime of oceanic crust (multiplied by the number of age grids).
             #       Once we extract the reconstructed points for this time step the reconstructed time span is released.
             reconstructed_time_span = topological_model.reconstruct_geometry(
-                    self.current_reconstructed_points,
+                    self.get_current_reconstructed_points(),
                     initial_time=time,
                     oldest_time=time + time_increment,
                     youngest_time=time,
@@ -968,40 +1903,54 @@ def proximity(
                     # Disable collision detection since currently it's creating some artefacts along topological boundaries.
                     # TODO: Improve collision detection in pyGPlates before enabling this...
                     deactivate_points=None)
+            # The current points are about to be replaced by the reconstructed points.
+            self.current_reconstructed_points = None  # free memory
 
             # Extract the reconstructed points at 'time + time_increment'.
             # Any deactivated points will be None.
             reconstructed_points = reconstructed_time_span.get_geometry_points(time + time_increment, return_inactive_points=True)
-            
-            active_reconstructed_points = []
-            active_point_indices = []
-
-            #
-            # Extract reconstructed points that are still active in the topological model, and
-            # remove those active points that don't exist at 'time + time_increment' according to the age grid.
-            #
             if reconstructed_points:  # could be None if all points were deactivated by topological model
-                for reconstructed_point_index, reconstructed_point in enumerate(reconstructed_points):
-                    # Exclude reconstructed points that have been deactivated by the topological model.
-                    if reconstructed_point is None:
-                        continue
-
-                    # Retire current point if the time we are reconstructing to ('time + time_increment')
-                    # is older (earlier than) than the point's time of appearance (according to the age grid).
-                    point_index = self.current_point_indices[reconstructed_point_index]
-                    point_begin_time = self.point_ages[point_index]
-                    if time + time_increment > point_begin_time:
-                        continue
-
-                    active_reconstructed_points.append(reconstructed_point)
-                    active_point_indices.append(point_index)
+                #
+                # Extract reconstructed points that are still active in the topological model, and
+                # remove those active points that don't exist at 'time + time_increment' according to the age grid.
+                #
+                # Exclude reconstructed points that have been deactivated by the topological model (these are None).
+                active_mask = np.fromiter(map(operator.is_not, reconstructed_points, itertools.repeat(None)), dtype=bool, count=len(reconstructed_points))
+                active_reconstructed_points = list(itertools.compress(reconstructed_points, active_mask))
+            else:
+                active_reconstructed_points = []
+            del reconstructed_points  # free memory
+            
+            if not active_reconstructed_points:
+                self.current_reconstructed_points_xyz = np.empty((0, 3), dtype=float)
+                self.current_point_indices = np.empty(0, dtype=int)
+                return
             
-            self.current_reconstructed_points = active_reconstructed_points
-            self.current_point_indices = np.array(active_point_indices, dtype=int)
+            # Convert the active points to (x,y,z) coordinates (in bulk).
+            active_reconstructed_points_xyz = np.asarray(
+                    pygplates.MultiPointOnSphere(active_reconstructed_points).to_xyz_array(), dtype=float).reshape(-1, 3)
+            active_point_indices = self.current_point_indices[active_mask]
+            del active_reconstructed_points  # free memory
+            
+            # Retire current points if the time we are reconstructing to ('time + time_increment')
+            # is older (earlier than) than the point's time of appearance (according to the age grid).
+            age_mask = (time + time_increment <= self.point_ages[active_point_indices])
+            
+            self.current_reconstructed_points_xyz = active_reconstructed_points_xyz[age_mask]
+            self.current_point_indices = active_point_indices[age_mask]
 
         def is_active(self):
             # Return True if not all points have been deactivated.
-            return bool(self.current_reconstructed_points)
+            return len(self.current_point_indices) > 0
+        
+        def set_max_num_active_time_steps(self, time, time_increment, max_topological_reconstruction_time):
+            # Set an upper bound on the number of time steps each point is active (starting at 'time').
+            # A point is not active at times older than its time of appearance (or 'max_topological_reconstruction_time').
+            oldest_active_times = self.point_ages
+            if max_topological_reconstruction_time is not None:
+                oldest_active_times = np.minimum(oldest_active_times, max_topological_reconstruction_time)
+            # Round up (rather than down) since it only needs to be an upper bound.
+            self.max_num_active_time_steps = 1 + np.maximum(np.ceil((oldest_active_times - time) / time_increment), 0)
     
     # Dict mapping age grid paleo time to OceanBasinReconstruction.
     ocean_basin_reconstructions = {}
@@ -1009,6 +1958,133 @@ def proximity(
     # All proximity data to return to caller.
     # This is a dict mapping age grid paleo time to ProximityData.
     proximity_datas = {}
+    # Same for each additional proximity target (a dict mapping target name to a dict of age grid paleo time to ProximityData).
+    additional_proximity_datas = {target_name: {} for target_name, _, _, _, _ in additional_targets}
+
+    # Calculate the distances of the current ocean basin points (of all age grids being reconstructed) to the specified reconstructed
+    # proximity geometries at 'time', and add them to 'target_proximity_datas' (a dict mapping age grid paleo time to ProximityData).
+    # If there are continent obstacles then 'shortest_path_obstacle_grid' is the obstacle grid at 'time', otherwise it's None.
+    def calculate_proximity_distances(time, proximity_reconstructed_geometries, target_proximity_datas, shortest_path_obstacle_grid):
+    
+        distance_threshold_radians = proximity_distance_threshold_radians
+    
+        # If bounding the distance search by the mean distance clamp then find the distance (for each ocean basin point) beyond which
+        # its clamped mean distance is guaranteed to be the clamp value, and don't search beyond the largest of these.
+        # Any ocean basin point beyond this search distance then gets a saturated distance (rather than its actual distance).
+        saturation_distances_radians = None
+        if bound_distance_search_by_clamp:
+            saturation_distances_radians = {}
+            max_saturation_distance_radians = 0.0
+            for age_grid_paleo_time, ocean_basin_reconstruction in ocean_basin_reconstructions.items():
+                current_point_indices = ocean_basin_reconstruction.current_point_indices
+                saturation_distances_radians[age_grid_paleo_time] = target_proximity_datas[age_grid_paleo_time].get_saturation_proximities(
+                        current_point_indices,
+                        ocean_basin_reconstruction.max_num_active_time_steps[current_point_indices]) / pygplates.Earth.mean_radius_in_kms
+                max_saturation_distance_radians = max(max_saturation_distance_radians, np.max(saturation_distances_radians[age_grid_paleo_time]))
+        
+            # Only bound the search if it's smaller than the distance threshold (if any).
+            if (proximity_distance_threshold_radians is None or
+                max_saturation_distance_radians < proximity_distance_threshold_radians):
+                distance_threshold_radians = max_saturation_distance_radians
+            else:
+                saturation_distances_radians = None
+    
+        if shortest_path_obstacle_grid is not None:
+
+            # Optionally simplify the proximity geometries (to the resolution of the shortest path grid).
+            if simplify_geometries:
+                cpu_profile.start_simplify_geometries()
+                simplified_proximity_reconstructed_geometries = shortest_path_grid.simplify_geometries(proximity_reconstructed_geometries)
+                cpu_profile.end_simplify_geometries()
+
+                cpu_profile.add_simplified_geometries(proximity_reconstructed_geometries, simplified_proximity_reconstructed_geometries)
+                proximity_reconstructed_geometries = simplified_proximity_reconstructed_geometries
+                del simplified_proximity_reconstructed_geometries
+
+            cpu_profile.start_create_obstacle_grids()
+
+            # Create distance grid.
+            shortest_path_distance_grid = shortest_path_obstacle_grid.create_distance_grid(
+                    proximity_reconstructed_geometries, distance_threshold_radians)
+            # Distance grid without the (bounded) search distance, only created if needed.
+            unbounded_shortest_path_distance_grid = None
+
+            cpu_profile.end_create_obstacle_grids()
+            cpu_profile.start_calculate_obstacle_distances()
+        
+            # Query distances to ocean points.
+            # Find the shortest path distance to each the ocean basin point in each age grid currently being reconstructed (to all proximity reconstructed geometries).
+            for age_grid_paleo_time, ocean_basin_reconstruction in ocean_basin_reconstructions.items():
+                proximity_data = target_proximity_datas[age_grid_paleo_time]
+
+                for ocean_basin_reconstructed_point_index, ocean_basin_reconstructed_point in enumerate(ocean_basin_reconstruction.get_current_reconstructed_points()):
+                    # Find minimum distance.
+                    if saturation_distances_radians is None:
+                        min_distance = shortest_path_distance_grid.shortest_distance(ocean_basin_reconstructed_point)
+                    else:
+                        min_distance, min_distance_lower_bound = shortest_path_distance_grid.shortest_distance_and_lower_bound(ocean_basin_reconstructed_point)
+                        if min_distance is None:
+                            if min_distance_lower_bound >= saturation_distances_radians[age_grid_paleo_time][ocean_basin_reconstructed_point_index]:
+                                # The clamped mean distance is the clamp value regardless of the actual distance, so use the saturated distance.
+                                min_distance = min_distance_lower_bound
+                            else:
+                                # The actual distance is needed but it might exceed the bounded search distance, so search without it.
+                                # This is rare since the bounded search distance is the largest saturation distance (of all ocean basin points).
+                                if unbounded_shortest_path_distance_grid is None:
+                                    unbounded_shortest_path_distance_grid = shortest_path_obstacle_grid.create_distance_grid(
+                                            proximity_reconstructed_geometries, proximity_distance_threshold_radians)
+                                min_distance = unbounded_shortest_path_distance_grid.shortest_distance(ocean_basin_reconstructed_point)
+                    if min_distance is None:
+                        # All proximity geometries are unreachable or further than distance threshold.
+                        # Use longest great circle distance between two points on the globe to represent this.
+                        min_distance = math.pi
+                    distance_in_kms = min_distance * pygplates.Earth.mean_radius_in_kms
+
+                    # Add minimum distance to proximity data.
+                    ocean_basin_point_index = ocean_basin_reconstruction.current_point_indices[ocean_basin_reconstructed_point_index]
+                    ocean_basin_reconstructed_lat, ocean_basin_reconstructed_lon = ocean_basin_reconstructed_point.to_lat_lon()
+                    proximity_data.add_proximity(distance_in_kms, time, ocean_basin_point_index, ocean_basin_reconstructed_lon, ocean_basin_reconstructed_lat)
+    
+            # Remove references - might help Python to deallocate these objects now.
+            #memory_profile.print_object_memory_usage(shortest_path_distance_grid, 'shortest_path_distance_grid')
+            del shortest_path_distance_grid
+            del unbounded_shortest_path_distance_grid
+    
+            cpu_profile.end_calculate_obstacle_distances()
+        
+        else:
+            # Find the minimum distance to each the ocean basin point in each age grid currently being reconstructed (to all proximity reconstructed geometries).
+            for age_grid_paleo_time, ocean_basin_reconstruction in ocean_basin_reconstructions.items():
+
+                # Find minimum distances.
+                ocean_basin_reconstructed_points = ocean_basin_reconstruction.get_current_reconstructed_points()
+                proximity_geometries_closest_to_ocean_basin_points = proximity_query.find_closest_geometries_to_points(
+                        ocean_basin_reconstructed_points,
+                        proximity_reconstructed_geometries,
+                        distance_threshold_radians = distance_threshold_radians)
+            
+                # Add minimum distances to proximity data.
+                proximity_data = target_proximity_datas[age_grid_paleo_time]
+                for ocean_basin_reconstructed_point_index, proximity_geometry_closest_to_ocean_basin_point in enumerate(proximity_geometries_closest_to_ocean_basin_points):
+                    if proximity_geometry_closest_to_ocean_basin_point is not None:
+                        min_distance, _ = proximity_geometry_closest_to_ocean_basin_point
+                    elif saturation_distances_radians is not None:
+                        # Further than the bounded search distance (which is no less than the ocean basin point's saturation distance)
+                        # so the clamped mean distance is the clamp value regardless of the actual distance. Use the saturated distance.
+                        min_distance = distance_threshold_radians
+                    else:
+                        # All proximity geometries are unreachable or further than distance threshold.
+                        # Use longest great circle distance between two points on the globe to represent this.
+                        min_distance = math.pi
+                    distance_in_kms = min_distance * pygplates.Earth.mean_radius_in_kms
+
+                    ocean_basin_point_index = ocean_basin_reconstruction.current_point_indices[ocean_basin_reconstructed_point_index]
+                    ocean_basin_reconstructed_point = ocean_basin_reconstructed_points[ocean_basin_reconstructed_point_index]
+                    ocean_basin_reconstructed_lat, ocean_basin_reconstructed_lon = ocean_basin_reconstructed_point.to_lat_lon()
+                    proximity_data.add_proximity(distance_in_kms, time, ocean_basin_point_index, ocean_basin_reconstructed_lon, ocean_basin_reconstructed_lat)
+                del proximity_geometries_closest_to_ocean_basin_points  # free memory
+                del ocean_basin_reconstructed_points  # (still shared with the other proximity targets until reconstructed)
+        
 
     # List of age grids, sorted by increasing paleo time, that we've not yet started processing/reconstructing.
     unprocessed_age_grid_filenames_and_paleo_times = sorted(age_grid_filenames_and_paleo_times, key=lambda grid_and_time: grid_and_time[1])
@@ -1049,12 +2125,20 @@ def proximity(
                 del lon_lat_age_list  # free memory
                 
                 if ocean_basin_reconstruction.is_active():
+                    if bound_distance_search_by_clamp:
+                        ocean_basin_reconstruction.set_max_num_active_time_steps(time, time_increment, max_topological_reconstruction_time)
                     # Add to the ocean basin reconstructions currently in progress.
                     ocean_basin_reconstructions[age_grid_paleo_time] = ocean_basin_reconstruction
                     # Also create a ProximityData object for the new ocean basin reconstruction.
                     proximity_datas[age_grid_paleo_time] = ProximityData(ocean_basin_reconstruction.point_lons, ocean_basin_reconstruction.point_lats,
                                                                          output_mean_distance, output_standard_deviation_distance, output_distance_with_time,
-                                                                         clamp_mean_proximity_distance_kms)
+                                                                         clamp_mean_proximity_distance_kms, bound_distance_search_by_clamp,
+                                                                         output_distance_percentiles, reduced_precision)
+                    for target_proximity_datas in additional_proximity_datas.values():
+                        target_proximity_datas[age_grid_paleo_time] = ProximityData(ocean_basin_reconstruction.point_lons, ocean_basin_reconstruction.point_lats,
+                                                                                    output_mean_distance, output_standard_deviation_distance, output_distance_with_time,
+                                                                                    clamp_mean_proximity_distance_kms, bound_distance_search_by_clamp,
+                                                                                    output_distance_percentiles, reduced_precision)
                     #print('Created age grid {} at time {}'.format(age_grid_paleo_time, time))
                     memory_profile.print_object_memory_usage(ocean_basin_reconstructions[age_grid_paleo_time], 'ocean_basin_reconstructions[{}]'.format(age_grid_paleo_time))
         
@@ -1067,41 +2151,32 @@ def proximity(
         
         cpu_profile.start_reconstruct_proximity()
         
-        if proximity_features_are_topological:
-            # Resolve our topological plate polygons (and deforming networks) to the current 'time'.
-            # We generate both the resolved topology boundaries and the boundary sections between them.
-            proximity_resolved_topologies = []
-            proximity_shared_boundary_sections = []
-            pygplates.resolve_topologies(proximity_features, rotation_model, proximity_resolved_topologies, time, proximity_shared_boundary_sections)
-            
-            # Iterate over the shared boundary sections of all resolved topologies.
-            proximity_reconstructed_geometries = []
-            for proximity_shared_boundary_section in proximity_shared_boundary_sections:
-                # Skip sections that are not included in the list of boundary feature types (if any).
-                proximity_feature = proximity_shared_boundary_section.get_feature()
-                if (proximity_feature_types and
-                    proximity_feature.get_feature_type() not in proximity_feature_types):
-                    continue
-                
-                # Iterate over the shared sub-segments of the current boundary line.
-                # These are the parts of the boundary line that actually contribute to topological boundaries.
-                for proximity_shared_sub_segment in proximity_shared_boundary_section.get_shared_sub_segments():
-                    proximity_reconstructed_geometries.append(proximity_shared_sub_segment.get_resolved_geometry())
-            
-            del proximity_resolved_topologies  # free memory
-            del proximity_shared_boundary_sections  # free memory
-            
-        else: # non-topological features...
-            
-            # Reconstruct the non-topological features that exist at the current 'time'.
-            proximity_reconstructed_feature_geometries = []
-            pygplates.reconstruct(proximity_features, rotation_model, proximity_reconstructed_feature_geometries, time)
+        # Read the reconstructed proximity (and obstacle) geometries from a snapshot (if there is one for the current 'time'),
+        # otherwise reconstruct them (obstacle geometries are reconstructed further below).
+        if (reconstruction_snapshots is not None and
+            reconstruction_snapshots.has_snapshot(time)):
+            proximity_reconstructed_geometries, snapshot_obstacle_reconstructed_geometries = reconstruction_snapshots.read_snapshot(time)
+            topological_snapshot = None
+        else:
+            # Resolve the topologies (once) if needed by the proximity features and/or the plate boundary obstacles.
+            # Note that the topological model caches the snapshot (so reconstructing the ocean basin points below also reuses it).
+            if (proximity_features_share_topological_model or
+                (continent_obstacle_filenames and plate_boundary_obstacle_feature_types)):
+                topological_snapshot = topological_model.topological_snapshot(time)
+                if (proximity_features_share_topological_model and
+                    continent_obstacle_filenames and plate_boundary_obstacle_feature_types):
+                    cpu_profile.add_resolve_topologies(1, 1)
+                else:
+                    cpu_profile.add_resolve_topologies(1, 0)
+            else:
+                topological_snapshot = None
             
-            proximity_reconstructed_geometries = []
-            for proximity_reconstructed_feature_geometry in proximity_reconstructed_feature_geometries:
-                proximity_reconstructed_geometries.append(proximity_reconstructed_feature_geometry.get_reconstructed_geometry())
-
-            del proximity_reconstructed_feature_geometries  # free memory
+            if proximity_features_are_topological and not proximity_features_share_topological_model:
+                cpu_profile.add_resolve_topologies(1, 0)
+            proximity_reconstructed_geometries = reconstruct_proximity_geometries(
+                    proximity_features, proximity_features_are_topological, proximity_feature_types, rotation_model, time,
+                    topological_snapshot if proximity_features_share_topological_model else None)
+            snapshot_obstacle_reconstructed_geometries = None
     
         cpu_profile.end_reconstruct_proximity()
         cpu_profile.start_calculate_distances()
@@ -1110,99 +2185,60 @@ def proximity(
 
             cpu_profile.start_obstacle_reconstruct_resolve()
 
-            obstacle_reconstructed_geometries = []
-
-            # Reconstruct the continent obstacles.
-            obstacle_reconstructed_feature_geometries = []
-            pygplates.reconstruct(obstacle_features, rotation_model, obstacle_reconstructed_feature_geometries, time)
-            obstacle_reconstructed_geometries = [obstacle_reconstructed_feature_geometry.get_reconstructed_geometry()
-                                                 for obstacle_reconstructed_feature_geometry in obstacle_reconstructed_feature_geometries]
-
-            # Get the plate boundary obstacles (if using any plate boundary feature types as obstacles).
-            if plate_boundary_obstacle_feature_types:
-                plate_boundary_obstacle_shared_boundary_sections = topological_model.topological_snapshot(time).get_resolved_topological_sections()
-                for plate_boundary_obstacle_shared_boundary_section in plate_boundary_obstacle_shared_boundary_sections:
-                    # Skip sections that are not included in the list of boundary feature types (if any).
-                    plate_boundary_obstacle_feature = plate_boundary_obstacle_shared_boundary_section.get_feature()
-                    if plate_boundary_obstacle_feature.get_feature_type() not in plate_boundary_obstacle_feature_types:
-                        continue
-                    
-                    for plate_boundary_obstacle_shared_sub_segment in plate_boundary_obstacle_shared_boundary_section.get_shared_sub_segments():
-                        obstacle_reconstructed_geometries.append(plate_boundary_obstacle_shared_sub_segment.get_resolved_geometry())
+            if snapshot_obstacle_reconstructed_geometries is not None:
+                obstacle_reconstructed_geometries = snapshot_obstacle_reconstructed_geometries
+            else:
+                obstacle_reconstructed_geometries = reconstruct_obstacle_geometries(
+                        obstacle_features, plate_boundary_obstacle_feature_types, rotation_model, topological_snapshot, time)
         
             cpu_profile.end_obstacle_reconstruct_resolve()
+
+            # Optionally simplify the obstacle geometries (to the resolution of the shortest path grid).
+            if simplify_geometries:
+                cpu_profile.start_simplify_geometries()
+                simplified_obstacle_reconstructed_geometries = shortest_path_grid.simplify_geometries(obstacle_reconstructed_geometries)
+                cpu_profile.end_simplify_geometries()
+
+                cpu_profile.add_simplified_geometries(obstacle_reconstructed_geometries, simplified_obstacle_reconstructed_geometries)
+                obstacle_reconstructed_geometries = simplified_obstacle_reconstructed_geometries
+                del simplified_obstacle_reconstructed_geometries
+
             cpu_profile.start_create_obstacle_grids()
             
-            # Create obstacle grid.
+            # Create obstacle grid (shared by the main proximity features and any additional proximity targets).
             shortest_path_obstacle_grid = shortest_path_grid.create_obstacle_grid(obstacle_reconstructed_geometries)
 
-            # Create distance grid.
-            shortest_path_distance_grid = shortest_path_obstacle_grid.create_distance_grid(
-                    proximity_reconstructed_geometries, proximity_distance_threshold_radians)
-
             cpu_profile.end_create_obstacle_grids()
-            cpu_profile.start_calculate_obstacle_distances()
             
-            # Query distances to ocean points.
-            # Find the shortest path distance to each the ocean basin point in each age grid currently being reconstructed (to all proximity reconstructed geometries).
-            for age_grid_paleo_time, ocean_basin_reconstruction in ocean_basin_reconstructions.items():
-                proximity_data = proximity_datas[age_grid_paleo_time]
-
-                for ocean_basin_reconstructed_point_index, ocean_basin_reconstructed_point in enumerate(ocean_basin_reconstruction.current_reconstructed_points):
-                    # Find minimum distance.
-                    min_distance = shortest_path_distance_grid.shortest_distance(ocean_basin_reconstructed_point)
-                    if min_distance is None:
-                        # All proximity geometries are unreachable or further than distance threshold.
-                        # Use longest great circle distance between two points on the globe to represent this.
-                        min_distance = math.pi
-                    distance_in_kms = min_distance * pygplates.Earth.mean_radius_in_kms
-
-                    # Add minimum distance to proximity data.
-                    ocean_basin_point_index = ocean_basin_reconstruction.current_point_indices[ocean_basin_reconstructed_point_index]
-                    ocean_basin_reconstructed_lat, ocean_basin_reconstructed_lon = ocean_basin_reconstructed_point.to_lat_lon()
-                    proximity_data.add_proximity(distance_in_kms, time, ocean_basin_point_index, ocean_basin_reconstructed_lon, ocean_basin_reconstructed_lat)
-        
             # Remove references - might help Python to deallocate these objects now.
-            #memory_profile.print_object_memory_usage(shortest_path_distance_grid, 'shortest_path_distance_grid')
-            del shortest_path_distance_grid
-            #memory_profile.print_object_memory_usage(shortest_path_obstacle_grid, 'shortest_path_obstacle_grid')
-            del shortest_path_obstacle_grid
-            del obstacle_reconstructed_feature_geometries
             del obstacle_reconstructed_geometries
-            if plate_boundary_obstacle_feature_types:
-                del plate_boundary_obstacle_shared_boundary_sections
-            del proximity_reconstructed_geometries
-        
-            cpu_profile.end_calculate_obstacle_distances()
-            
         else:
-            # Find the minimum distance to each the ocean basin point in each age grid currently being reconstructed (to all proximity reconstructed geometries).
-            for age_grid_paleo_time, ocean_basin_reconstruction in ocean_basin_reconstructions.items():
-
-                # Find minimum distances.
-                proximity_geometries_closest_to_ocean_basin_points = proximity_query.find_closest_geometries_to_points(
-                        ocean_basin_reconstruction.current_reconstructed_points,
-                        proximity_reconstructed_geometries,
-                        distance_threshold_radians = proximity_distance_threshold_radians)
-                
-                # Add minimum distances to proximity data.
-                proximity_data = proximity_datas[age_grid_paleo_time]
-                for ocean_basin_reconstructed_point_index, proximity_geometry_closest_to_ocean_basin_point in enumerate(proximity_geometries_closest_to_ocean_basin_points):
-                    if proximity_geometry_closest_to_ocean_basin_point is not None:
-                        min_distance, _ = proximity_geometry_closest_to_ocean_basin_point
-                    else:
-                        # All proximity geometries are unreachable or further than distance threshold.
-                        # Use longest great circle distance between two points on the globe to represent this.
-                        min_distance = math.pi
-                    distance_in_kms = min_distance * pygplates.Earth.mean_radius_in_kms
-
-                    ocean_basin_point_index = ocean_basin_reconstruction.current_point_indices[ocean_basin_reconstructed_point_index]
-                    ocean_basin_reconstructed_point = ocean_basin_reconstruction.current_reconstructed_points[ocean_basin_reconstructed_point_index]
-                    ocean_basin_reconstructed_lat, ocean_basin_reconstructed_lon = ocean_basin_reconstructed_point.to_lat_lon()
-                    proximity_data.add_proximity(distance_in_kms, time, ocean_basin_point_index, ocean_basin_reconstructed_lon, ocean_basin_reconstructed_lat)
-                del proximity_geometries_closest_to_ocean_basin_points  # free memory
+            shortest_path_obstacle_grid = None
+        
+        # Distances to the main proximity features.
+        calculate_proximity_distances(time, proximity_reconstructed_geometries, proximity_datas, shortest_path_obstacle_grid)
+        del proximity_reconstructed_geometries  # free memory
+        
+        # Distances to any additional proximity targets (using the same ocean basin points and obstacle grid).
+        for target_name, target_features, target_features_are_topological, target_feature_types, target_features_share_topological_model in additional_targets:
+            cpu_profile.start_reconstruct_proximity()
+            if target_features_share_topological_model:
+                cpu_profile.add_resolve_topologies(0, 1)
+            elif target_features_are_topological:
+                cpu_profile.add_resolve_topologies(1, 0)
+            target_reconstructed_geometries = reconstruct_proximity_geometries(
+                    target_features, target_features_are_topological, target_feature_types, rotation_model, time,
+                    # Note that the topological model caches its topological snapshot (so it's only resolved once per time)...
+                    topological_model.topological_snapshot(time) if target_features_share_topological_model else None)
+            cpu_profile.end_reconstruct_proximity()
             
-            del proximity_reconstructed_geometries  # free memory
+            calculate_proximity_distances(time, target_reconstructed_geometries, additional_proximity_datas[target_name], shortest_path_obstacle_grid)
+            del target_reconstructed_geometries  # free memory
+        
+        #memory_profile.print_object_memory_usage(shortest_path_obstacle_grid, 'shortest_path_obstacle_grid')
+        del shortest_path_obstacle_grid
+        del snapshot_obstacle_reconstructed_geometries
+        del topological_snapshot
     
         cpu_profile.end_calculate_distances()
         cpu_profile.start_reconstruct_time_step()
@@ -1237,6 +2273,9 @@ def proximity(
     #for proximity_data_time in proximity_datas.keys():
     #    memory_profile.print_object_memory_usage(proximity_datas[proximity_data_time], 'proximity_datas[{}]'.format(proximity_data_time))
 
+    if additional_proximity_targets:
+        return proximity_datas, additional_proximity_datas
+    
     return proximity_datas
     
     
@@ -1247,19 +2286,35 @@ def write_proximity_data(
         output_distance_with_time,
         output_mean_distance,
         output_standard_deviation_distance,
-        output_grd_files = None):
+        output_grd_files = None,  # if specified then a (ocean_basin_grid_spacing, upscale_mean_std_dev_grid_spacing, region) tuple
+        output_filename_prefix = '',  # eg, the name of an additional proximity target followed by '_'
+        output_proximity_statistics = False,  # write the mean/std-dev accumulators (see 'write_proximity_statistics_file()')
+        output_distance_percentiles = None,  # optional sequence of percentiles (in the range [0, 100]) of distance to write
+        reduced_precision = False,  # write mean/std-dev/percentile grids as 16-bit integers (see 'REDUCED_PRECISION_DISTANCE_GRID_FORMAT')
+        sediment_predictions = None):  # optional sequence of 'SedimentPrediction' to predict from the (upscaled) mean distances
+    """
+    Write the proximity data of each age grid.
+    
+    If 'sediment_predictions' is specified then each prediction is evaluated on the upscaled mean distances and the upscaled
+    age grid samples (both already in memory) and written as a grid, so a mean distance grid is not needed to predict sediment
+    (one is only written if 'output_mean_distance' is also True). This requires 'output_grd_files' with an upscaled grid spacing
+    (and the proximity data must have accumulated mean distances).
+    """
     
     cpu_profile.start_write_proximity_data()
+    
+    # The (GMT) format of the mean/std-dev/percentile grids (None means the GMT default of 32-bit floats).
+    statistics_grid_format = REDUCED_PRECISION_DISTANCE_GRID_FORMAT if reduced_precision else None
 
-    # If we're outputting mean and/or standard deviation grids, and if upscaling has been enabled.
-    if output_grd_files and (output_mean_distance or output_standard_deviation_distance):
-        _, upscale_mean_std_dev_grid_spacing = output_grd_files
+    # If we're outputting mean, standard deviation, percentile and/or sediment grids, and if upscaling has been enabled.
+    if output_grd_files and (output_mean_distance or output_standard_deviation_distance or output_distance_percentiles or sediment_predictions):
+        _, upscale_mean_std_dev_grid_spacing, region = output_grd_files
         if upscale_mean_std_dev_grid_spacing is not None:
             # Generate input points at the upscaled grid spacing.
             # These will be used to generate an upscaled mask from an age grid.
             # We do this outside the loop over age grids because it only needs to be done once (for all age grids) and so reduces running time.
             cpu_profile.start_upscaled_mask_generate_input_points()
-            upscaled_lon_lats, _, _ = generate_input_points_grid(upscale_mean_std_dev_grid_spacing)  # this is quite fast (using numpy)
+            upscaled_lon_lats, _, _ = generate_input_points_grid(upscale_mean_std_dev_grid_spacing, region)  # this is quite fast (using numpy)
             upscaled_lon_lats_string = ''.join('{} {}\n'.format(lon, lat) for lon, lat in upscaled_lon_lats)  # this is quite slow
             cpu_profile.end_upscaled_mask_generate_input_points()
     
@@ -1279,57 +2334,68 @@ def write_proximity_data(
 
                 if output_grd_files:  # write the grid file...
 
-                    ocean_basin_grid_spacing, _ = output_grd_files
-                    grd_filename = os.path.join(output_directory, 'distance_{:.1f}d_{:.1f}_{:.1f}.nc'.format(ocean_basin_grid_spacing, age_grid_paleo_time, time))
+                    ocean_basin_grid_spacing, _, region = output_grd_files
+                    grd_filename = os.path.join(output_directory, output_filename_prefix + 'distance_{:.1f}d_{:.1f}_{:.1f}.nc'.format(ocean_basin_grid_spacing, age_grid_paleo_time, time))
                     write_grd_file(
                             grd_filename, time_data, ocean_basin_grid_spacing,
                             # Using reconstructed points (which are *not* grid-aligned) so need to use nearest neighbour filtering...
-                            use_nearneighbor=True)
+                            use_nearneighbor=True,
+                            region=region)
                 
                 else:  # write the xyz file...
 
-                    xyz_filename = os.path.join(output_directory, 'distance_{:.1f}_{:.1f}.xy'.format(age_grid_paleo_time, time))
+                    xyz_filename = os.path.join(output_directory, output_filename_prefix + 'distance_{:.1f}_{:.1f}.xy'.format(age_grid_paleo_time, time))
                     write_xyz_file(xyz_filename, time_data)
 
-        # If we're outputting mean and/or standard deviation grids, and if upscaling has been enabled.
-        if output_mean_distance or output_standard_deviation_distance:
+        # If we're outputting mean, standard deviation, percentile and/or sediment grids, and if upscaling has been enabled.
+        if output_mean_distance or output_standard_deviation_distance or output_distance_percentiles or sediment_predictions:
             mean_standard_deviation_lon_lats = proximity_data.get_mean_standard_deviation_lon_lats()
             # If we're outputting mean and/or standard deviation grids, and if upscaling has been enabled.
             if output_grd_files:
-                ocean_basin_grid_spacing, upscale_mean_std_dev_grid_spacing = output_grd_files
+                ocean_basin_grid_spacing, upscale_mean_std_dev_grid_spacing, region = output_grd_files
                 if upscale_mean_std_dev_grid_spacing is not None:
                     upscaled_masked_lon_lat_indices_weights = calculate_upscaled_mask_interpolation_params(
                             mean_standard_deviation_lon_lats,
                             ocean_basin_grid_spacing,
                             upscaled_lon_lats_string,
-                            age_grid_filename)
+                            age_grid_filename,
+                            reduced_precision,
+                            # The sediment predictions also need the age grid sampled at the upscaled points...
+                            output_ages=bool(sediment_predictions))
+                    if sediment_predictions:
+                        upscaled_masked_lon_lat_indices_weights, upscaled_masked_ages = upscaled_masked_lon_lat_indices_weights
         
-        if output_mean_distance:
-
+        if output_mean_distance or sediment_predictions:
             means = proximity_data.get_means()
+        
+        if output_mean_distance:
             
             if output_grd_files:  # write the grid file...
 
-                ocean_basin_grid_spacing, upscale_mean_std_dev_grid_spacing = output_grd_files
+                ocean_basin_grid_spacing, upscale_mean_std_dev_grid_spacing, region = output_grd_files
                 if upscale_mean_std_dev_grid_spacing is not None:
-                    grd_mean_distance_filename = os.path.join(output_directory, 'mean_distance_{:.1f}d_{:.1f}.nc'.format(upscale_mean_std_dev_grid_spacing, age_grid_paleo_time))
+                    grd_mean_distance_filename = os.path.join(output_directory, output_filename_prefix + 'mean_distance_{:.1f}d_{:.1f}.nc'.format(upscale_mean_std_dev_grid_spacing, age_grid_paleo_time))
                     write_upscaled_grd_file(
                             grd_mean_distance_filename,
                             means,
                             upscaled_masked_lon_lat_indices_weights,
-                            upscale_mean_std_dev_grid_spacing)
+                            upscale_mean_std_dev_grid_spacing,
+                            region,
+                            statistics_grid_format)
                 else:
-                    grd_mean_distance_filename = os.path.join(output_directory, 'mean_distance_{:.1f}d_{:.1f}.nc'.format(ocean_basin_grid_spacing, age_grid_paleo_time))
+                    grd_mean_distance_filename = os.path.join(output_directory, output_filename_prefix + 'mean_distance_{:.1f}d_{:.1f}.nc'.format(ocean_basin_grid_spacing, age_grid_paleo_time))
                     # An array of (lon, lat, mean).
                     xyz_mean_data = np.column_stack((mean_standard_deviation_lon_lats, means))
                     write_grd_file(
                             grd_mean_distance_filename, xyz_mean_data, ocean_basin_grid_spacing,
                             # Using original (grid-aligned) points so don't near nearest neighbour filtering...
-                            use_nearneighbor=False)
+                            use_nearneighbor=False,
+                            region=region,
+                            grid_format=statistics_grid_format)
             
             else:  # write the xyz file...
 
-                xyz_mean_distance_filename = os.path.join(output_directory, 'mean_distance_{:.1f}.xy'.format(age_grid_paleo_time))
+                xyz_mean_distance_filename = os.path.join(output_directory, output_filename_prefix + 'mean_distance_{:.1f}.xy'.format(age_grid_paleo_time))
                 # An array of (lon, lat, mean).
                 xyz_mean_data = np.column_stack((mean_standard_deviation_lon_lats, means))
                 write_xyz_file(xyz_mean_distance_filename, xyz_mean_data)
@@ -1340,29 +2406,106 @@ def write_proximity_data(
 
             if output_grd_files:  # write the grid file...
 
-                ocean_basin_grid_spacing, upscale_mean_std_dev_grid_spacing = output_grd_files
+                ocean_basin_grid_spacing, upscale_mean_std_dev_grid_spacing, region = output_grd_files
                 if upscale_mean_std_dev_grid_spacing is not None:
-                    grd_standard_deviation_distance_filename = os.path.join(output_directory, 'std_dev_distance_{:.1f}d_{:.1f}.nc'.format(upscale_mean_std_dev_grid_spacing, age_grid_paleo_time))
+                    grd_standard_deviation_distance_filename = os.path.join(output_directory, output_filename_prefix + 'std_dev_distance_{:.1f}d_{:.1f}.nc'.format(upscale_mean_std_dev_grid_spacing, age_grid_paleo_time))
                     write_upscaled_grd_file(
                             grd_standard_deviation_distance_filename,
                             standard_deviations,
                             upscaled_masked_lon_lat_indices_weights,
-                            upscale_mean_std_dev_grid_spacing)
+                            upscale_mean_std_dev_grid_spacing,
+                            region,
+                            statistics_grid_format)
                 else:
-                    grd_standard_deviation_distance_filename = os.path.join(output_directory, 'std_dev_distance_{:.1f}d_{:.1f}.nc'.format(ocean_basin_grid_spacing, age_grid_paleo_time))
+                    grd_standard_deviation_distance_filename = os.path.join(output_directory, output_filename_prefix + 'std_dev_distance_{:.1f}d_{:.1f}.nc'.format(ocean_basin_grid_spacing, age_grid_paleo_time))
                     # An array of (lon, lat, standard_deviation).
                     xyz_standard_deviation_data = np.column_stack((mean_standard_deviation_lon_lats, standard_deviations))
                     write_grd_file(
                             grd_standard_deviation_distance_filename, xyz_standard_deviation_data, ocean_basin_grid_spacing,
                             # Using original (grid-aligned) points so don't near nearest neighbour filtering...
-                            use_nearneighbor=False)
+                            use_nearneighbor=False,
+                            region=region,
+                            grid_format=statistics_grid_format)
             
             else:  # write the xyz file...
             
-                xyz_standard_deviation_distance_filename = os.path.join(output_directory, 'std_dev_distance_{:.1f}.xy'.format(age_grid_paleo_time))
+                xyz_standard_deviation_distance_filename = os.path.join(output_directory, output_filename_prefix + 'std_dev_distance_{:.1f}.xy'.format(age_grid_paleo_time))
                 # An array of (lon, lat, standard_deviation).
                 xyz_standard_deviation_data = np.column_stack((mean_standard_deviation_lon_lats, standard_deviations))
                 write_xyz_file(xyz_standard_deviation_distance_filename, xyz_standard_deviation_data)
+        
+        for percentile in (output_distance_percentiles or []):
+            
+            percentile_name = get_distance_percentile_name(percentile)
+            percentiles = proximity_data.get_percentiles(percentile)
+            
+            if output_grd_files:  # write the grid file...
+                
+                ocean_basin_grid_spacing, upscale_mean_std_dev_grid_spacing, region = output_grd_files
+                if upscale_mean_std_dev_grid_spacing is not None:
+                    grd_percentile_distance_filename = os.path.join(output_directory, output_filename_prefix + '{}_distance_{:.1f}d_{:.1f}.nc'.format(
+                            percentile_name, upscale_mean_std_dev_grid_spacing, age_grid_paleo_time))
+                    write_upscaled_grd_file(
+                            grd_percentile_distance_filename,
+                            percentiles,
+                            upscaled_masked_lon_lat_indices_weights,
+                            upscale_mean_std_dev_grid_spacing,
+                            region,
+                            statistics_grid_format)
+                else:
+                    grd_percentile_distance_filename = os.path.join(output_directory, output_filename_prefix + '{}_distance_{:.1f}d_{:.1f}.nc'.format(
+                            percentile_name, ocean_basin_grid_spacing, age_grid_paleo_time))
+                    # An array of (lon, lat, percentile).
+                    xyz_percentile_data = np.column_stack((mean_standard_deviation_lon_lats, percentiles))
+                    write_grd_file(
+                            grd_percentile_distance_filename, xyz_percentile_data, ocean_basin_grid_spacing,
+                            # Using original (grid-aligned) points so don't near nearest neighbour filtering...
+                            use_nearneighbor=False,
+                            region=region,
+                            grid_format=statistics_grid_format)
+            
+            else:  # write the xyz file...
+                
+                xyz_percentile_distance_filename = os.path.join(output_directory, output_filename_prefix + '{}_distance_{:.1f}.xy'.format(
+                        percentile_name, age_grid_paleo_time))
+                # An array of (lon, lat, percentile).
+                xyz_percentile_data = np.column_stack((mean_standard_deviation_lon_lats, percentiles))
+                write_xyz_file(xyz_percentile_distance_filename, xyz_percentile_data)
+        
+        if sediment_predictions:
+            
+            # Predict sediment from the upscaled mean distances and ages (rather than writing a mean distance grid and sampling it).
+            ocean_basin_grid_spacing, upscale_mean_std_dev_grid_spacing, region = output_grd_files
+            upscaled_means = calculate_upscaled_scalars(means, upscaled_masked_lon_lat_indices_weights)
+            for sediment_prediction in sediment_predictions:
+                # An array of (lon, lat, prediction).
+                xyz_sediment_data = np.column_stack((
+                        upscaled_masked_lon_lat_indices_weights['lon'],
+                        upscaled_masked_lon_lat_indices_weights['lat'],
+                        sediment_prediction.model.predict(upscaled_masked_ages, upscaled_means)))
+                write_grd_file(
+                        '{}_{:.1f}.nc'.format(sediment_prediction.output_filename_prefix, age_grid_paleo_time),
+                        xyz_sediment_data, upscale_mean_std_dev_grid_spacing,
+                        # Using upscaled (grid-aligned) points so don't near nearest neighbour filtering...
+                        use_nearneighbor=False,
+                        region=region)
+            del upscaled_means, upscaled_masked_ages  # free memory
+        
+        # Write the mean/std-dev accumulators (so the mean/std-dev grids can be regenerated without recalculating proximities).
+        if output_proximity_statistics and proximity_data.has_point_statistics():
+            statistics_filename = os.path.join(output_directory, output_filename_prefix + 'proximity_statistics_{:.1f}.npz'.format(age_grid_paleo_time))
+            write_proximity_statistics_file(
+                    statistics_filename,
+                    proximity_data,
+                    age_grid_filename,
+                    age_grid_paleo_time,
+                    output_grd_files,
+                    output_filename_prefix)
+        
+        if reduced_precision and proximity_data.has_point_statistics():
+            num_upscaled_points = (len(upscaled_masked_lon_lat_indices_weights)
+                                   if output_grd_files and upscale_mean_std_dev_grid_spacing is not None else 0)
+            print_reduced_precision_report(proximity_data, age_grid_paleo_time, num_upscaled_points, bool(output_grd_files), output_filename_prefix)
     
     cpu_profile.end_write_proximity_data()
     
@@ -1371,6 +2514,50 @@ def write_proximity_data(
     #    memory_profile.print_object_memory_usage(proximity_datas[proximity_data_time], 'proximity_datas[{}] at end of write_proximity_data()'.format(proximity_data_time))
 
 
+def print_reduced_precision_report(proximity_data, age_grid_paleo_time, num_upscaled_points = 0, wrote_grd_files = False, output_filename_prefix = ''):
+    """
+    Print the numerical error (against 64-bit) and the memory/disk saved by the reduced precision mode for the specified ProximityData.
+    
+    'num_upscaled_points' is the number of points in the upscaled interpolation stencil (if any, see 'calculate_upscaled_mask_interpolation_params()').
+    """
+    
+    max_mean_error, max_standard_deviation_error = proximity_data.get_reduced_precision_errors()
+    
+    # Each point accumulates a 64-bit count, sum and sum-of-squares (and a validity flag) in full precision.
+    num_points = len(proximity_data.point_lons)
+    full_precision_statistics_nbytes = num_points * (3 * 8 + 1)
+    statistics_nbytes_saved = full_precision_statistics_nbytes - proximity_data.get_statistics_nbytes()
+    # Each upscaled point stores a lon, lat and 6 weights as 32-bit rather than 64-bit floats.
+    stencil_nbytes_saved = num_upscaled_points * 8 * 4
+    
+    print('Reduced precision ({}age grid {}): max error (vs 64-bit, over {} sampled points) of mean {:.3g} kms and std-dev {:.3g} kms; '
+          'saved {:.1f} MB of statistics memory ({:.1f} MB used) and {:.1f} MB of stencil memory{}.'.format(
+                output_filename_prefix, age_grid_paleo_time,
+                np.count_nonzero(proximity_data.error_sample_num_proximities),
+                max_mean_error, max_standard_deviation_error,
+                1e-6 * statistics_nbytes_saved, 1e-6 * proximity_data.get_statistics_nbytes(), 1e-6 * stencil_nbytes_saved,
+                # The mean/std-dev/percentile grids are rounded to whole kms (half the disk size of 32-bit floats before compression).
+                '; grids written as 16-bit integer kms (saving half their uncompressed size)' if wrote_grd_files else ''))
+
+
+@dataclass
+class ProximityTaskMetrics:
+    """Metrics of a task (group of age grids) processed by 'generate_and_write_proximity_data_parallel()'."""
+    
+    # The paleo times of the age grids processed (and written) by the task.
+    age_grid_paleo_times: List[float]
+    # Time taken to process the task (summed over its spatial shards, if any).
+    elapsed_seconds: float
+    # The process that wrote the task's output files.
+    process_id: int
+    # Number of spatial shards the task was split into.
+    num_spatial_shards: int = 1
+    # Number of plate model files (and rotation models) the task found in, or added to, its worker's plate model cache
+    # (both zero if the cache is not enabled, see 'proximity_pool_worker_initializer()').
+    num_plate_model_cache_hits: int = 0
+    num_plate_model_cache_misses: int = 0
+
+
 def generate_and_write_proximity_data(
         input_points, # List of (lon, lat) tuples.
         rotation_filenames,
@@ -1390,7 +2577,20 @@ def generate_and_write_proximity_data(
         anchor_plate_id = 0,
         proximity_distance_threshold_radians = None,
         clamp_mean_proximity_distance_radians = None,
-        output_grd_files = None):
+        output_grd_files = None,
+        simplify_geometries = False,
+        shortest_path_grid_filename = None,
+        bound_distance_search_by_clamp = False,
+        reconstruction_snapshot_directory = None,
+        additional_proximity_targets = None,
+        output_proximity_statistics = False,
+        output_distance_percentiles = None,
+        reduced_precision = False,
+        sediment_predictions = None):
+    """Calculate and write the proximity data of the specified age grids, and return the task's 'ProximityTaskMetrics'."""
+    
+    task_start_time = time_profile.perf_counter()
+    start_plate_model_cache_hits, start_plate_model_cache_misses = get_plate_model_cache_usage()
     
     # Calculate proximity data.
     proximity_datas = proximity(
@@ -1403,14 +2603,26 @@ def generate_and_write_proximity_data(
             age_grid_filenames_and_paleo_times,
             time_increment,
             output_distance_with_time,
-            output_mean_distance,
+            # Sediment predictions need the mean distances (even if they're not written)...
+            output_mean_distance or bool(sediment_predictions),
             output_standard_deviation_distance,
             max_topological_reconstruction_time,
             continent_obstacle_filenames,
             plate_boundary_obstacle_feature_types,
             anchor_plate_id,
             proximity_distance_threshold_radians,
-            clamp_mean_proximity_distance_radians)
+            clamp_mean_proximity_distance_radians,
+            simplify_geometries,
+            shortest_path_grid_filename,
+            bound_distance_search_by_clamp,
+            reconstruction_snapshot_directory,
+            additional_proximity_targets,
+            output_distance_percentiles,
+            reduced_precision)
+    if additional_proximity_targets:
+        proximity_datas, additional_proximity_datas = proximity_datas
+    else:
+        additional_proximity_datas = {}
 
     # Write proximity data.
     write_proximity_data(
@@ -1420,11 +2632,43 @@ def generate_and_write_proximity_data(
             output_distance_with_time,
             output_mean_distance,
             output_standard_deviation_distance,
-            output_grd_files)
+            output_grd_files,
+            output_proximity_statistics = output_proximity_statistics,
+            output_distance_percentiles = output_distance_percentiles,
+            reduced_precision = reduced_precision,
+            sediment_predictions = sediment_predictions)
+    
+    # Write the proximity data of any additional proximity targets (prefixing their output filenames with the target name).
+    #
+    # Note: Sediment predictions only use the main target, so when predicting sediment (instead of writing the main mean distance grids)
+    #       we still write the mean distance grids of the additional targets (otherwise their accumulated means would be discarded).
+    for target_name, target_proximity_datas in additional_proximity_datas.items():
+        write_proximity_data(
+                target_proximity_datas,
+                age_grid_filenames_and_paleo_times,
+                output_directory,
+                output_distance_with_time,
+                output_mean_distance or bool(sediment_predictions),
+                output_standard_deviation_distance,
+                output_grd_files,
+                output_filename_prefix = target_name + '_',
+                output_proximity_statistics = output_proximity_statistics,
+                output_distance_percentiles = output_distance_percentiles,
+                reduced_precision = reduced_precision)
     
     # Print CPU usage.
     age_grid_paleo_times = [time for _, time in age_grid_filenames_and_paleo_times]
     cpu_profile.print_usage(age_grid_paleo_times)
+    
+    plate_model_cache_hits, plate_model_cache_misses = get_plate_model_cache_usage()
+    print_plate_model_cache_usage()
+    
+    return ProximityTaskMetrics(
+            age_grid_paleo_times,
+            time_profile.perf_counter() - task_start_time,
+            os.getpid(),
+            num_plate_model_cache_hits=plate_model_cache_hits - start_plate_model_cache_hits,
+            num_plate_model_cache_misses=plate_model_cache_misses - start_plate_model_cache_misses)
 
 
 # Wraps around 'generate_and_write_proximity_data()' so can be used by multiprocessing.Pool.map() which requires a single-argument function.
@@ -1435,6 +2679,29 @@ def generate_and_write_proximity_data_parallel_pool_function(args):
         pass
 
 
+# Wraps around 'proximity()' so can be used by multiprocessing.Pool.imap() which requires a single-argument function.
+# Also returns the 'ProximityTaskMetrics' of the call (so the parent process can report the metrics of each task).
+def proximity_parallel_pool_function(args):
+    try:
+        start_time = time_profile.perf_counter()
+        start_plate_model_cache_hits, start_plate_model_cache_misses = get_plate_model_cache_usage()
+        
+        proximity_datas = proximity(*args)
+        
+        plate_model_cache_hits, plate_model_cache_misses = get_plate_model_cache_usage()
+        print_plate_model_cache_usage()
+        
+        age_grid_filenames_and_paleo_times = args[6]
+        return proximity_datas, ProximityTaskMetrics(
+                [age_grid_paleo_time for _, age_grid_paleo_time in age_grid_filenames_and_paleo_times],
+                time_profile.perf_counter() - start_time,
+                os.getpid(),
+                num_plate_model_cache_hits=plate_model_cache_hits - start_plate_model_cache_hits,
+                num_plate_model_cache_misses=plate_model_cache_misses - start_plate_model_cache_misses)
+    except KeyboardInterrupt:
+        pass
+
+
 def low_priority():
     """ Set the priority of the process to below-normal."""
 
@@ -1460,6 +2727,150 @@ def low_priority():
         os.nice(1)
 
 
+def proximity_pool_worker_initializer():
+    """Initialize each worker process of a pool that calls 'proximity()' (or reconstructs its features)."""
+    
+    low_priority()
+    
+    # Each worker process can be given several tasks, so cache the plate model files loaded by each task
+    # (this way each worker parses each input file at most once, rather than once per task).
+    plate_model_cache.enable()
+
+
+def get_plate_model_cache_usage():
+    """Return the number of hits and misses of the plate model cache of the current process (both zero if the cache is not enabled)."""
+    
+    cache = plate_model_cache.get_cache()
+    if cache is None:
+        return 0, 0
+    return cache.num_hits, cache.num_misses
+
+
+def print_plate_model_cache_usage():
+    """Print the number of hits and misses of the plate model cache of the current process (if the cache is enabled)."""
+    
+    if plate_model_cache.get_cache() is None:
+        return
+    
+    plate_model_cache_hits, plate_model_cache_misses = get_plate_model_cache_usage()
+    print('Plate model cache (process {}): {} hits, {} misses'.format(os.getpid(), plate_model_cache_hits, plate_model_cache_misses), flush=True)
+
+
+def get_reconstruction_snapshot_times(
+        age_grid_filenames_and_paleo_times,
+        time_increment,
+        max_topological_reconstruction_time = None):
+    """Return the times that the ocean basin points (of all the specified age grids) are reconstructed to by 'proximity()'."""
+    
+    # Ocean basin points are reconstructed from their age grid paleo time back to their time of appearance.
+    min_time = None
+    max_time = None
+    for age_grid_filename, age_grid_paleo_time in age_grid_filenames_and_paleo_times:
+        age_grid_max_age = get_age_grid_max_age(age_grid_filename)
+        if age_grid_max_age is None:
+            continue
+        if min_time is None or age_grid_paleo_time < min_time:
+            min_time = age_grid_paleo_time
+        if max_time is None or age_grid_paleo_time + age_grid_max_age > max_time:
+            max_time = age_grid_paleo_time + age_grid_max_age
+    if min_time is None:
+        return []
+    
+    # We cannot reconstruct further in the past than allowed by the topological reconstruction features.
+    if (max_topological_reconstruction_time is not None and
+        max_time > max_topological_reconstruction_time):
+        max_time = max_topological_reconstruction_time
+    
+    # Calculate times the same way as 'proximity()' (so they match exactly).
+    return [time_index * time_increment
+            for time_index in range(int(math.ceil(min_time / time_increment)), int(math.floor(max_time / time_increment)) + 1)]
+
+
+# Wraps around 'generate_reconstruction_snapshots()' so can be used by multiprocessing.Pool.map() which requires a single-argument function.
+def generate_reconstruction_snapshots_parallel_pool_function(args):
+    try:
+        reconstruction_snapshot_directory = args[0]
+        return generate_reconstruction_snapshots(ReconstructionSnapshots(reconstruction_snapshot_directory), *args[1:])
+    except KeyboardInterrupt:
+        pass
+
+
+def generate_reconstruction_snapshots_parallel(
+        reconstruction_snapshot_directory,
+        times,
+        rotation_filenames,
+        proximity_filenames,
+        proximity_features_are_topological,
+        proximity_feature_types,
+        topological_reconstruction_filenames,
+        continent_obstacle_filenames = None,
+        plate_boundary_obstacle_feature_types = DEFAULT_PLATE_BOUNDARY_OBSTACLE_FEATURE_TYPES,  # only used in 'continent_obstacle_filenames' is not None
+        anchor_plate_id = 0,
+        num_cpus = None):  # if None then defaults to all available CPUs
+    
+    # If the user requested all available CPUs then attempt to find out how many there are.
+    if not num_cpus:
+        try:
+            num_cpus = multiprocessing.cpu_count()
+        except NotImplementedError:
+            num_cpus = 1
+    
+    if num_cpus > len(times):
+        num_cpus = len(times)
+    
+    if num_cpus <= 1:
+        generate_reconstruction_snapshots(
+                ReconstructionSnapshots(reconstruction_snapshot_directory),
+                times,
+                rotation_filenames,
+                proximity_filenames,
+                proximity_features_are_topological,
+                proximity_feature_types,
+                topological_reconstruction_filenames,
+                continent_obstacle_filenames,
+                plate_boundary_obstacle_feature_types,
+                anchor_plate_id)
+        return
+    
+    # Give each CPU one group of consecutive times (so each reads the input features only once).
+    num_times_per_task = math.ceil(len(times) / num_cpus)
+    task_times_lists = [times[task_start_time_index : task_start_time_index + num_times_per_task]
+                        for task_start_time_index in range(0, len(times), num_times_per_task)]
+    
+    # Split the workload across the CPUs.
+    try:
+        pool = multiprocessing.Pool(num_cpus, initializer=proximity_pool_worker_initializer)
+        pool_map_async_result = pool.map_async(
+                generate_reconstruction_snapshots_parallel_pool_function,
+                (
+                    (
+                        reconstruction_snapshot_directory,
+                        task_times_list,
+                        rotation_filenames,
+                        proximity_filenames,
+                        proximity_features_are_topological,
+                        proximity_feature_types,
+                        topological_reconstruction_filenames,
+                        continent_obstacle_filenames,
+                        plate_boundary_obstacle_feature_types,
+                        anchor_plate_id
+                    ) for task_times_list in task_times_lists
+                ),
+                1) # chunksize
+        
+        # Apparently if we use pool.map_async instead of pool.map and then get the results
+        # using a timeout, then we avoid a bug in Python where a keyboard interrupt does not work properly.
+        # See http://stackoverflow.com/questions/1408356/keyboard-interrupts-with-pythons-multiprocessing-pool
+        try:
+            pool_map_async_result.get(999999)
+        except KeyboardInterrupt:
+            # Note: 'finally' block below gets executed before returning.
+            return
+    finally:
+        pool.close()
+        pool.join()
+
+
 def generate_and_write_proximity_data_parallel(
         input_points, # List of (lon, lat) tuples.
         rotation_filenames,
@@ -1481,7 +2892,24 @@ def generate_and_write_proximity_data_parallel(
         clamp_mean_proximity_distance_radians = None,
         output_grd_files = None,
         num_cpus = None,  # if None then defaults to all available CPUs
-        max_memory_usage_in_gb = None):  # max memory to use (in GB)
+        max_memory_usage_in_gb = None,  # max memory to use (in GB)
+        simplify_geometries = False,
+        bound_distance_search_by_clamp = False,
+        cache_reconstruction_snapshots = False,
+        num_spatial_shards = 1,
+        additional_proximity_targets = None,  # optional sequence of 'ProximityTarget'
+        output_proximity_statistics = False,  # write the mean/std-dev accumulators (see 'write_proximity_statistics_file()')
+        output_distance_percentiles = None,  # optional sequence of percentiles (in the range [0, 100]) of distance to write
+        reduced_precision = False,  # accumulate statistics (and write their grids) in reduced precision (see 'proximity()')
+        sediment_predictions = None,  # optional sequence of 'SedimentPrediction' (see 'write_proximity_data()')
+        task_metrics_callback = None):  # optionally called with the 'ProximityTaskMetrics' of each task as it completes
+    """
+    Calculate and write the proximity data of the specified age grids (in parallel), and return a list of 'ProximityTaskMetrics' (one per task).
+    
+    The tasks are listed in the order they completed (which can differ from the order of the age grids).
+    If 'task_metrics_callback' is specified then it is called (in this process) with the metrics of each task as it completes
+    (eg, to report progress).
+    """
     
     # If the user requested all available CPUs then attempt to find out how many there are.
     if not num_cpus:
@@ -1509,7 +2937,23 @@ def generate_and_write_proximity_data_parallel(
     base_memory_usage_per_task_in_gb = 2.3
     # The memory usage per age grid is roughly proportional to the number of input points,
     # with a uniform lon-lat grid at 1 degree resolution consuming about 6MB.
+    #
+    # Note: This was measured when each ocean basin point was held as a pygplates.PointOnSphere (rather than as (x,y,z) coordinates).
+    #       It's kept (as an over-estimate) until re-measured with ENABLE_MEMORY_PROFILING.
     delta_memory_usage_per_age_grid_in_gb = 6e-3 * len(input_points) / (180 * 360)
+    # Per-point proximity data is only allocated for ocean basin points (those with a valid age), which are roughly 70% of the input points.
+    num_ocean_basin_points = 0.7 * len(input_points)
+    # Each point also has a quantile sketch if outputting percentiles (see 'ProximityQuantileSketches').
+    if output_distance_percentiles:
+        delta_memory_usage_per_age_grid_in_gb += 1e-9 * ProximityQuantileSketches.NUM_BINS * np.dtype(np.uint16).itemsize * num_ocean_basin_points
+    # In reduced precision each point's statistics use a 16-bit count and 32-bit sums (rather than three 64-bit floats),
+    # saving 14 bytes per point (the 64-bit error samples are a negligible fraction of the points).
+    if reduced_precision and (output_mean_distance or output_standard_deviation_distance or output_distance_percentiles):
+        delta_memory_usage_per_age_grid_in_gb -= 1e-9 * 14 * num_ocean_basin_points
+    # Each additional proximity target accumulates its own proximity data per age grid.
+    # This over-estimates a little since the ocean basin reconstructions are shared by all targets.
+    if additional_proximity_targets:
+        delta_memory_usage_per_age_grid_in_gb *= 1 + len(additional_proximity_targets)
     # The total memory used to process the specified number of age grids in a single task.
     def memory_usage_per_task(num_age_grids_per_task_):
         return base_memory_usage_per_task_in_gb + num_age_grids_per_task_ * delta_memory_usage_per_age_grid_in_gb
@@ -1577,77 +3021,553 @@ def generate_and_write_proximity_data_parallel(
                 age_grid_filenames_and_paleo_times[task_start_time_index : task_start_time_index + num_age_grids_per_task])
         task_start_time_index += num_age_grids_per_task
     
-    #
-    # No need for parallelisation if number of CPUs is one.
-    #
-    # Also can use this when there are exceptions in order to determine which source code line.
-    # Because once goes through multiprocessing pools then lose error locations in source code.
-    #
-    if num_cpus == 1:
-        for task_age_grid_filenames_and_paleo_times_list in task_age_grid_filenames_and_paleo_times_lists:
-            generate_and_write_proximity_data(
-                    input_points, # List of (lon, lat) tuples.
+    # The metrics of each task (as it completes).
+    task_metrics_list = []
+    def add_task_metrics(task_metrics):
+        task_metrics_list.append(task_metrics)
+        if task_metrics_callback:
+            task_metrics_callback(task_metrics)
+    
+    # Temporary directory containing data shared by all tasks (removed when finished).
+    temporary_directory = None
+    if continent_obstacle_filenames or cache_reconstruction_snapshots:
+        temporary_directory = tempfile.mkdtemp(prefix='ocean_basin_proximity_')
+    
+    try:
+        # If there are continent obstacles then create the shortest path grid once (here) and write it to a temporary file
+        # that each task reads (which is much faster than each task creating the grid from scratch).
+        shortest_path_grid_filename = None
+        if continent_obstacle_filenames:
+            shortest_path_grid_filename = os.path.join(temporary_directory, 'shortest_path_grid.npz')
+            shortest_path.get_shared_grid(SHORTEST_PATH_GRID_SUBDIVISION_DEPTH, shortest_path_grid_filename)
+        
+        # If caching reconstruction snapshots then reconstruct the proximity and obstacle features once per time (here, in parallel)
+        # rather than in every task that covers that time (tasks with overlapping times would otherwise repeat the same reconstructions).
+        reconstruction_snapshot_directory = None
+        if cache_reconstruction_snapshots:
+            reconstruction_snapshot_directory = os.path.join(temporary_directory, 'reconstruction_snapshots')
+            os.mkdir(reconstruction_snapshot_directory)
+            generate_reconstruction_snapshots_parallel(
+                    reconstruction_snapshot_directory,
+                    get_reconstruction_snapshot_times(age_grid_filenames_and_paleo_times, time_increment, max_topological_reconstruction_time),
                     rotation_filenames,
                     proximity_filenames,
                     proximity_features_are_topological,
                     proximity_feature_types,
                     topological_reconstruction_filenames,
-                    task_age_grid_filenames_and_paleo_times_list,
-                    time_increment,
-                    output_distance_with_time,
-                    output_mean_distance,
-                    output_standard_deviation_distance,
-                    output_directory,
-                    max_topological_reconstruction_time,
                     continent_obstacle_filenames,
                     plate_boundary_obstacle_feature_types,
                     anchor_plate_id,
-                    proximity_distance_threshold_radians,
-                    clamp_mean_proximity_distance_radians,
-                    output_grd_files)
-        return
-    
-    # Split the workload across the CPUs.
-    try:
-        pool = multiprocessing.Pool(num_cpus, initializer=low_priority)
-        pool_map_async_result = pool.map_async(
-                generate_and_write_proximity_data_parallel_pool_function,
-                (
-                    (
-                        input_points,
-                        rotation_filenames,
-                        proximity_filenames,
-                        proximity_features_are_topological,
-                        proximity_feature_types,
-                        topological_reconstruction_filenames,
-                        task_age_grid_filenames_and_paleo_times_list,
-                        time_increment,
-                        output_distance_with_time,
-                        output_mean_distance,
-                        output_standard_deviation_distance,
-                        output_directory,
-                        max_topological_reconstruction_time,
-                        continent_obstacle_filenames,
-                        plate_boundary_obstacle_feature_types,
-                        anchor_plate_id,
-                        proximity_distance_threshold_radians,
-                        clamp_mean_proximity_distance_radians,
-                        output_grd_files
-                    ) for task_age_grid_filenames_and_paleo_times_list in task_age_grid_filenames_and_paleo_times_lists
-                ),
-                1) # chunksize
+                    num_cpus)
         
-        # Apparently if we use pool.map_async instead of pool.map and then get the results
-        # using a timeout, then we avoid a bug in Python where a keyboard interrupt does not work properly.
-        # See http://stackoverflow.com/questions/1408356/keyboard-interrupts-with-pythons-multiprocessing-pool
+        #
+        # If splitting the ocean points into spatial shards then each task processes one shard (of one group of age grids).
+        #
+        # This is useful when there are fewer groups of age grids (tasks) than CPUs, eg, when only processing a few age grids.
+        # The shards are contiguous ranges of the input points (latitude bands for a uniform lon-lat grid), so merging their
+        # proximity data (in shard order) gives the same points in the same order as not sharding.
+        #
+        if num_cpus > 1 and num_spatial_shards > 1:
+            num_spatial_shards = min(num_spatial_shards, len(input_points))
+            input_points_shards = []
+            for shard_index in range(num_spatial_shards):
+                shard_start_point_index = (shard_index * len(input_points)) // num_spatial_shards
+                shard_end_point_index = ((shard_index + 1) * len(input_points)) // num_spatial_shards
+                input_points_shards.append(input_points[shard_start_point_index : shard_end_point_index])
+            
+            print('Number of spatial shards per task: {}'.format(num_spatial_shards))
+            
+            # Merge the proximity data of the shards (for each age grid), where 'shard_proximity_datas' is a list
+            # (in shard order) of dicts mapping age grid paleo time to ProximityData.
+            def merge_shard_proximity_datas(shard_proximity_datas, task_age_grid_filenames_and_paleo_times_list):
+                proximity_datas = {}
+                for _, age_grid_paleo_time in task_age_grid_filenames_and_paleo_times_list:
+                    # A shard is missing an age grid if all its points are outside the age grid.
+                    age_grid_shard_proximity_datas = [shard_proximity_data[age_grid_paleo_time]
+                                                      for shard_proximity_data in shard_proximity_datas
+                                                      if age_grid_paleo_time in shard_proximity_data]
+                    if age_grid_shard_proximity_datas:
+                        proximity_datas[age_grid_paleo_time] = ProximityData.concatenate(age_grid_shard_proximity_datas)
+                return proximity_datas
+            
+            try:
+                pool = multiprocessing.Pool(num_cpus, initializer=proximity_pool_worker_initializer)
+                pool_imap_result = pool.imap(
+                        proximity_parallel_pool_function,
+                        (
+                            (
+                                input_points_shard,
+                                rotation_filenames,
+                                proximity_filenames,
+                                proximity_features_are_topological,
+                                proximity_feature_types,
+                                topological_reconstruction_filenames,
+                                task_age_grid_filenames_and_paleo_times_list,
+                                time_increment,
+                                output_distance_with_time,
+                                # Sediment predictions need the mean distances (even if they're not written)...
+                                output_mean_distance or bool(sediment_predictions),
+                                output_standard_deviation_distance,
+                                max_topological_reconstruction_time,
+                                continent_obstacle_filenames,
+                                plate_boundary_obstacle_feature_types,
+                                anchor_plate_id,
+                                proximity_distance_threshold_radians,
+                                clamp_mean_proximity_distance_radians,
+                                simplify_geometries,
+                                shortest_path_grid_filename,
+                                bound_distance_search_by_clamp,
+                                reconstruction_snapshot_directory,
+                                additional_proximity_targets,
+                                output_distance_percentiles,
+                                reduced_precision
+                            ) for task_age_grid_filenames_and_paleo_times_list in task_age_grid_filenames_and_paleo_times_lists
+                              for input_points_shard in input_points_shards
+                        ),
+                        1) # chunksize
+                
+                # Results are returned in task order, so the shards of each group of age grids are consecutive.
+                # Using a timeout avoids a bug in Python where a keyboard interrupt does not work properly (see 'map_async' below).
+                try:
+                    for task_age_grid_filenames_and_paleo_times_list in task_age_grid_filenames_and_paleo_times_lists:
+                        shard_results = [pool_imap_result.next(999999) for _ in range(num_spatial_shards)]
+                        shard_proximity_datas = [shard_proximity_data for shard_proximity_data, _ in shard_results]
+                        shard_task_metrics_list = [shard_task_metrics for _, shard_task_metrics in shard_results]
+                        del shard_results
+                        
+                        write_start_time = time_profile.perf_counter()
+                        
+                        # When there are additional proximity targets each shard returns a 2-tuple (see 'proximity()'), so merge
+                        # the main proximity data and then the proximity data of each target (writing each after it's merged).
+                        if additional_proximity_targets:
+                            shard_additional_proximity_datas = [shard_proximity_data[1] for shard_proximity_data in shard_proximity_datas]
+                            shard_proximity_datas = [shard_proximity_data[0] for shard_proximity_data in shard_proximity_datas]
+                        
+                        proximity_datas = merge_shard_proximity_datas(shard_proximity_datas, task_age_grid_filenames_and_paleo_times_list)
+                        del shard_proximity_datas  # free memory
+                        
+                        write_proximity_data(
+                                proximity_datas,
+                                task_age_grid_filenames_and_paleo_times_list,
+                                output_directory,
+                                output_distance_with_time,
+                                output_mean_distance,
+                                output_standard_deviation_distance,
+                                output_grd_files,
+                                output_proximity_statistics = output_proximity_statistics,
+                                output_distance_percentiles = output_distance_percentiles,
+                                reduced_precision = reduced_precision,
+                                sediment_predictions = sediment_predictions)
+                        del proximity_datas  # free memory
+                        
+                        if additional_proximity_targets:
+                            for additional_proximity_target in additional_proximity_targets:
+                                target_proximity_datas = merge_shard_proximity_datas(
+                                        [shard_additional_proximity_data[additional_proximity_target.name]
+                                            for shard_additional_proximity_data in shard_additional_proximity_datas],
+                                        task_age_grid_filenames_and_paleo_times_list)
+                                # Write additional target mean distance grids even if only sediment is predicted for the main target
+                                # (see 'generate_and_write_proximity_data()').
+                                write_proximity_data(
+                                        target_proximity_datas,
+                                        task_age_grid_filenames_and_paleo_times_list,
+                                        output_directory,
+                                        output_distance_with_time,
+                                        output_mean_distance or bool(sediment_predictions),
+                                        output_standard_deviation_distance,
+                                        output_grd_files,
+                                        output_filename_prefix = additional_proximity_target.name + '_',
+                                        output_proximity_statistics = output_proximity_statistics,
+                                        output_distance_percentiles = output_distance_percentiles,
+                                        reduced_precision = reduced_precision)
+                                del target_proximity_datas  # free memory
+                            del shard_additional_proximity_datas  # free memory
+                        
+                        add_task_metrics(ProximityTaskMetrics(
+                                [age_grid_paleo_time for _, age_grid_paleo_time in task_age_grid_filenames_and_paleo_times_list],
+                                sum(shard_task_metrics.elapsed_seconds for shard_task_metrics in shard_task_metrics_list) +
+                                    time_profile.perf_counter() - write_start_time,
+                                os.getpid(),
+                                num_spatial_shards,
+                                sum(shard_task_metrics.num_plate_model_cache_hits for shard_task_metrics in shard_task_metrics_list),
+                                sum(shard_task_metrics.num_plate_model_cache_misses for shard_task_metrics in shard_task_metrics_list)))
+                except KeyboardInterrupt:
+                    # Note: 'finally' block below gets executed before returning.
+                    return task_metrics_list
+            finally:
+                pool.close()
+                pool.join()
+            
+            return task_metrics_list
+        
+        #
+        # No need for parallelisation if number of CPUs is one.
+        #
+        # Also can use this when there are exceptions in order to determine which source code line.
+        # Because once goes through multiprocessing pools then lose error locations in source code.
+        #
+        if num_cpus == 1:
+            # Like a pool worker, this process parses each input file at most once for all its tasks
+            # (but only for this run, unless the caller already enabled the plate model cache).
+            disable_plate_model_cache = plate_model_cache.get_cache() is None
+            plate_model_cache.enable()
+            try:
+                for task_age_grid_filenames_and_paleo_times_list in task_age_grid_filenames_and_paleo_times_lists:
+                    task_metrics = generate_and_write_proximity_data(
+                            input_points, # List of (lon, lat) tuples.
+                            rotation_filenames,
+                            proximity_filenames,
+                            proximity_features_are_topological,
+                            proximity_feature_types,
+                            topological_reconstruction_filenames,
+                            task_age_grid_filenames_and_paleo_times_list,
+                            time_increment,
+                            output_distance_with_time,
+                            output_mean_distance,
+                            output_standard_deviation_distance,
+                            output_directory,
+                            max_topological_reconstruction_time,
+                            continent_obstacle_filenames,
+                            plate_boundary_obstacle_feature_types,
+                            anchor_plate_id,
+                            proximity_distance_threshold_radians,
+                            clamp_mean_proximity_distance_radians,
+                            output_grd_files,
+                            simplify_geometries,
+                            shortest_path_grid_filename,
+                            bound_distance_search_by_clamp,
+                            reconstruction_snapshot_directory,
+                            additional_proximity_targets,
+                            output_proximity_statistics,
+                            output_distance_percentiles,
+                            reduced_precision,
+                            sediment_predictions)
+                    add_task_metrics(task_metrics)
+            finally:
+                if disable_plate_model_cache:
+                    plate_model_cache.disable()
+            return task_metrics_list
+        
+        # Split the workload across the CPUs.
         try:
-            pool_map_async_result.get(999999)
-        except KeyboardInterrupt:
-            # Note: 'finally' block below gets executed before returning.
-            return
+            pool = multiprocessing.Pool(num_cpus, initializer=proximity_pool_worker_initializer)
+            pool_imap_result = pool.imap_unordered(
+                    generate_and_write_proximity_data_parallel_pool_function,
+                    (
+                        (
+                            input_points,
+                            rotation_filenames,
+                            proximity_filenames,
+                            proximity_features_are_topological,
+                            proximity_feature_types,
+                            topological_reconstruction_filenames,
+                            task_age_grid_filenames_and_paleo_times_list,
+                            time_increment,
+                            output_distance_with_time,
+                            output_mean_distance,
+                            output_standard_deviation_distance,
+                            output_directory,
+                            max_topological_reconstruction_time,
+                            continent_obstacle_filenames,
+                            plate_boundary_obstacle_feature_types,
+                            anchor_plate_id,
+                            proximity_distance_threshold_radians,
+                            clamp_mean_proximity_distance_radians,
+                            output_grd_files,
+                            simplify_geometries,
+                            shortest_path_grid_filename,
+                            bound_distance_search_by_clamp,
+                            reconstruction_snapshot_directory,
+                            additional_proximity_targets,
+                            output_proximity_statistics,
+                            output_distance_percentiles,
+                            reduced_precision,
+                            sediment_predictions
+                        ) for task_age_grid_filenames_and_paleo_times_list in task_age_grid_filenames_and_paleo_times_lists
+                    ),
+                    1) # chunksize
+            
+            # Get the metrics of each task as it completes (in any order).
+            #
+            # Getting the results using a timeout avoids a bug in Python where a keyboard interrupt does not work properly.
+            # See http://stackoverflow.com/questions/1408356/keyboard-interrupts-with-pythons-multiprocessing-pool
+            try:
+                for _ in range(len(task_age_grid_filenames_and_paleo_times_lists)):
+                    task_metrics = pool_imap_result.next(999999)
+                    if task_metrics is not None:  # None if task was interrupted
+                        add_task_metrics(task_metrics)
+            except KeyboardInterrupt:
+                # Note: 'finally' block below gets executed before returning.
+                return task_metrics_list
+        finally:
+            pool.close()
+            pool.join()
+        
+        return task_metrics_list
+
     finally:
-        pool.close()
-        pool.join()
+        if temporary_directory:
+            shutil.rmtree(temporary_directory, ignore_errors=True)
+
+
+@dataclass
+class ProximityOptions:
+    """
+    Options for generating proximity data with 'generate_and_write_proximity_data_from_options()'.
+    
+    These mirror the command-line options of this script (eg, distances are in Kms), so they can be filled directly
+    from a parsed configuration (eg, by the '01_generate_distance_grids.py' workflow script) rather than a command line.
+    """
+    
+    rotation_filenames: List[str]
+    proximity_filenames: List[str]
+    topological_reconstruction_filenames: List[str]
+    # Format string (eg, "AgeGrid-{:.0f}.nc") that generates age grid filenames from the age grid paleo times.
+    age_grid_filenames_format: str
+    age_grid_paleo_times: List[float]
+    output_directory: str
+    proximity_features_are_topological: bool = True
+    # Defaults to all proximity features.
+    proximity_feature_types: Optional[List[str]] = None
+    anchor_plate_id: int = 0
+    continent_obstacle_filenames: Optional[List[str]] = None
+    # Can only be specified if 'continent_obstacle_filenames' is also specified.
+    # Defaults to DEFAULT_PLATE_BOUNDARY_OBSTACLE_FEATURE_TYPES (an empty list means no plate boundary obstacles).
+    plate_boundary_obstacle_feature_types: Optional[List[str]] = None
+    max_topological_reconstruction_time: Optional[int] = None
+    time_increment: int = 1
+    max_distance_threshold_kms: Optional[float] = None
+    clamp_mean_distance_kms: Optional[float] = None
+    simplify_geometries: bool = False
+    cache_reconstruction_snapshots: bool = False
+    num_spatial_shards: int = 1
+    bound_distance_search_by_clamp: bool = False
+    # Defaults to all available CPUs.
+    num_cpus: Optional[int] = None
+    max_memory_usage_in_gb: Optional[float] = None
+    # If none of the output options are specified then 'output_distance_with_time' is used.
+    output_distance_with_time: bool = False
+    output_mean_distance: bool = False
+    output_std_dev_distance: bool = False
+    output_grd_files: bool = False
+    # Either 'ocean_basin_grid_spacing' (in degrees) or 'ocean_basin_points_filename' must be specified (but not both).
+    ocean_basin_grid_spacing: Optional[float] = None
+    upscale_mean_std_dev_grid_spacing: Optional[float] = None
+    ocean_basin_points_filename: Optional[str] = None
+    # Optional (lon_min, lon_max, lat_min, lat_max) region. Only ocean basin points inside it are processed (and output grids cover only it).
+    # The points are still reconstructed globally (and distances are to all proximity features, including those outside the region).
+    region: Optional[Tuple[float, float, float, float]] = None
+    # Optional named proximity targets whose distances are also calculated (and written to files prefixed with the target name).
+    additional_proximity_targets: Optional[List[ProximityTarget]] = None
+    # Also write the mean/std-dev accumulators of each age grid (see 'regenerate_proximity_grids()').
+    # Can only be specified if 'output_mean_distance' and/or 'output_std_dev_distance' is also specified.
+    output_proximity_statistics: bool = False
+    # Optional percentiles (in the range [0, 100]) of each point's distances over its lifetime (eg, [10, 50, 90] for p10, median and p90).
+    output_distance_percentiles: Optional[List[float]] = None
+    # Accumulate the mean/std-dev statistics in 32-bit floats (and 16-bit counts), use 32-bit upscaling stencils and
+    # write the mean/std-dev/percentile grids as 16-bit integers (in kms). The error against 64-bit is printed per age grid.
+    reduced_precision: bool = False
+    # Optionally predict sediment thickness (and/or rate) grids directly from the in-memory mean distances (see 'write_proximity_data()').
+    # Can only be specified if 'output_grd_files' and 'upscale_mean_std_dev_grid_spacing' are also specified.
+    # Mean distance grids are then only written if 'output_mean_distance' is also specified.
+    sediment_predictions: Optional[List[SedimentPrediction]] = None
+
+
+def generate_and_write_proximity_data_from_options(
+        options: ProximityOptions,
+        task_metrics_callback: Optional[Callable[[ProximityTaskMetrics], None]] = None) -> List[ProximityTaskMetrics]:
+    """
+    Validate the specified 'ProximityOptions' and pass them to 'generate_and_write_proximity_data_parallel()'.
+    
+    Returns a list of 'ProximityTaskMetrics' (one per task). If 'task_metrics_callback' is specified then it is called
+    with the metrics of each task as it completes. Raises ValueError if the options are inconsistent.
+    """
+    
+    # Default to 'output_distance_with_time' if no output options are specified.
+    output_distance_with_time = options.output_distance_with_time
+    if (not options.output_distance_with_time and
+        not options.output_mean_distance and
+        not options.output_std_dev_distance and
+        not options.output_distance_percentiles and
+        not options.sediment_predictions):
+        output_distance_with_time = True
+    
+    # Generate a list of tuples of age grid filename and paleo time.
+    # These are generated from the age grid filenames format and a list of age grid paleo times.
+    age_grid_filenames_and_paleo_times = [(options.age_grid_filenames_format.format(age_grid_paleo_time), age_grid_paleo_time)
+                                          for age_grid_paleo_time in options.age_grid_paleo_times]
+    
+    if options.ocean_basin_points_filename is not None:
+        if options.ocean_basin_grid_spacing is not None:
+            raise ValueError("'ocean_basin_grid_spacing' and 'ocean_basin_points_filename' cannot both be specified.")
+        if options.upscale_mean_std_dev_grid_spacing is not None:
+            raise ValueError("'upscale_mean_std_dev_grid_spacing' and 'ocean_basin_points_filename' cannot both be specified.")
+        if options.output_grd_files:
+            raise ValueError("'output_grd_files' and 'ocean_basin_points_filename' cannot both be specified.")
+    else:  # options.ocean_basin_points_filename not specified...
+        if options.ocean_basin_grid_spacing is None:
+            raise ValueError("'ocean_basin_grid_spacing' must be specified if 'ocean_basin_points_filename' is not specified.")
+        if options.upscale_mean_std_dev_grid_spacing is not None:
+            if not options.output_grd_files:
+                raise ValueError("'upscale_mean_std_dev_grid_spacing' can only be specified if 'output_grd_files' is also specified.")
+    
+    if options.output_proximity_statistics:
+        if not options.output_mean_distance and not options.output_std_dev_distance and not options.output_distance_percentiles:
+            raise ValueError("'output_proximity_statistics' can only be specified if 'output_mean_distance', 'output_std_dev_distance' "
+                             "and/or 'output_distance_percentiles' is also specified.")
+    
+    if options.output_distance_percentiles:
+        if any(percentile < 0 or percentile > 100 for percentile in options.output_distance_percentiles):
+            raise ValueError("'output_distance_percentiles' must be in the range [0, 100].")
+    
+    if options.sediment_predictions:
+        if not options.output_grd_files or options.upscale_mean_std_dev_grid_spacing is None:
+            raise ValueError("'sediment_predictions' can only be specified if 'output_grd_files' and 'upscale_mean_std_dev_grid_spacing' are also specified.")
+    
+    if options.region is not None:
+        region_lon_min, region_lon_max, region_lat_min, region_lat_max = options.region
+        if region_lon_min >= region_lon_max or region_lat_min >= region_lat_max:
+            raise ValueError("'region' must have minimum longitude/latitude less than maximum longitude/latitude.")
+    
+    # Get the input points (only those inside the region, if one is specified).
+    if options.ocean_basin_points_filename is not None:
+        input_points = read_input_points(options.ocean_basin_points_filename)
+        if options.region is not None and len(input_points):
+            input_points = input_points[
+                    (input_points[:, 0] >= region_lon_min) & (input_points[:, 0] <= region_lon_max) &
+                    (input_points[:, 1] >= region_lat_min) & (input_points[:, 1] <= region_lat_max)]
+    else:
+        input_points, num_grid_longitudes, num_grid_latitudes = generate_input_points_grid(options.ocean_basin_grid_spacing, options.region)
+    
+    if not len(input_points):
+        raise ValueError('There are no ocean basin points to process (inside the region).')
+    
+    # Convert maximum proximity distance from Kms to radians (if it was specified).
+    if options.max_distance_threshold_kms is None:
+        proximity_distance_threshold_radians = None
+    else:
+        proximity_distance_threshold_radians = options.max_distance_threshold_kms / pygplates.Earth.mean_radius_in_kms
+        if proximity_distance_threshold_radians > 2 * math.pi:
+            # Exceeds circumference of Earth so no need for threshold.
+            proximity_distance_threshold_radians = None
+    
+    # Convert clamp mean proximity distance from Kms to radians (if it was specified).
+    if options.clamp_mean_distance_kms is None:
+        clamp_mean_proximity_distance_radians = None
+    else:
+        clamp_mean_proximity_distance_radians = options.clamp_mean_distance_kms / pygplates.Earth.mean_radius_in_kms
+        if clamp_mean_proximity_distance_radians > 2 * math.pi:
+            # Exceeds circumference of Earth so no need for clamping.
+            clamp_mean_proximity_distance_radians = None
+    
+    if options.additional_proximity_targets:
+        target_names = [target.name for target in options.additional_proximity_targets]
+        if len(set(target_names)) != len(target_names):
+            raise ValueError("'additional_proximity_targets' must have unique names.")
+        for target in options.additional_proximity_targets:
+            if not target.name or os.sep in target.name:
+                raise ValueError('Invalid additional proximity target name "{}" (it is used to prefix output filenames).'.format(target.name))
+            if not target.proximity_filenames:
+                raise ValueError('Additional proximity target "{}" has no proximity files.'.format(target.name))
+    
+    # Plate boundary obstacles.
+    if options.plate_boundary_obstacle_feature_types is not None:
+        if options.continent_obstacle_filenames is None:
+            raise ValueError("'plate_boundary_obstacle_feature_types' cannot be specified unless 'continent_obstacle_filenames' is also specified.")
+        plate_boundary_obstacle_feature_types = options.plate_boundary_obstacle_feature_types  # note: could be empty if user explicitly specified an empty list
+    else:
+        plate_boundary_obstacle_feature_types = DEFAULT_PLATE_BOUNDARY_OBSTACLE_FEATURE_TYPES  # use default feature types if user did not specify any
+    
+    return generate_and_write_proximity_data_parallel(
+            input_points,
+            options.rotation_filenames,
+            options.proximity_filenames,
+            options.proximity_features_are_topological,
+            options.proximity_feature_types,
+            options.topological_reconstruction_filenames,
+            age_grid_filenames_and_paleo_times,
+            options.time_increment,
+            output_distance_with_time,
+            options.output_mean_distance,
+            options.output_std_dev_distance,
+            options.output_directory,
+            options.max_topological_reconstruction_time,
+            options.continent_obstacle_filenames,
+            plate_boundary_obstacle_feature_types,
+            options.anchor_plate_id,
+            proximity_distance_threshold_radians,
+            clamp_mean_proximity_distance_radians,
+            (options.ocean_basin_grid_spacing, options.upscale_mean_std_dev_grid_spacing, options.region) if options.output_grd_files else None,
+            options.num_cpus,
+            options.max_memory_usage_in_gb,
+            options.simplify_geometries,
+            options.bound_distance_search_by_clamp,
+            options.cache_reconstruction_snapshots,
+            options.num_spatial_shards,
+            options.additional_proximity_targets,
+            options.output_proximity_statistics,
+            options.output_distance_percentiles,
+            options.reduced_precision,
+            options.sediment_predictions,
+            task_metrics_callback)
+
+
+def regenerate_proximity_grids(
+        statistics_filename,
+        output_directory,
+        output_mean_distance = True,
+        output_std_dev_distance = False,
+        clamp_mean_distance_kms = None,
+        upscale_mean_std_dev_grid_spacing = None,  # if None then the upscaled grid spacing used when writing the statistics file
+        age_grid_filename = None,  # if None then the age grid filename used when writing the statistics file
+        output_distance_percentiles = None):  # optional sequence of percentiles (in the range [0, 100]) of distance
+    """
+    Regenerate the mean, standard deviation and/or percentile distance outputs of an age grid from its statistics file (see 'write_proximity_statistics_file()').
+
+    This avoids recalculating the distances (reconstructing the ocean basin points over time) when only the clamp or grid spacing changes.
+    The outputs are written to 'output_directory' with the same filenames as 'write_proximity_data()'.
+    Raises ValueError if the statistics cannot produce the requested outputs.
+    """
+
+    proximity_statistics = read_proximity_statistics_file(statistics_filename)
+    proximity_data = proximity_statistics.proximity_data
+
+    if output_distance_percentiles and not hasattr(proximity_data, 'quantile_sketches'):
+        raise ValueError('Cannot regenerate percentile distances from "{}" since it was written without percentiles.'.format(statistics_filename))
+
+    # If the distance search was bounded by the mean distance clamp then distances beyond it were saturated, so only
+    # mean distances clamped to (at most) that clamp are valid.
+    if proximity_data.saturated_beyond_clamp:
+        if output_std_dev_distance or output_distance_percentiles:
+            raise ValueError('Cannot regenerate standard deviation or percentile distances from "{}" since the distance search was bounded by the clamp.'.format(
+                    statistics_filename))
+        if clamp_mean_distance_kms is None or clamp_mean_distance_kms > proximity_data.clamp_mean_proximity_in_kms:
+            raise ValueError('Mean distances from "{}" must be clamped to at most {} kms since the distance search was bounded by the clamp.'.format(
+                    statistics_filename, proximity_data.clamp_mean_proximity_in_kms))
+
+    proximity_data.clamp_mean_proximity_in_kms = clamp_mean_distance_kms
+    proximity_data.output_mean_proximity = output_mean_distance
+    proximity_data.output_standard_deviation_proximity = output_std_dev_distance
+    proximity_data.output_proximity_percentiles = output_distance_percentiles
+
+    output_grd_files = proximity_statistics.output_grd_files
+    if output_grd_files and upscale_mean_std_dev_grid_spacing is not None:
+        ocean_basin_grid_spacing, _, region = output_grd_files
+        output_grd_files = (ocean_basin_grid_spacing, upscale_mean_std_dev_grid_spacing, region)
+
+    if age_grid_filename is None:
+        age_grid_filename = proximity_statistics.age_grid_filename
+
+    write_proximity_data(
+            {proximity_statistics.age_grid_paleo_time : proximity_data},
+            [(age_grid_filename, proximity_statistics.age_grid_paleo_time)],
+            output_directory,
+            False,  # output_distance_with_time
+            output_mean_distance,
+            output_std_dev_distance,
+            output_grd_files,
+            output_filename_prefix = proximity_statistics.output_filename_prefix,
+            output_distance_percentiles = output_distance_percentiles)
 
 
 if __name__ == '__main__':
@@ -1681,6 +3601,8 @@ if __name__ == '__main__':
         See the '-j' option.
      3) A similar output ".xy" (or ".nc") file can be generated containing standard deviation (instead of mean) distance.
         See the '-k' option.
+     4) Similar output ".xy" (or ".nc") files can be generated containing percentile (eg, median) distances.
+        See the '--output_distance_percentiles' option.
     If the '-w' option is specified then the output files are grid files (".nc"), otherwise they're xyz files (".xy").
     
     If an ocean basin point falls outside an age grid then it is ignored.
@@ -1766,6 +3688,36 @@ if __name__ == '__main__':
                 help='*Mean* distances (in Kms) above this optional maximum mean distance are *clamped* to it. '
                      'If specified then *mean* distances (between ocean basin points and proximity features) exceeding this value will be *clamped* to it, '
                      'otherwise mean distances are unclamped.')
+        parser.add_argument('--simplify_geometries', action='store_true',
+                help='Simplify the reconstructed obstacle and proximity geometries to a tolerance tied to the shortest path grid spacing. '
+                     'This reduces the time taken to calculate shortest path distances (around obstacles) for highly detailed geometries (eg, coastlines). '
+                     'Only used if "continent_obstacle_filenames" is also specified. By default geometries are not simplified.')
+        parser.add_argument('--cache_reconstruction_snapshots', action='store_true',
+                help='Reconstruct the proximity and obstacle features once per time (in parallel) and share the reconstructed geometries with all tasks '
+                     '(via temporary files). This avoids tasks with overlapping times repeating the same reconstructions, but uses temporary disk space. '
+                     'By default each task reconstructs the features itself.')
+        parser.add_argument('--num_spatial_shards', type=int, default=1,
+                help='Split the ocean basin points into this many spatial shards (latitude bands) that are processed by separate CPUs '
+                     '(and merged before writing). This speeds up runs with fewer age grids than CPUs (eg, only present day). '
+                     'Defaults to 1 (no sharding). Ignored if only one CPU is used.')
+        parser.add_argument('--bound_distance_search_by_clamp', action='store_true',
+                help='Only search distances up to where the clamped mean distance of each ocean point is guaranteed to be the clamp value '
+                     '(distances beyond that are saturated). This reduces the time taken to calculate distances without changing the clamped mean distances. '
+                     'Only used if "clamp_mean_distance" is also specified. Only mean distances can be output with this option. '
+                     'By default the distance search is not bounded by the clamp.')
+        parser.add_argument('--region', type=float, nargs=4,
+                metavar=('lon_min', 'lon_max', 'lat_min', 'lat_max'),
+                help='Only process ocean basin points inside this lon/lat region (and only output grids covering it). '
+                     'Points are still reconstructed globally and distances are still to all proximity features (including those outside the region). '
+                     'Defaults to global.')
+        parser.add_argument('--additional_proximity_target', type=str, nargs='+', action='append',
+                dest='additional_proximity_targets', metavar=('name', 'proximity_filename'),
+                help='A named set of proximity files whose distances are also calculated, in the same pass as the main proximity files '
+                     '(so the ocean basin points and obstacles are only reconstructed once for all of them). '
+                     'The output files of each are prefixed with its name (eg, "<name>_mean_distance_..."). '
+                     'They are topological or non-topological according to "-n/--non_topological_proximity_features", '
+                     'and all their features are used (ie, "-b/--proximity_feature_types" does not apply). '
+                     'Can be specified more than once (once per target). By default there are no additional targets.')
         parser.add_argument('-c', '--num_cpus', type=int,
                 help='The number of CPUs to use for calculations. Defaults to all available CPUs.')
         parser.add_argument('-u', '--max_memory_usage', type=int,
@@ -1782,6 +3734,25 @@ if __name__ == '__main__':
         parser.add_argument('-k', '--output_std_dev_distance', action='store_true',
                 help='For each input point write its standard deviation of distances to features averaged over its lifetime. '
                      'By default it is not written.')
+        parser.add_argument('--output_distance_percentiles', type=float, nargs='+',
+                metavar='percentile',
+                help='For each input point write these percentiles (in the range [0, 100]) of its distances to features over its lifetime '
+                     '(eg, "10 50 90" writes "p10_distance_...", "median_distance_..." and "p90_distance_..." files). '
+                     'Each point accumulates a fixed-size sketch of its distances (rather than storing each distance, as with "-d"), '
+                     'so percentiles are accurate to within the sketch bin width (about 20kms at 100kms and 70kms at 1000kms). '
+                     'By default they are not written.')
+        parser.add_argument('--output_proximity_statistics', action='store_true',
+                help='For each age grid also write the accumulated distance statistics (number, sum and sum-of-squares of distances) of its points '
+                     'to a compressed ".npz" file. The mean and standard deviation outputs can later be regenerated from these files '
+                     '(eg, with a different clamp or grid spacing) using "regenerate_proximity_grids.py" (without recalculating distances). '
+                     'Can only be specified if "output_mean_distance", "output_std_dev_distance" and/or "output_distance_percentiles" is also specified. '
+                     'By default they are not written.')
+        parser.add_argument('--reduced_precision', action='store_true',
+                help='Accumulate the distance statistics of each point in 32-bit floats (and 16-bit counts) rather than 64-bit floats, '
+                     'use 32-bit upscaling stencils, and write the mean, standard deviation and percentile grids as 16-bit integers (rounded to kms). '
+                     'This reduces memory usage (so more age grids can be processed per task) and grid file sizes. '
+                     'The maximum error against 64-bit (measured at a sample of points) is printed for each age grid. '
+                     'By default 64-bit floats (and 32-bit float grids) are used.')
         parser.add_argument('-w', '--output_grd_files', action='store_true',
                 help='Generate grid files (".nc") instead of xyz files (".xy"). '
                      'By default only xyz files are written. '
@@ -1815,85 +3786,42 @@ if __name__ == '__main__':
         # Parse command-line options.
         args = parser.parse_args()
         
-        # Default to 'output_distance_with_time' if no output options are specified.
-        if (not args.output_distance_with_time and
-            not args.output_mean_distance and
-            not args.output_std_dev_distance):
-            args.output_distance_with_time = True
-        
-        # Generate a list of tuples of age grid filename and paleo time.
-        # These are generated from the age grid filenames format and a list of age grid paleo times.
-        age_grid_filenames_and_paleo_times = [(args.age_grid_filenames_format.format(age_grid_paleo_time), age_grid_paleo_time)
-                                              for age_grid_paleo_time in args.age_grid_paleo_times]
-        
-        if args.ocean_basin_points_filename is not None:
-            if args.ocean_basin_grid_spacing is not None:
-                raise argparse.ArgumentTypeError("'ocean_basin_grid_spacing' and 'ocean_basin_points_filename' cannot both be specified.")
-            if args.upscale_mean_std_dev_grid_spacing is not None:
-                raise argparse.ArgumentTypeError("'upscale_mean_std_dev_grid_spacing' and 'ocean_basin_points_filename' cannot both be specified.")
-            if args.output_grd_files is not None:
-                raise argparse.ArgumentTypeError("'output_grd_files' and 'ocean_basin_points_filename' cannot both be specified.")
-        else:  # args.ocean_basin_points_filename not specified...
-            if args.ocean_basin_grid_spacing is None:
-                raise argparse.ArgumentTypeError("'ocean_basin_grid_spacing' must be specified if 'ocean_basin_points_filename' is not specified.")
-            if args.upscale_mean_std_dev_grid_spacing is not None:
-                if args.output_grd_files is None:
-                    raise argparse.ArgumentTypeError("'upscale_mean_std_dev_grid_spacing' can only be specified if 'output_grd_files' is also specified.")
-        
-        # Get the input points.
-        if args.ocean_basin_points_filename is not None:
-            input_points = read_input_points(args.ocean_basin_points_filename)
-        else:
-            input_points, num_grid_longitudes, num_grid_latitudes = generate_input_points_grid(args.ocean_basin_grid_spacing)
-        
-        # Convert maximum proximity distance from Kms to radians (if it was specified).
-        if args.max_distance_threshold is None:
-            proximity_distance_threshold_radians = None
-        else:
-            proximity_distance_threshold_radians = args.max_distance_threshold / pygplates.Earth.mean_radius_in_kms
-            if proximity_distance_threshold_radians > 2 * math.pi:
-                # Exceeds circumference of Earth so no need for threshold.
-                proximity_distance_threshold_radians = None
-        
-        # Convert clamp mean proximity distance from Kms to radians (if it was specified).
-        if args.clamp_mean_distance is None:
-            clamp_mean_proximity_distance_radians = None
-        else:
-            clamp_mean_proximity_distance_radians = args.clamp_mean_distance / pygplates.Earth.mean_radius_in_kms
-            if clamp_mean_proximity_distance_radians > 2 * math.pi:
-                # Exceeds circumference of Earth so no need for clamping.
-                clamp_mean_proximity_distance_radians = None
-        
-        # Plate boundary obstacles.
-        if args.plate_boundary_obstacle_feature_types is not None:
-            if args.continent_obstacle_filenames is None:
-                raise argparse.ArgumentTypeError("'plate_boundary_obstacle_feature_types' cannot be specified unless 'continent_obstacle_filenames' is also specified.")
-            plate_boundary_obstacle_feature_types = args.plate_boundary_obstacle_feature_types  # note: could be empty if user explicitly specified an empty list in argument
-        else:
-            plate_boundary_obstacle_feature_types = DEFAULT_PLATE_BOUNDARY_OBSTACLE_FEATURE_TYPES  # use default feature types if user did not use argument at all
-        
-        generate_and_write_proximity_data_parallel(
-                input_points,
-                args.rotation_filenames,
-                args.proximity_filenames,
-                not args.non_topological_proximity_features, # proximity_features_are_topological
-                args.proximity_feature_types,
-                args.topological_reconstruction_filenames,
-                age_grid_filenames_and_paleo_times,
-                args.time_increment,
-                args.output_distance_with_time,
-                args.output_mean_distance,
-                args.output_std_dev_distance,
-                args.output_directory,
-                args.max_topological_reconstruction_time,
-                args.continent_obstacle_filenames,
-                plate_boundary_obstacle_feature_types,
-                args.anchor_plate_id,
-                proximity_distance_threshold_radians,
-                clamp_mean_proximity_distance_radians,
-                (args.ocean_basin_grid_spacing, args.upscale_mean_std_dev_grid_spacing) if args.output_grd_files else None,
-                args.num_cpus,
-                args.max_memory_usage_in_gb)
+        generate_and_write_proximity_data_from_options(ProximityOptions(
+                rotation_filenames=args.rotation_filenames,
+                proximity_filenames=args.proximity_filenames,
+                topological_reconstruction_filenames=args.topological_reconstruction_filenames,
+                age_grid_filenames_format=args.age_grid_filenames_format,
+                age_grid_paleo_times=args.age_grid_paleo_times,
+                output_directory=args.output_directory,
+                proximity_features_are_topological=not args.non_topological_proximity_features,
+                proximity_feature_types=args.proximity_feature_types,
+                anchor_plate_id=args.anchor_plate_id,
+                continent_obstacle_filenames=args.continent_obstacle_filenames,
+                plate_boundary_obstacle_feature_types=args.plate_boundary_obstacle_feature_types,
+                max_topological_reconstruction_time=args.max_topological_reconstruction_time,
+                time_increment=args.time_increment,
+                max_distance_threshold_kms=args.max_distance_threshold,
+                clamp_mean_distance_kms=args.clamp_mean_distance,
+                simplify_geometries=args.simplify_geometries,
+                cache_reconstruction_snapshots=args.cache_reconstruction_snapshots,
+                num_spatial_shards=args.num_spatial_shards,
+                bound_distance_search_by_clamp=args.bound_distance_search_by_clamp,
+                num_cpus=args.num_cpus,
+                max_memory_usage_in_gb=args.max_memory_usage_in_gb,
+                output_distance_with_time=args.output_distance_with_time,
+                output_mean_distance=args.output_mean_distance,
+                output_std_dev_distance=args.output_std_dev_distance,
+                output_grd_files=args.output_grd_files,
+                ocean_basin_grid_spacing=args.ocean_basin_grid_spacing,
+                upscale_mean_std_dev_grid_spacing=args.upscale_mean_std_dev_grid_spacing,
+                ocean_basin_points_filename=args.ocean_basin_points_filename,
+                region=tuple(args.region) if args.region is not None else None,
+                additional_proximity_targets=[
+                        ProximityTarget(target_args[0], target_args[1:], not args.non_topological_proximity_features)
+                        for target_args in args.additional_proximity_targets] if args.additional_proximity_targets else None,
+                output_proximity_statistics=args.output_proximity_statistics,
+                output_distance_percentiles=args.output_distance_percentiles,
+                reduced_precision=args.reduced_precision))
         
         sys.exit(0)
     
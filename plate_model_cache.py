@@ -0,0 +1,131 @@
+"""
+    Copyright (C) 2024 The University of Sydney, Australia
+    
+    This program is free software; you can redistribute it and/or modify it under
+    the terms of the GNU General Public License, version 2, as published by
+    the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful, but WITHOUT
+    ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+    FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+    for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+
+##########################################################################################
+# Optionally cache loaded plate model files (rotation models and features) in a process. #
+##########################################################################################
+
+
+
+import os
+import pygplates
+
+
+class PlateModelCache(object):
+    """
+    Loaded rotation models and features keyed by their files (and anchor plate for rotation models).
+
+    Each file is keyed by its absolute path, modification time and size, so a file that is edited
+    is loaded again (rather than returning the stale cached version).
+
+    Note that the cached objects are shared by all callers and so should be treated as read-only.
+    """
+
+    def __init__(self):
+        self._features = {}
+        self._rotation_models = {}
+        self.num_hits = 0
+        self.num_misses = 0
+
+    def get_features(self, filenames):
+        """Return a list of the features in the specified files (a filename or a sequence of filenames)."""
+
+        features = []
+        for filename in _get_filenames(filenames):
+            file_key = _get_file_key(filename)
+            file_features = self._features.get(file_key)
+            if file_features is None:
+                file_features = list(pygplates.FeatureCollection(filename))
+                self._features[file_key] = file_features
+                self.num_misses += 1
+            else:
+                self.num_hits += 1
+            features.extend(file_features)
+
+        return features
+
+    def get_rotation_model(self, rotation_filenames, anchor_plate_id=0):
+        """Return a rotation model of the specified rotation files (a filename or a sequence of filenames)."""
+
+        rotation_model_key = (tuple(_get_file_key(filename) for filename in _get_filenames(rotation_filenames)), anchor_plate_id)
+        rotation_model = self._rotation_models.get(rotation_model_key)
+        if rotation_model is None:
+            # Note: The rotation features themselves are also cached (eg, so a different anchor plate doesn't parse the files again).
+            rotation_model = pygplates.RotationModel(self.get_features(rotation_filenames), default_anchor_plate_id=anchor_plate_id)
+            self._rotation_models[rotation_model_key] = rotation_model
+        else:
+            self.num_hits += 1
+
+        return rotation_model
+
+    def clear(self):
+        self._features.clear()
+        self._rotation_models.clear()
+
+
+def _get_filenames(filenames):
+    if isinstance(filenames, str):
+        return [filenames]
+    return filenames
+
+
+def _get_file_key(filename):
+    file_stat = os.stat(filename)
+    return os.path.abspath(filename), file_stat.st_mtime_ns, file_stat.st_size
+
+
+# The cache of the current process (or None if caching is not enabled, which is the default).
+_cache = None
+
+
+def enable():
+    """Enable caching of loaded plate model files in the current process (if not already enabled), and return the cache."""
+
+    global _cache
+    if _cache is None:
+        _cache = PlateModelCache()
+    return _cache
+
+
+def disable():
+    """Disable caching of loaded plate model files in the current process (releasing the cached files)."""
+
+    global _cache
+    _cache = None
+
+
+def get_cache():
+    """Return the cache of the current process (or None if caching is not enabled)."""
+
+    return _cache
+
+
+def load_features(filenames):
+    """Load the features in the specified files (from the cache if caching is enabled in the current process)."""
+
+    if _cache is None:
+        return pygplates.FeaturesFunctionArgument(filenames).get_features()
+    return _cache.get_features(filenames)
+
+
+def load_rotation_model(rotation_filenames, anchor_plate_id=0):
+    """Load a rotation model from the specified rotation files (from the cache if caching is enabled in the current process)."""
+
+    if _cache is None:
+        return pygplates.RotationModel(rotation_filenames, default_anchor_plate_id=anchor_plate_id)
+    return _cache.get_rotation_model(rotation_filenames, anchor_plate_id)
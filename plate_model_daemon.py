@@ -0,0 +1,314 @@
+"""
+    Copyright (C) 2024 The University of Sydney, Australia
+    
+    This program is free software; you can redistribute it and/or modify it under
+    the terms of the GNU General Public License, version 2, as published by
+    the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful, but WITHOUT
+    ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+    FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+    for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+
+##################################################################################################
+# Optional long-lived local daemon that keeps plate models loaded between runs of the workflow.  #
+#                                                                                                #
+# The daemon enables the plate model cache (see 'plate_model_cache.py') in its process, so       #
+# rotation models, feature collections and shortest path grids are loaded once and then reused  #
+# by all jobs submitted to it (over a Unix socket). Jobs that use a multiprocessing pool fork    #
+# their workers from the daemon, so the workers also inherit the loaded models.                  #
+##################################################################################################
+
+
+
+import argparse
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+import os
+import plate_model_cache
+import secrets
+import stat
+import sys
+import traceback
+
+
+# Size (in bytes) of the key that clients must know to connect to the daemon.
+_AUTHKEY_NUM_BYTES = 32
+
+
+class PlateModelDaemonError(Exception):
+    """Raised (in the submitting process) when a job submitted to the daemon fails."""
+    pass
+
+
+def get_daemon_directory():
+    """
+    The per-user directory containing the daemon's default Unix socket and its authentication key.
+
+    This is '$XDG_RUNTIME_DIR/plate_model_daemon' if 'XDG_RUNTIME_DIR' is set, otherwise '~/.plate_model_daemon'.
+    It is created (if necessary) accessible only by the current user.
+    Raises PlateModelDaemonError if it is owned by another user or accessible by other users.
+    """
+
+    runtime_directory = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_directory:
+        daemon_directory = os.path.join(runtime_directory, 'plate_model_daemon')
+    else:
+        daemon_directory = os.path.join(os.path.expanduser('~'), '.plate_model_daemon')
+
+    os.makedirs(daemon_directory, mode=0o700, exist_ok=True)
+
+    daemon_directory_stat = os.lstat(daemon_directory)
+    if (not stat.S_ISDIR(daemon_directory_stat.st_mode) or
+        daemon_directory_stat.st_uid != os.getuid() or
+        stat.S_IMODE(daemon_directory_stat.st_mode) & 0o077):
+        raise PlateModelDaemonError(
+                'Plate model daemon directory "{}" must be a directory owned by, and only accessible by, the current user.'.format(daemon_directory))
+
+    return daemon_directory
+
+
+def get_default_socket_filename():
+    """The default Unix socket of the daemon (one per user, in the per-user 'get_daemon_directory()')."""
+
+    return os.path.join(get_daemon_directory(), 'plate_model_daemon.sock')
+
+
+def get_authkey():
+    """
+    The key that the daemon and its clients use to authenticate each other (one per user).
+
+    It is generated on first use and stored in the per-user 'get_daemon_directory()' (readable only by the current user).
+    Jobs and their results are pickled, so only processes that know the key can submit jobs to the daemon (or reply to a client).
+    """
+
+    authkey_filename = os.path.join(get_daemon_directory(), 'authkey')
+
+    try:
+        authkey_file_descriptor = os.open(authkey_filename, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        pass
+    else:
+        with os.fdopen(authkey_file_descriptor, 'wb') as authkey_file:
+            authkey_file.write(secrets.token_bytes(_AUTHKEY_NUM_BYTES))
+
+    with open(authkey_filename, 'rb') as authkey_file:
+        authkey = authkey_file.read()
+
+    if len(authkey) != _AUTHKEY_NUM_BYTES:
+        raise PlateModelDaemonError('Plate model daemon key "{}" is invalid (remove it to generate a new key).'.format(authkey_filename))
+
+    return authkey
+
+
+def _check_socket_owner(socket_filename):
+    """Raise PlateModelDaemonError if the socket was not created by the current user (eg, another user listening in our place)."""
+
+    if os.lstat(socket_filename).st_uid != os.getuid():
+        raise PlateModelDaemonError('Plate model daemon socket "{}" is not owned by the current user.'.format(socket_filename))
+
+
+def _run_proximity_job(proximity_options):
+    import ocean_basin_proximity
+    import shortest_path
+
+    # Load the plate model (or reuse it from a previous job) *before* the proximity pool forks its workers,
+    # so that the workers inherit it (rather than each worker loading it again).
+    plate_model_cache.load_rotation_model(proximity_options.rotation_filenames, proximity_options.anchor_plate_id)
+    plate_model_cache.load_features(proximity_options.proximity_filenames)
+    plate_model_cache.load_features(proximity_options.topological_reconstruction_filenames)
+    for additional_proximity_target in proximity_options.additional_proximity_targets or []:
+        plate_model_cache.load_features(additional_proximity_target.proximity_filenames)
+    if proximity_options.continent_obstacle_filenames:
+        plate_model_cache.load_features(proximity_options.continent_obstacle_filenames)
+        shortest_path.get_shared_grid(ocean_basin_proximity.SHORTEST_PATH_GRID_SUBDIVISION_DEPTH)
+
+    return ocean_basin_proximity.generate_and_write_proximity_data_from_options(proximity_options)
+
+
+def _run_calc_subducting_sediment_volumes_job(*args, **kwargs):
+    import calc_subducting_sediment_volume
+
+    return calc_subducting_sediment_volume.calc_subducting_sediment_volumes(*args, **kwargs)
+
+
+def _run_status_job():
+    cache = plate_model_cache.get_cache()
+    return {'process_id': os.getpid(), 'num_cache_hits': cache.num_hits, 'num_cache_misses': cache.num_misses}
+
+
+def _run_clear_job():
+    import shortest_path
+
+    plate_model_cache.get_cache().clear()
+    shortest_path._shared_grids.clear()
+
+
+# The jobs that can be submitted to the daemon (job name -> function run in the daemon process).
+JOBS = {
+    'proximity' : _run_proximity_job,
+    'calc_subducting_sediment_volumes' : _run_calc_subducting_sediment_volumes_job,
+    'status' : _run_status_job,
+    'clear' : _run_clear_job,
+}
+
+# Special job that stops the daemon.
+_SHUTDOWN_JOB = 'shutdown'
+
+
+def serve(socket_filename=None):
+    """Run the daemon (in the current process) until a 'shutdown' job is submitted."""
+
+    if socket_filename is None:
+        socket_filename = get_default_socket_filename()
+
+    authkey = get_authkey()
+
+    if os.path.lexists(socket_filename):
+        _check_socket_owner(socket_filename)
+        if is_running(socket_filename):
+            raise RuntimeError('A plate model daemon is already listening on "{}".'.format(socket_filename))
+        # Remove socket file left behind by a daemon that did not shut down cleanly.
+        os.remove(socket_filename)
+
+    plate_model_cache.enable()
+
+    # Only the current user can connect to the socket, and clients must also know the per-user key (jobs and their results are pickled).
+    old_umask = os.umask(0o177)
+    try:
+        listener = Listener(socket_filename, family='AF_UNIX', authkey=authkey)
+    finally:
+        os.umask(old_umask)
+
+    print('Plate model daemon (process {}) listening on "{}"'.format(os.getpid(), socket_filename), flush=True)
+
+    # Note: Closing the listener also removes the socket file.
+    with listener:
+        while True:
+            try:
+                connection = listener.accept()
+            except (AuthenticationError, EOFError, ConnectionError):
+                # Client does not know the key (or went away during authentication).
+                continue
+
+            with connection:
+                try:
+                    job_name, args, kwargs, job_working_directory = connection.recv()
+                except EOFError:
+                    continue
+
+                if job_name == _SHUTDOWN_JOB:
+                    connection.send((True, None))
+                    break
+
+                print('Running job "{}"...'.format(job_name), flush=True)
+                # Run the job in the working directory of the submitting process (so relative filenames are the same).
+                daemon_working_directory = os.getcwd()
+                try:
+                    job_function = JOBS.get(job_name)
+                    if job_function is None:
+                        raise ValueError('Unknown job "{}".'.format(job_name))
+                    os.chdir(job_working_directory)
+                    result = (True, job_function(*args, **kwargs))
+                except Exception:
+                    # Send the traceback (rather than the exception) since not all exceptions can be pickled.
+                    result = (False, traceback.format_exc())
+                finally:
+                    os.chdir(daemon_working_directory)
+
+                try:
+                    connection.send(result)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The submitting process has gone away (eg, was interrupted).
+                    pass
+
+
+def submit_job(job_name, *args, socket_filename=None, **kwargs):
+    """
+    Run the specified job (see 'JOBS') in the daemon and return its result.
+
+    The job arguments and result are pickled. Raises PlateModelDaemonError if the job fails in the daemon.
+    """
+
+    if socket_filename is None:
+        socket_filename = get_default_socket_filename()
+
+    # Make sure we're talking to our own daemon before sending it a job (and unpickling its result).
+    _check_socket_owner(socket_filename)
+    with Client(socket_filename, family='AF_UNIX', authkey=get_authkey()) as connection:
+        connection.send((job_name, args, kwargs, os.getcwd()))
+        succeeded, result = connection.recv()
+
+    if not succeeded:
+        raise PlateModelDaemonError('Job "{}" failed in plate model daemon:\n{}'.format(job_name, result))
+
+    return result
+
+
+def is_running(socket_filename=None):
+    """Whether a daemon is listening on the specified socket."""
+
+    if socket_filename is None:
+        socket_filename = get_default_socket_filename()
+
+    try:
+        _check_socket_owner(socket_filename)
+        with Client(socket_filename, family='AF_UNIX', authkey=get_authkey()):
+            pass
+    except (OSError, EOFError, AuthenticationError, PlateModelDaemonError):
+        return False
+    return True
+
+
+if __name__ == '__main__':
+
+    __description__ = \
+    """Long-lived local daemon that keeps plate models loaded between runs of the workflow.
+
+    Rotation models, feature collections and shortest path grids are loaded by the first job that uses them and then
+    reused by later jobs (files that are modified are loaded again). Workflow scripts submit jobs to the daemon
+    over a Unix socket (eg, set "plate_model_daemon_socket" in the yaml config of '01_generate_distance_grids.py').
+
+    For example...
+
+    python %(prog)s start &
+    python %(prog)s status
+    python %(prog)s stop
+     """
+
+    # The command-line parser.
+    parser = argparse.ArgumentParser(description = __description__, formatter_class=argparse.RawDescriptionHelpFormatter)
+
+    parser.add_argument('command', choices=['start', 'stop', 'status', 'clear'],
+            help='Start the daemon (in this process), stop a running daemon, print the cache usage of a running daemon, '
+                 'or clear the loaded plate models of a running daemon.')
+    parser.add_argument('-s', '--socket_filename', type=str,
+            help='The Unix socket of the daemon. Defaults to "plate_model_daemon.sock" in a per-user directory '
+                 '("$XDG_RUNTIME_DIR/plate_model_daemon" or "~/.plate_model_daemon").')
+
+    # Parse command-line options.
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'start':
+            serve(args.socket_filename)
+        elif args.command == 'stop':
+            submit_job(_SHUTDOWN_JOB, socket_filename=args.socket_filename)
+        elif args.command == 'status':
+            print(submit_job('status', socket_filename=args.socket_filename))
+        elif args.command == 'clear':
+            submit_job('clear', socket_filename=args.socket_filename)
+
+        sys.exit(0)
+
+    except KeyboardInterrupt:
+        sys.exit(1)
+    except Exception as exc:
+        print('ERROR: {}'.format(exc), file=sys.stderr)
+        sys.exit(1)
@@ -27,6 +27,7 @@ import argparse
 import math
 import numpy as np
 import os
+import sediment_prediction
 # Try importing 'ptt' first. If that fails then try 'gplately.ptt' (GPlately now contains PlateTectonicTools).
 try:
     from ptt.utils.call_system_command import call_system_command
@@ -75,19 +76,14 @@ def generate_input_points_grid(grid_spacing_degrees):
     
     # Data points start *on* dateline (-180).
     # If 180 is an integer multiple of grid spacing then final longitude also lands on dateline (+180).
-    num_latitudes = int(math.floor(180.0 / grid_spacing_degrees)) + 1
-    num_longitudes = int(math.floor(360.0 / grid_spacing_degrees)) + 1
+    num_longitudes, num_latitudes = sediment_prediction.get_input_points_grid_shape(grid_spacing_degrees)
 
-    input_points = np.full((num_latitudes * num_longitudes, 2), (0.0, 0.0), dtype=float)  # numpy array uses less memory
-    input_point_index = 0
-    for lat_index in range(num_latitudes):
-        lat = -90 + lat_index * grid_spacing_degrees
-        
-        for lon_index in range(num_longitudes):
-            lon = -180 + lon_index * grid_spacing_degrees
-            
-            input_points[input_point_index] = (lon, lat)
-            input_point_index += 1
+    # Points are ordered by latitude and then longitude (ie, all longitudes of the first latitude, then the next latitude, etc).
+    lats = -90 + np.arange(num_latitudes) * grid_spacing_degrees
+    lons = -180 + np.arange(num_longitudes) * grid_spacing_degrees
+    input_points = np.empty((num_latitudes * num_longitudes, 2), dtype=float)  # numpy array uses less memory
+    input_points[:, 0] = np.tile(lons, num_latitudes)
+    input_points[:, 1] = np.repeat(lats, num_longitudes)
     
     return (input_points, num_longitudes, num_latitudes)
 
@@ -175,6 +171,7 @@ def write_grd_file(grd_filename, output_data, grid_spacing, num_grid_longitudes,
 
     #print('..generated: {}'.format(os.path.basename(grd_filename)))
 
+
 def predict_sediment_thickness(
         age,
         distance,
@@ -241,25 +238,65 @@ def predict_sedimentation(
     #variance_age = (sum_square_ages / num_age_distance_points) - (mean_age * mean_age)
     #variance_distance = (sum_square_distances / num_age_distance_points) - (mean_distance * mean_distance)
     
-    std_deviation_age = math.sqrt(variance_age)
-    std_deviation_distance = math.sqrt(variance_distance)
-    
-    # For each ocean basin point predict compacted sediment thickness.
-    lon_lat_sediment_thickness_array = np.full((len(lon_lat_age_distance_array), 3), (0.0, 0.0, 0.0), dtype=float)  # numpy array uses less memory
-    point_index = 0
-    for lon, lat, age, distance in lon_lat_age_distance_array:
-        
-        predicted_sediment_thickness = predict_sediment_thickness(
-                age, distance,
-                mean_age, mean_distance,
-                std_deviation_age, std_deviation_distance,
-                age_distance_polynomial_coefficients)
-        
-        lon_lat_sediment_thickness_array[point_index] = (lon, lat, predicted_sediment_thickness)
-        point_index += 1
+    # Predict compacted sediment thickness for all ocean basin points at once (rather than one point at a time).
+    #
+    # Note: This gives exactly the same predictions as calling 'predict_sediment_thickness()' for each point
+    #       (the polynomial features are summed in the same order).
+    sediment_thickness_model = sediment_prediction.SedimentPredictionModel(
+            mean_age, mean_distance,
+            variance_age, variance_distance,
+            # Ages and distances have already been clamped (by 'get_ages_and_distances()').
+            max_age=None, max_distance=None,
+            age_distance_polynomial_coefficients=age_distance_polynomial_coefficients)
+    
+    # Note: Reshape in case there are no ocean basin points (ie, an empty array).
+    lon_lat_age_distance_array = lon_lat_age_distance_array.reshape(-1, 4)
+    predicted_sediment_thicknesses = sediment_thickness_model.predict(
+            lon_lat_age_distance_array[:, 2],  # ages
+            lon_lat_age_distance_array[:, 3])  # distances
+    
+    lon_lat_sediment_thickness_array = np.column_stack((lon_lat_age_distance_array[:, 0], lon_lat_age_distance_array[:, 1], predicted_sediment_thicknesses))
     
     return lon_lat_sediment_thickness_array
 
+
+def predict_sedimentation_grid(
+        age_grid_filename,
+        distance_grid_filename,
+        grid_spacing_degrees,
+        mean_age,
+        mean_distance,
+        variance_age,
+        variance_distance,
+        age_distance_polynomial_coefficients,
+        max_age = None,
+        max_distance = None):
+    """
+    Predicts compacted sediment thickness on a uniform lon/lat grid (the points of 'generate_input_points_grid()') using whole-grid
+    (raster algebra) operations, rather than sampling the age and distance grids at each ocean basin point.
+    
+    Age and distance grids that are already on the uniform lon/lat grid are read directly (other grids are first resampled onto it).
+    
+    Returns: A 2D numpy array (num_grid_latitudes, num_grid_longitudes) of sed_thickness (NaN outside the ocean basins).
+    """
+    
+    input_points_grid_shape = sediment_prediction.get_input_points_grid_shape(grid_spacing_degrees)
+    
+    age_array, distance_array = sediment_prediction.get_age_and_distance_arrays(
+            age_grid_filename, distance_grid_filename,
+            grid_spacing_degrees, *input_points_grid_shape)
+    
+    # Clamp, standardize and evaluate the polynomial on all grid nodes at once.
+    #
+    # Note: Nodes outside the age grid or distance grid have NaN ages or distances and hence NaN predictions.
+    sediment_thickness_model = sediment_prediction.SedimentPredictionModel(
+            mean_age, mean_distance,
+            variance_age, variance_distance,
+            max_age, max_distance,
+            age_distance_polynomial_coefficients)
+    
+    return sediment_thickness_model.predict(age_array.ravel(), distance_array.ravel()).reshape(age_array.shape)
+
     
 def write_sediment_data(
         sediment_thickness_data,
@@ -301,6 +338,9 @@ if __name__ == '__main__':
     
     If an ocean basin point falls outside the age grid or the distance grid then it is ignored.
 
+    With the '-r' option the prediction is done on whole grids (rather than one ocean basin point at a time), which is faster.
+    This works best when the age and distance grids are on the same uniform lon/lat grid as the output (otherwise they are resampled).
+
     NOTE: Separate the positional and optional arguments with '--' (workaround for bug in argparse module).
     For example...
 
@@ -323,6 +363,11 @@ if __name__ == '__main__':
                     'By default only an xyz file is written. '
                     'Can only be specified if "ocean_basin_points_filename" is not specified '
                     '(ie, ocean basin points must be on a uniform lon/lat grid).')
+        parser.add_argument('-r', '--raster_algebra', action='store_true',
+                help='Predict on whole grids (rather than sampling the age and distance grids at each ocean basin point). '
+                    'Age and distance grids already on the uniform lon/lat grid (see "ocean_basin_grid_spacing") are read directly, '
+                    'and other grids are first resampled onto it. '
+                    'Can only be specified if "output_grd_file" is also specified.')
         
         parser.add_argument('-i', '--ocean_basin_grid_spacing', type=float,
                 help='The grid spacing (in degrees) of ocean basin points in lon/lat space. '
@@ -389,6 +434,30 @@ if __name__ == '__main__':
             if args.ocean_basin_grid_spacing is None:
                 raise argparse.ArgumentTypeError("'ocean_basin_grid_spacing' must be specified if 'ocean_basin_points_filename' is not specified.")
         
+        if args.raster_algebra:
+            if not args.output_grd_file:
+                raise argparse.ArgumentTypeError("'output_grd_file' must be specified if 'raster_algebra' is specified.")
+            
+            # Predict on the whole grid and write it directly (without first converting to xyz points).
+            sediment_thickness_array = predict_sedimentation_grid(
+                    args.age_grid_filename,
+                    args.distance_grid_filename,
+                    args.ocean_basin_grid_spacing,
+                    args.mean_age_distance[0], # mean_age
+                    args.mean_age_distance[1], # mean_distance
+                    args.variance_age_distance[0], # variance_age
+                    args.variance_age_distance[1], # variance_distance
+                    args.age_distance_polynomial_coefficients,
+                    args.clamp_age_distance[0] if args.clamp_age_distance is not None else None, # max_age
+                    args.clamp_age_distance[1] if args.clamp_age_distance is not None else None) # max_distance
+            
+            sediment_prediction.write_grd_array_file(
+                    '{}.nc'.format(args.output_filename_prefix),
+                    sediment_thickness_array,
+                    args.ocean_basin_grid_spacing)
+            
+            sys.exit(0)
+        
         # Get the input points.
         if args.ocean_basin_points_filename is not None:
             input_points = read_input_points(args.ocean_basin_points_filename)
@@ -0,0 +1,164 @@
+"""
+    Copyright (C) 2024 The University of Sydney, Australia
+    
+    This program is free software; you can redistribute it and/or modify it under
+    the terms of the GNU General Public License, version 2, as published by
+    the Free Software Foundation.
+    
+    This program is distributed in the hope that it will be useful, but WITHOUT
+    ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+    FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+    for more details.
+    
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+
+#######################################################################################################
+# Regenerate mean/standard-deviation distance grids from the statistics files written by              #
+# 'ocean_basin_proximity.py' (with '--output_proximity_statistics') without recalculating distances.  #
+#######################################################################################################
+
+
+
+import argparse
+import multiprocessing
+import ocean_basin_proximity
+import sys
+
+
+# Wraps around 'ocean_basin_proximity.regenerate_proximity_grids()' so can be used by multiprocessing.Pool.map() which requires a single-argument function.
+def regenerate_proximity_grids_parallel_pool_function(args):
+    try:
+        return ocean_basin_proximity.regenerate_proximity_grids(*args)
+    except KeyboardInterrupt:
+        pass
+
+
+def regenerate_proximity_grids_parallel(
+        statistics_filenames,
+        output_directory,
+        output_mean_distance = True,
+        output_std_dev_distance = False,
+        clamp_mean_distance_kms = None,
+        upscale_mean_std_dev_grid_spacing = None,
+        num_cpus = None,  # if None then defaults to all available CPUs
+        output_distance_percentiles = None):
+
+    # If the user requested all available CPUs then attempt to find out how many there are.
+    if not num_cpus:
+        try:
+            num_cpus = multiprocessing.cpu_count()
+        except NotImplementedError:
+            num_cpus = 1
+    num_cpus = min(num_cpus, len(statistics_filenames))
+
+    args_list = [
+            (
+                statistics_filename,
+                output_directory,
+                output_mean_distance,
+                output_std_dev_distance,
+                clamp_mean_distance_kms,
+                upscale_mean_std_dev_grid_spacing,
+                None,  # age_grid_filename (use the one the statistics were written with)
+                output_distance_percentiles
+            ) for statistics_filename in statistics_filenames]
+
+    # No need for parallelisation if number of CPUs is one (also preserves source code line of any exception).
+    if num_cpus <= 1:
+        for args in args_list:
+            ocean_basin_proximity.regenerate_proximity_grids(*args)
+        return
+
+    try:
+        pool = multiprocessing.Pool(num_cpus, initializer=ocean_basin_proximity.low_priority)
+        pool_map_async_result = pool.map_async(
+                regenerate_proximity_grids_parallel_pool_function,
+                args_list,
+                1) # chunksize
+
+        # Apparently if we use pool.map_async instead of pool.map and then get the results
+        # using a timeout, then we avoid a bug in Python where a keyboard interrupt does not work properly.
+        # See http://stackoverflow.com/questions/1408356/keyboard-interrupts-with-pythons-multiprocessing-pool
+        pool_map_async_result.get(999999)
+    finally:
+        pool.close()
+        pool.join()
+
+
+if __name__ == '__main__':
+
+    __description__ = \
+    """Regenerate mean, standard deviation and/or percentile distance grids (or xyz files) from the statistics files written by
+    'ocean_basin_proximity.py' with its '--output_proximity_statistics' option (eg, "proximity_statistics_10.0.npz").
+
+    Each statistics file contains the number, sum and sum-of-squares of the distances of each ocean basin point of an age grid,
+    so the mean and standard deviation distances can be regenerated with a different clamp (see '--clamp_mean_distance') or
+    upscaled grid spacing (see '--upscale_mean_std_dev_grid_spacing') without recalculating the distances.
+    The output filenames are the same as those written by 'ocean_basin_proximity.py'.
+
+    Percentile distances can only be regenerated if they were also output when the statistics were written (since that's when
+    each point's distance sketch is accumulated).
+
+    Note that if the distances were calculated with '--bound_distance_search_by_clamp' then only mean distances can be regenerated,
+    and only with a clamp that is no larger than the original clamp.
+
+    NOTE: Separate the positional and optional arguments with '--' (workaround for bug in argparse module).
+    For example...
+
+    python %(prog)s -j --clamp_mean_distance 1000 --upscale_mean_std_dev_grid_spacing 0.2 -- output_dir proximity_statistics_*.npz
+     """
+
+    try:
+        # The command-line parser.
+        parser = argparse.ArgumentParser(description = __description__, formatter_class=argparse.RawDescriptionHelpFormatter)
+
+        parser.add_argument('-j', '--output_mean_distance', action='store_true',
+                help='Write the mean distances. If no output options are specified then this one is used.')
+        parser.add_argument('-k', '--output_std_dev_distance', action='store_true',
+                help='Write the standard deviation distances. By default they are not written.')
+        parser.add_argument('--output_distance_percentiles', type=float, nargs='+',
+                metavar='percentile',
+                help='Write these percentiles (in the range [0, 100]) of distance (eg, "50" for the median). By default they are not written.')
+        parser.add_argument('--clamp_mean_distance', type=float,
+                help='*Mean* distances (in Kms) above this optional maximum mean distance are *clamped* to it. '
+                     'By default mean distances are unclamped.')
+        parser.add_argument('--upscale_mean_std_dev_grid_spacing', type=float,
+                help='The grid spacing (in degrees) of the regenerated mean and standard deviation distance grids. '
+                     'Defaults to the upscaled grid spacing used when the statistics were written. '
+                     'Only used if the statistics were written along with grid files (rather than xyz files).')
+        parser.add_argument('-c', '--num_cpus', type=int,
+                help='The number of CPUs to use. Defaults to all available CPUs.')
+
+        parser.add_argument('output_directory', type=str,
+                help='The output directory to write the regenerated files to.')
+        parser.add_argument('statistics_filenames', type=str, nargs='+',
+                metavar='statistics_filename',
+                help='One or more statistics files (one per age grid).')
+
+        # Parse command-line options.
+        args = parser.parse_args()
+
+        # Default to 'output_mean_distance' if no output options are specified.
+        output_mean_distance = args.output_mean_distance or not (args.output_std_dev_distance or args.output_distance_percentiles)
+
+        regenerate_proximity_grids_parallel(
+                args.statistics_filenames,
+                args.output_directory,
+                output_mean_distance,
+                args.output_std_dev_distance,
+                args.clamp_mean_distance,
+                args.upscale_mean_std_dev_grid_spacing,
+                args.num_cpus,
+                args.output_distance_percentiles)
+
+        sys.exit(0)
+
+    except KeyboardInterrupt:
+        sys.exit(1)
+    except Exception as exc:
+        print('ERROR: {}'.format(exc), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,280 @@
+"""
+    Copyright (C) 2024 The University of Sydney, Australia
+
+    This program is free software; you can redistribute it and/or modify it under
+    the terms of the GNU General Public License, version 2, as published by
+    the Free Software Foundation.
+
+    This program is distributed in the hope that it will be useful, but WITHOUT
+    ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+    FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License
+    for more details.
+
+    You should have received a copy of the GNU General Public License along
+    with this program; if not, write to Free Software Foundation, Inc.,
+    51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+"""
+
+
+########################################################################################################
+# The trained relationships between ocean floor age, mean distance to passive margins and the log of   #
+# sediment thickness (or sedimentation rate), and their evaluation on numpy arrays of ages/distances.  #
+# Also the GMT grid reading/writing used to evaluate them on whole age/distance grids.                 #
+########################################################################################################
+
+
+
+from dataclasses import dataclass
+import math
+import numpy as np
+import os
+# Try importing 'ptt' first. If that fails then try 'gplately.ptt' (GPlately now contains PlateTectonicTools).
+try:
+    from ptt.utils.call_system_command import call_system_command
+except ImportError:
+    from gplately.ptt.utils.call_system_command import call_system_command
+import subprocess
+import tempfile
+from typing import List, Optional
+
+
+@dataclass
+class SedimentPredictionModel:
+    """
+    A cubic polynomial (in standardized age and distance) of the log of sediment thickness (or sedimentation rate).
+
+    The mean/variance of age and distance come from the machine learning training scaler (and are used to standardize age and distance).
+    """
+
+    mean_age: float
+    mean_distance: float
+    variance_age: float
+    variance_distance: float
+    # Ages and distances above these are clamped to them (because values above these are not represented well in trained data).
+    max_age: Optional[float]
+    max_distance: Optional[float]
+    # The coefficients of the polynomial features: constant, age, distance, age*age, age*distance, distance*distance,
+    # age*age*age, age*age*distance, age*distance*distance and distance*distance*distance.
+    age_distance_polynomial_coefficients: List[float]
+    # Optional scale factor applied to the prediction (eg, 10 to convert a sedimentation rate in cm/Ky to m/My).
+    scale: Optional[float] = None
+
+    def predict(self, ages, distances):
+        """
+        Return a numpy array of the predictions at the specified ages and distances (numpy arrays of the same length).
+
+        The polynomial features are multiplied and summed in the same order as the per-point functions
+        'predict_sediment_thickness()' and 'predict_sedimentation_rate()' (in the scripts of the same name),
+        so the predictions are identical.
+        """
+
+        ages = np.asarray(ages, dtype=float)
+        distances = np.asarray(distances, dtype=float)
+
+        # Clamp to max values (if requested).
+        if self.max_age is not None:
+            ages = np.where(ages > self.max_age, self.max_age, ages)
+        if self.max_distance is not None:
+            distances = np.where(distances > self.max_distance, self.max_distance, distances)
+
+        # Remove the mean and scale to unit variance (based on the machine learning training scaler).
+        ages = (ages - self.mean_age) / math.sqrt(self.variance_age)
+        distances = (distances - self.mean_distance) / math.sqrt(self.variance_distance)
+
+        age_distance_polynomial_features = (
+                1, ages, distances, ages*ages, ages*distances, distances*distances,
+                ages*ages*ages, ages*ages*distances, ages*distances*distances, distances*distances*distances)
+
+        # Evaluate the polynomial to get the log of the prediction.
+        log_predictions = np.zeros(len(ages), dtype=float)
+        for coefficient, feature in zip(self.age_distance_polynomial_coefficients, age_distance_polynomial_features):
+            log_predictions += coefficient * feature
+
+        # Note: 'math.exp' is used (rather than 'np.exp', which differs from it in the last bit for some values) so that the predictions
+        #       exactly match those of the per-point scripts (this costs little compared to sampling the grids).
+        predictions = np.fromiter(map(math.exp, log_predictions), dtype=float, count=len(log_predictions))
+        if self.scale is not None:
+            predictions *= self.scale
+
+        return predictions
+
+
+#
+# Predict sedimentation *rate* results in "sediment_rate_decomp_v5.ipynb" from:
+#
+#     dataq = data[:, [lon_ind, lat_ind, age_ind, passive_dis_ind, sedrate_ind]]
+#     geo_preprocess3.two_feature_analysis(dataq, regressor, 2, 3, 'age',
+#                                          'distance to passive margin', 'predicted log sedrate',
+#                                          query_size=20)
+#
+#     print('Mean of age and distance:', regressor.named_steps['stand'].mean_)
+#     print('Variance of age and distance:', regressor.named_steps['stand'].var_)
+#     print('Polynomial coefficients:', regressor.named_steps['linear'].coef_)
+#     print('Polynomial intercept:', regressor.named_steps['linear'].intercept_)
+#     print('Polynomial feature names:', regressor.named_steps['poly'].get_feature_names())
+#
+# Updated for GlobSed and TRUNK agegrids.
+#
+SEDIMENTATION_RATE_MODEL = SedimentPredictionModel(
+        mean_age=61.17716597,
+        mean_distance=1835.10750592,
+        variance_age=1934.78513885,
+        variance_distance=1207587.8548734,
+        max_age=191.87276,
+        max_distance=3000.,
+        age_distance_polynomial_coefficients=[
+                1.350082937086441, -0.26385415, -0.07516542,  0.39197707, -0.15475392,
+            0.        , -0.13196083,  0.02481208, -0.        , -0.47570021],
+        # Scale predicted rate (cm/Ky) to (m/My).
+        scale=10.0)
+
+#
+# Predict sediment *thickness* results in "sediment_thick_v5.ipynb" from:
+#
+#     dataq = data[:, [lon_ind, lat_ind, age_ind, passive_dis_ind, sedthick_ind]]
+#     geo_preprocess3.two_feature_analysis(dataq, regressor, 2, 3, 'age',
+#                                          'distance to passive margin', 'predicted log thickness',
+#                                          query_size=20)
+#
+#     print('Mean of age and distance:', regressor.named_steps['stand'].mean_)
+#     print('Variance of age and distance:', regressor.named_steps['stand'].var_)
+#     print('Max of age and distance:', np.max(data[:, [age_ind, passive_dis_ind]], axis=0))
+#     print('Polynomial coefficients:', regressor.named_steps['linear'].coef_)
+#     print('Polynomial intercept:', regressor.named_steps['linear'].intercept_)
+#     print('Polynomial feature names:', regressor.named_steps['poly'].get_feature_names())
+#
+# Updated for GlobSed and TRUNK agegrids (NW 20220826).
+#
+SEDIMENT_THICKNESS_MODEL = SedimentPredictionModel(
+        mean_age=61.18406823,
+        mean_distance=1835.28118479,
+        variance_age=1934.6999014,
+        variance_distance=1207521.8995806,
+        max_age=191.87276,
+        max_distance=3000.,
+        age_distance_polynomial_coefficients=[
+                5.441401190368497,  0.46893096, -0.07320928, -0.24077496, -0.10840657,
+            0.00381672,  0.06831728,  0.01179914,  0.01158149, -0.39880562],
+        # No scaling - we're predicting sediment thickness (not rate).
+        scale=None)
+
+
+#
+# Grid helpers shared by 'predict_sediment_thickness.py', 'predict_sedimentation_rate.py' and part 2
+# for predicting on whole age/distance grids (raster algebra) instead of on individual points.
+#
+
+
+# Returns the (num_longitudes, num_latitudes) of the points generated by 'generate_input_points_grid()'
+# in the prediction scripts (without generating the points).
+def get_input_points_grid_shape(grid_spacing_degrees):
+    
+    num_latitudes = int(math.floor(180.0 / grid_spacing_degrees)) + 1
+    num_longitudes = int(math.floor(360.0 / grid_spacing_degrees)) + 1
+    
+    return (num_longitudes, num_latitudes)
+
+
+# Returns (west, south, grid_spacing_longitude, grid_spacing_latitude, num_grid_longitudes, num_grid_latitudes, is_pixel_registered)
+# of the specified grid file (using GMT 'grdinfo').
+def get_grd_lattice(grd_filename):
+    
+    # Each value of 'grdinfo -C' is separated by a tab (the first is the grid filename).
+    stdout_data = call_system_command(["gmt", "grdinfo", "-C", grd_filename], return_stdout=True)
+    grd_info = stdout_data.strip().split('\t')
+    
+    west, east, south, north = (float(value) for value in grd_info[1:5])
+    grid_spacing_longitude, grid_spacing_latitude = (float(value) for value in grd_info[7:9])
+    num_grid_longitudes, num_grid_latitudes = (int(float(value)) for value in grd_info[9:11])
+    
+    # Gridline registered grids have a node on both the west and east boundaries (pixel registered grids have a node in the centre of each cell).
+    is_pixel_registered = (num_grid_longitudes != int(round((east - west) / grid_spacing_longitude)) + 1)
+    
+    return west, south, grid_spacing_longitude, grid_spacing_latitude, num_grid_longitudes, num_grid_latitudes, is_pixel_registered
+
+
+# Returns True if the nodes of the specified grid file are the points generated by 'generate_input_points_grid()'
+# (ie, a global gridline registered grid with the specified grid spacing).
+def is_grd_on_input_points_grid(grd_filename, grid_spacing_degrees, num_grid_longitudes, num_grid_latitudes):
+    
+    (west, south,
+        grd_spacing_longitude, grd_spacing_latitude,
+        num_grd_longitudes, num_grd_latitudes,
+        is_pixel_registered) = get_grd_lattice(grd_filename)
+    
+    tolerance = 1e-6 * grid_spacing_degrees
+    return (not is_pixel_registered and
+            num_grd_longitudes == num_grid_longitudes and
+            num_grd_latitudes == num_grid_latitudes and
+            abs(west - -180) < tolerance and
+            abs(south - -90) < tolerance and
+            abs(grd_spacing_longitude - grid_spacing_degrees) < tolerance and
+            abs(grd_spacing_latitude - grid_spacing_degrees) < tolerance)
+
+
+# Returns a 2D numpy array (num_grid_latitudes, num_grid_longitudes) of the node values of the specified grid file.
+# Rows are ordered from south to north and columns from west to east (the same order as the points of 'generate_input_points_grid()').
+#
+# If the grid is not already on the points of 'generate_input_points_grid()' then it is first resampled onto them (using GMT 'grdsample').
+def read_grd_array(grd_filename, grid_spacing_degrees, num_grid_longitudes, num_grid_latitudes):
+    
+    resampled_grd_filename = None
+    if not is_grd_on_input_points_grid(grd_filename, grid_spacing_degrees, num_grid_longitudes, num_grid_latitudes):
+        
+        resampled_grd_file, resampled_grd_filename = tempfile.mkstemp(suffix='.nc')
+        os.close(resampled_grd_file)
+        
+        # The command-line strings to execute GMT 'grdsample'.
+        gmt_command_line = [
+                "gmt",
+                "grdsample",
+                grd_filename,
+                "-I{0}".format(grid_spacing_degrees),
+                "-R{0}/{1}/{2}/{3}".format(-180, 180, -90, 90),
+                "-fg",
+                "-G{0}".format(resampled_grd_filename)]
+        # The resampled grid must be gridline registered (like our input point grid).
+        if get_grd_lattice(grd_filename)[-1]:  # is_pixel_registered
+            gmt_command_line.append("-T")
+        call_system_command(gmt_command_line)
+        
+        grd_filename = resampled_grd_filename
+    
+    try:
+        # Read the grid node values as binary doubles (rather than as text), starting at the bottom-left node.
+        #
+        # Note: We don't use 'call_system_command()' here since it only supports text output.
+        grd2xyz_output = subprocess.run(["gmt", "grd2xyz", "-ZBLd", grd_filename], stdout=subprocess.PIPE, check=True).stdout
+    finally:
+        if resampled_grd_filename:
+            os.remove(resampled_grd_filename)
+    
+    return np.frombuffer(grd2xyz_output, dtype=np.float64).reshape(num_grid_latitudes, num_grid_longitudes)
+
+
+# Writes a 2D numpy array (num_grid_latitudes, num_grid_longitudes) of node values (ordered like 'read_grd_array()') to a grid file.
+def write_grd_array_file(grd_filename, output_array, grid_spacing):
+    
+    # The command-line strings to execute GMT 'xyz2grd' on binary doubles (starting at the bottom-left node) rather than xyz text.
+    gmt_command_line = [
+            "gmt",
+            "xyz2grd",
+            "-ZBLd",
+            "-I{0}".format(grid_spacing),
+            # Use GMT gridline registration since our input point grid has data points on the grid lines.
+            "-R{0}/{1}/{2}/{3}".format(-180, 180, -90, 90),
+            "-fg",
+            "-G{0}".format(grd_filename)]
+    subprocess.run(gmt_command_line, input=np.ascontiguousarray(output_array, dtype=np.float64).tobytes(), check=True)
+
+    #print('..generated: {}'.format(os.path.basename(grd_filename)))
+
+
+# Returns 2D numpy arrays (num_grid_latitudes, num_grid_longitudes) of the ages and distances at the points of 'generate_input_points_grid()'.
+# Points outside the age grid or the distance grid are NaN.
+def get_age_and_distance_arrays(age_grid_filename, distance_grid_filename, grid_spacing_degrees, num_grid_longitudes, num_grid_latitudes):
+    
+    age_array = read_grd_array(age_grid_filename, grid_spacing_degrees, num_grid_longitudes, num_grid_latitudes)
+    distance_array = read_grd_array(distance_grid_filename, grid_spacing_degrees, num_grid_longitudes, num_grid_latitudes)
+    
+    return age_array, distance_array
@@ -87,6 +87,8 @@
 
 import heapq
 import math
+import numpy as np
+import os
 import pygplates
 
 
@@ -96,6 +98,13 @@ class Grid(object):
     # ...grid points.
     GRID_NODE_DEPTH_PER_QUAD_TREE_NODE = 2 # 16 grid points
     
+    # Maximum number of neighbours returned by 'get_neighbour_grid_nodes()' for a single grid node.
+    MAX_NUM_NEIGHBOURS_PER_GRID_NODE = 16
+    
+    # Geometries simplified with 'simplify_geometries()' deviate from the originals by at most this fraction of the grid spacing.
+    # Detail finer than this cannot be resolved by the grid (since paths between grid nodes are at least a grid spacing long).
+    SIMPLIFY_TOLERANCE_IN_GRID_SPACINGS = 0.25
+    
     def __init__(self, subdivision_depth):
         if subdivision_depth < 0:
             raise ValueError('Subdivision depth must be a non-negative value.')
@@ -113,12 +122,87 @@ class Grid(object):
         # needs to be conservative (too large is fine, too small is not).
         self.maximum_distance_radians_to_neighbour_grid_node = math.sqrt(5.0) * self.spacing_radians
         
+        # Precalculated neighbours of all grid nodes (only available if grid was read from a file).
+        self._neighbour_node_indices = None
+        self._neighbour_distances = None
+        
         self._init_grid()
         self._init_quad_tree()
     
+    # Write the grid to a file (in numpy ".npz" format) so that it can later be read with 'Grid.read()'.
+    #
+    # The grid only depends on its subdivision depth, but it's expensive to create (especially the quad tree bounding polygons).
+    # So it's cheaper to create it once and then read it (eg, in each task or process) than to create it each time.
+    # The neighbours of all grid nodes are also written (so they don't need to be calculated after reading).
+    def write(self, filename):
+        # Quad tree node bounding polygons in the order they are created (see '_init_quad_tree()').
+        quad_tree_bounding_polygons_xyz = []
+        def add_quad_tree_bounding_polygons(quad_tree_nodes):
+            for quad_tree_node in quad_tree_nodes:
+                quad_tree_bounding_polygons_xyz.append(
+                        [point.to_xyz() for point in quad_tree_node.bounding_polygon.get_points()])
+                if quad_tree_node.child_quad_tree_nodes:
+                    add_quad_tree_bounding_polygons(quad_tree_node.child_quad_tree_nodes)
+        add_quad_tree_bounding_polygons(self.root_quad_tree_nodes)
+        
+        # Neighbours of all grid nodes (unused neighbour entries have a node index of -1).
+        num_nodes = len(self.nodes)
+        neighbour_node_indices = np.full((num_nodes, Grid.MAX_NUM_NEIGHBOURS_PER_GRID_NODE), -1, dtype=np.int32)
+        neighbour_distances = np.zeros((num_nodes, Grid.MAX_NUM_NEIGHBOURS_PER_GRID_NODE), dtype=float)
+        for node_index in range(num_nodes):
+            for neighbour_index, (distance_to_neighbour, neighbour_node_index) in enumerate(self.get_neighbour_grid_nodes(node_index)):
+                neighbour_node_indices[node_index, neighbour_index] = neighbour_node_index
+                neighbour_distances[node_index, neighbour_index] = distance_to_neighbour
+        
+        # Write to a temporary file and then rename, so that other processes never read a partially written file.
+        temporary_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(temporary_filename, 'wb') as temporary_file:
+            np.savez(
+                    temporary_file,
+                    subdivision_depth=self.subdivision_depth,
+                    quad_tree_bounding_polygons_xyz=np.array(quad_tree_bounding_polygons_xyz, dtype=float),
+                    neighbour_node_indices=neighbour_node_indices,
+                    neighbour_distances=neighbour_distances)
+        os.replace(temporary_filename, filename)
+    
+    # Read a grid from a file written by 'Grid.write()'.
+    @staticmethod
+    def read(filename):
+        with np.load(filename) as grid_data:
+            subdivision_depth = int(grid_data['subdivision_depth'])
+            quad_tree_bounding_polygons_xyz = grid_data['quad_tree_bounding_polygons_xyz']
+            neighbour_node_indices = grid_data['neighbour_node_indices']
+            neighbour_distances = grid_data['neighbour_distances']
+        
+        # Create the grid without calling '__init__()' (which would create the quad tree bounding polygons from scratch).
+        grid = Grid.__new__(Grid)
+        grid.num_latitudes = 2 * (1 << subdivision_depth)
+        grid.num_longitudes = 2 * grid.num_latitudes
+        grid.grid_spacing_degrees = 180.0 / grid.num_latitudes
+        grid.spacing_radians = math.radians(grid.grid_spacing_degrees)
+        grid.subdivision_depth = subdivision_depth
+        grid.maximum_distance_radians_to_neighbour_grid_node = math.sqrt(5.0) * grid.spacing_radians
+        grid._neighbour_node_indices = neighbour_node_indices
+        grid._neighbour_distances = neighbour_distances
+        
+        grid._init_grid()
+        grid._init_quad_tree(iter(quad_tree_bounding_polygons_xyz))
+        
+        return grid
+    
     def create_obstacle_grid(self, obstacle_geometries):
         return ObstacleGrid(self, obstacle_geometries)
     
+    # Returns a list of geometries simplified to a tolerance tied to the grid spacing (see 'SIMPLIFY_TOLERANCE_IN_GRID_SPACINGS').
+    #
+    # This can be used to reduce the cost of creating obstacle grids and distance grids from geometries that have much
+    # more detail than the grid can resolve (eg, coastlines). Polyline end points are always retained (so that polylines
+    # joined at their end points stay joined), and a geometry is left unsimplified if simplifying it would make it
+    # self-intersect or (for polygons) collapse it to fewer than three vertices. Points and multi-points are not simplified.
+    def simplify_geometries(self, geometries):
+        tolerance_radians = Grid.SIMPLIFY_TOLERANCE_IN_GRID_SPACINGS * self.spacing_radians
+        return [_simplify_geometry(geometry, tolerance_radians) for geometry in geometries]
+    
     # Returns a list of 2-tuples (distance_radians, node_index) for up to 4 nearest grid nodes to 'point'.
     def get_nearest_grid_nodes(self, point):
         lat, lon = point.to_lat_lon()
@@ -158,6 +242,14 @@ class Grid(object):
     def get_neighbour_grid_nodes(self, node_index):
         node = self.nodes[node_index]
         
+        if node._neighbours is None and self._neighbour_node_indices is not None:
+            # Neighbours were precalculated (when grid was read from a file).
+            node._neighbours = [(distance_to_neighbour, neighbour_node_index)
+                    for distance_to_neighbour, neighbour_node_index in zip(
+                            self._neighbour_distances[node_index].tolist(),
+                            self._neighbour_node_indices[node_index].tolist())
+                    if neighbour_node_index >= 0]
+        
         if node._neighbours is None:
             node._neighbours = []
             
@@ -268,8 +360,14 @@ class Grid(object):
                 nodes.append(node)
         
         self.nodes = nodes
+        
+        # Also store the node positions as a (num_nodes, 3) array of unit vectors.
+        # This is used for batched (numpy) geometry tests such as intersecting node-to-neighbour edges with obstacles.
+        self.node_xyz_array = np.array([node.point.to_xyz() for node in nodes], dtype=float)
     
-    def _init_quad_tree(self):
+    # If 'quad_tree_bounding_polygons_xyz' is specified then it's an iterator over the bounding polygon points (as xyz tuples)
+    # of all quad tree nodes (in the order they are created), otherwise the bounding polygons are calculated.
+    def _init_quad_tree(self, quad_tree_bounding_polygons_xyz=None):
         
         root_quad_tree_nodes = []
         
@@ -277,15 +375,12 @@ class Grid(object):
         #print('Generating quad tree nodes...')
         for root_node_lat_index in range(2):
             for root_node_lon_index in range(4):
-                root_node = self._create_quad_tree_node(root_node_lon_index, root_node_lat_index, 0)
+                root_node = self._create_quad_tree_node(root_node_lon_index, root_node_lat_index, 0, quad_tree_bounding_polygons_xyz)
                 root_quad_tree_nodes.append(root_node)
         
         self.root_quad_tree_nodes = root_quad_tree_nodes
     
-    def _create_quad_tree_node(self, node_lon_index, node_lat_index, level):
-        
-        # Create the points of the polygon bounding the current quad tree node.
-        bounding_polygon_points = []
+    def _create_quad_tree_node(self, node_lon_index, node_lat_index, level, quad_tree_bounding_polygons_xyz=None):
         
         quad_tree_node_to_grid_node_factor = 1 << (self.subdivision_depth - level)
         
@@ -294,6 +389,40 @@ class Grid(object):
         start_lon_index = node_lon_index * quad_tree_node_to_grid_node_factor
         stop_lon_index = (node_lon_index + 1) * quad_tree_node_to_grid_node_factor
         
+        if quad_tree_bounding_polygons_xyz is not None:
+            # Use the precalculated bounding polygon.
+            bounding_polygon = pygplates.PolygonOnSphere(
+                    [pygplates.PointOnSphere(x, y, z, normalise=True) for x, y, z in next(quad_tree_bounding_polygons_xyz)])
+        else:
+            bounding_polygon = self._calculate_quad_tree_node_bounding_polygon(start_lat_index, stop_lat_index, start_lon_index, stop_lon_index)
+        quad_tree_node = GridQuadTreeNode(bounding_polygon)
+        
+        if level + Grid.GRID_NODE_DEPTH_PER_QUAD_TREE_NODE >= self.subdivision_depth:
+            # Reached leaf quad tree node, so add the grid point indices.
+            quad_tree_node.grid_node_indices = []
+            for lat_index in range(start_lat_index, stop_lat_index):
+                for lon_index in range(start_lon_index, stop_lon_index):
+                    node_index = lat_index * self.num_longitudes + lon_index
+                    quad_tree_node.grid_node_indices.append(node_index)
+        else:
+            # Create four child quad tree nodes.
+            quad_tree_node.child_quad_tree_nodes = []
+            for child_node_lat_offset in range(2):
+                for child_node_lon_offset in range(2):
+                    quad_tree_node.child_quad_tree_nodes.append(
+                            self._create_quad_tree_node(
+                                    2 * node_lon_index + child_node_lon_offset,
+                                    2 * node_lat_index + child_node_lat_offset,
+                                    level + 1,
+                                    quad_tree_bounding_polygons_xyz))
+        
+        return quad_tree_node
+    
+    def _calculate_quad_tree_node_bounding_polygon(self, start_lat_index, stop_lat_index, start_lon_index, stop_lon_index):
+        
+        # Create the points of the polygon bounding the current quad tree node.
+        bounding_polygon_points = []
+        
         left_lon = -180 + start_lon_index * self.grid_spacing_degrees
         right_lon = -180 + stop_lon_index * self.grid_spacing_degrees
         bottom_lat = -90 + start_lat_index * self.grid_spacing_degrees
@@ -357,28 +486,35 @@ class Grid(object):
             bounding_polygon_points.append(pygplates.PointOnSphere(bottom_lat, right_lon))
             bounding_polygon_points.append(pygplates.PointOnSphere(bottom_lat, left_lon))
         
-        bounding_polygon = pygplates.PolygonOnSphere(bounding_polygon_points)
-        quad_tree_node = GridQuadTreeNode(bounding_polygon)
-        
-        if level + Grid.GRID_NODE_DEPTH_PER_QUAD_TREE_NODE >= self.subdivision_depth:
-            # Reached leaf quad tree node, so add the grid point indices.
-            quad_tree_node.grid_node_indices = []
-            for lat_index in range(start_lat_index, stop_lat_index):
-                for lon_index in range(start_lon_index, stop_lon_index):
-                    node_index = lat_index * self.num_longitudes + lon_index
-                    quad_tree_node.grid_node_indices.append(node_index)
+        return pygplates.PolygonOnSphere(bounding_polygon_points)
+
+
+# Grids shared by all callers in the current process (keyed by grid filename, or subdivision depth if no filename).
+_shared_grids = {}
+
+
+# Returns a grid (with the specified subdivision depth) that is shared by all callers in the current process.
+#
+# If 'grid_filename' is specified then the grid is read from that file if it exists (and the grid has not already been
+# created/read in this process), otherwise it's written to that file (so that it can be read by other processes).
+# Note that a shared grid should be treated as read-only.
+def get_shared_grid(subdivision_depth, grid_filename=None):
+    grid = _shared_grids.get(subdivision_depth)
+    if grid is None:
+        if grid_filename is not None and os.path.exists(grid_filename):
+            grid = Grid.read(grid_filename)
+            if grid.subdivision_depth != subdivision_depth:
+                raise ValueError('Grid file "{}" has subdivision depth {} (expected {}).'.format(
+                        grid_filename, grid.subdivision_depth, subdivision_depth))
         else:
-            # Create four child quad tree nodes.
-            quad_tree_node.child_quad_tree_nodes = []
-            for child_node_lat_offset in range(2):
-                for child_node_lon_offset in range(2):
-                    quad_tree_node.child_quad_tree_nodes.append(
-                            self._create_quad_tree_node(
-                                    2 * node_lon_index + child_node_lon_offset,
-                                    2 * node_lat_index + child_node_lat_offset,
-                                    level + 1))
-        
-        return quad_tree_node
+            grid = Grid(subdivision_depth)
+        _shared_grids[subdivision_depth] = grid
+    
+    # Write the grid if the file does not exist yet (eg, a long-lived process already has the grid from a previous run).
+    if grid_filename is not None and not os.path.exists(grid_filename):
+        grid.write(grid_filename)
+    
+    return grid
 
 
 class GridNode(object):
@@ -435,38 +571,15 @@ class ObstacleGrid(object):
         node = nodes[node_index]
         
         if node._neighbours is None:
-            node._neighbours = neighbours = []
-            nearby_obstacle_geometries = node._nearby_obstacle_geometries
-            
-            # Get all neighbours from the grid.
-            grid_node_neighbours = self.grid.get_neighbour_grid_nodes(node_index)
-            for grid_node_neighbour in grid_node_neighbours:
-                _, neighbour_node_index = grid_node_neighbour
-                neighbour_node = nodes[neighbour_node_index]
-                
-                # Include neighbour node if it exists (ie, is outside all polygon obstacles) and
-                # does not cross any nearby obstacle geometries.
-                if neighbour_node is not None:
-                    if nearby_obstacle_geometries is not None:
-                        add_neighbour = True
-                        grid_nodes = self.grid.nodes
-                        # Single segment polyline from node point to neighbour node point.
-                        node_to_neighbour_line = pygplates.PolylineOnSphere(
-                                (grid_nodes[node_index].point, grid_nodes[neighbour_node_index].point))
-                        # If intersects any obstacle outline then do not add as a neighbour.
-                        for obstacle_geometry in nearby_obstacle_geometries:
-                            if pygplates.GeometryOnSphere.distance(
-                                    node_to_neighbour_line,
-                                    obstacle_geometry,
-                                    # Arbitrarily small threshold for efficiency since only interested in zero distance (intersection)...
-                                    1e-4) == 0:
-                                add_neighbour = False
-                                break
-                        
-                        if add_neighbour:
-                            neighbours.append(grid_node_neighbour)
-                    else:
-                        neighbours.append(grid_node_neighbour)
+            # Each neighbour edge (from grid node to its neighbour) that crosses an obstacle outline has
+            # already been marked as blocked (see '_init_blocked_neighbour_edges()').
+            blocked_neighbour_edges = self.blocked_neighbour_edges[node_index].tolist()
+            
+            # Include neighbour node if it exists (ie, is outside all polygon obstacles) and
+            # does not cross any nearby obstacle geometries.
+            node._neighbours = [grid_node_neighbour
+                    for neighbour_index, grid_node_neighbour in enumerate(self.grid.get_neighbour_grid_nodes(node_index))
+                    if nodes[grid_node_neighbour[1]] is not None and not blocked_neighbour_edges[neighbour_index]]
         
         return node._neighbours
     
@@ -494,13 +607,25 @@ class ObstacleGrid(object):
         # don't cross an obstacle outline are considered neighbours).
         #
         
+        # Each row is a grid node and each column is one of its neighbours (in the order returned by 'Grid.get_neighbour_grid_nodes()').
+        # An entry is True if the edge from the grid node to that neighbour crosses an obstacle outline.
+        # By default no edges are blocked. If any are found to cross an obstacle then we'll set the relevant entries to True.
+        self.blocked_neighbour_edges = np.zeros((len(self.grid.nodes), Grid.MAX_NUM_NEIGHBOURS_PER_GRID_NODE), dtype=bool)
+        
+        # Extract the segments of each obstacle geometry (as arrays of start and end points) for the batched intersection tests.
+        self._obstacle_segments = [_get_geometry_segments(obstacle_geometry) for obstacle_geometry in self.obstacle_geometries]
+        # Also extract the points of point and multi-point obstacles (an edge passing through one of these points is blocked).
+        self._obstacle_points = [_get_geometry_points(obstacle_geometry) for obstacle_geometry in self.obstacle_geometries]
+        
         # We want to find obstacles within the maximum distance between a node and one of its neighbours
         # used in the distance propagation because these obstacles can come between a node and its neighbour.
         nearby_distance_threshold = self.grid.maximum_distance_radians_to_neighbour_grid_node
         # Use a quad tree for efficiency - enables us to cull large groups of grid points that are not near
         # any obstacles (avoids neighbour intersection tests for these points).
         for root_quad_tree_node in self.grid.root_quad_tree_nodes:
-            self._init_obstacle_geometries_near_nodes(root_quad_tree_node, self.obstacle_geometries, nearby_distance_threshold)
+            self._init_obstacle_geometries_near_nodes(root_quad_tree_node, range(len(self.obstacle_geometries)), nearby_distance_threshold)
+        
+        del self._obstacle_segments  # free memory
     
     def _init_nodes_outside_obstacle_polygons(self, quad_tree_node, parent_overlapping_obstacle_polygons):
         # See if the current quad tree node's bounding polygon overlaps any obstacle polygons.
@@ -559,42 +684,403 @@ class ObstacleGrid(object):
                 # Node is inside an obstacle.
                 node_is_outside_obstacle_polygons[node_index] = False
     
-    def _init_obstacle_geometries_near_nodes(self, quad_tree_node, parent_nearby_obstacle_geometries, nearby_distance_threshold):
+    def _init_obstacle_geometries_near_nodes(self, quad_tree_node, parent_nearby_obstacle_geometry_indices, nearby_distance_threshold):
         # See if the current quad tree node's bounding polygon is near any obstacle geometries.
-        nearby_obstacle_geometries = []
-        for obstacle_geometry in parent_nearby_obstacle_geometries:
+        obstacle_geometries = self.obstacle_geometries
+        nearby_obstacle_geometry_indices = []
+        for obstacle_geometry_index in parent_nearby_obstacle_geometry_indices:
             
             # See if current obstacle geometry is near (or intersects or completely inside) quad tree node.
             if pygplates.GeometryOnSphere.distance(
                     quad_tree_node.bounding_polygon,
-                    obstacle_geometry,
+                    obstacle_geometries[obstacle_geometry_index],
                     nearby_distance_threshold,
                     geometry1_is_solid = True) is not None:
                 
-                nearby_obstacle_geometries.append(obstacle_geometry)
+                nearby_obstacle_geometry_indices.append(obstacle_geometry_index)
         
         # If quad tree is not near all obstacles then nothing left to do since all grid nodes
-        # will have no nearby obstacle geometries by default.
-        if not nearby_obstacle_geometries:
+        # will have no blocked neighbour edges by default.
+        if not nearby_obstacle_geometry_indices:
             return
         
-        # Visit child nodes (if internal node) or assign each grid point the current list of nearby obstacles (if leaf node).
+        # Visit child nodes (if internal node) or block the neighbour edges crossing nearby obstacles (if leaf node).
         if quad_tree_node.child_quad_tree_nodes:
             for child_quad_tree_node in quad_tree_node.child_quad_tree_nodes:
-                self._init_obstacle_geometries_near_nodes(child_quad_tree_node, nearby_obstacle_geometries, nearby_distance_threshold)
+                self._init_obstacle_geometries_near_nodes(child_quad_tree_node, nearby_obstacle_geometry_indices, nearby_distance_threshold)
         else:
-            nodes = self.nodes
-            for node_index in quad_tree_node.grid_node_indices:
-                node = nodes[node_index]
-                # We only have nodes at grid points outside all obstacle polygons.
-                if node:
-                    node._nearby_obstacle_geometries = nearby_obstacle_geometries
+            self._init_blocked_neighbour_edges(quad_tree_node, nearby_obstacle_geometry_indices)
+    
+    def _init_blocked_neighbour_edges(self, leaf_quad_tree_node, nearby_obstacle_geometry_indices):
+        grid = self.grid
+        nodes = self.nodes
+        
+        # Gather all candidate edges (from each grid node in the leaf quad tree node to each of its neighbours).
+        # We only have nodes at grid points outside all obstacle polygons.
+        edge_node_indices = []
+        edge_neighbour_indices = []
+        edge_neighbour_node_indices = []
+        for node_index in leaf_quad_tree_node.grid_node_indices:
+            if nodes[node_index] is None:
+                continue
+            for neighbour_index, (_, neighbour_node_index) in enumerate(grid.get_neighbour_grid_nodes(node_index)):
+                # No need to test edges to neighbours inside obstacle polygons (they get excluded anyway).
+                if nodes[neighbour_node_index] is not None:
+                    edge_node_indices.append(node_index)
+                    edge_neighbour_indices.append(neighbour_index)
+                    edge_neighbour_node_indices.append(neighbour_node_index)
+        
+        if not edge_node_indices:
+            return
+        
+        # Gather the segments (and points) of all obstacle geometries near the leaf quad tree node.
+        obstacle_segments = [self._obstacle_segments[obstacle_geometry_index] for obstacle_geometry_index in nearby_obstacle_geometry_indices]
+        obstacle_segment_start_points = np.concatenate([segment_start_points for segment_start_points, _ in obstacle_segments])
+        obstacle_segment_end_points = np.concatenate([segment_end_points for _, segment_end_points in obstacle_segments])
+        obstacle_points = np.concatenate([self._obstacle_points[obstacle_geometry_index] for obstacle_geometry_index in nearby_obstacle_geometry_indices])
+        
+        # Test all candidate edges against all nearby obstacle segments (and points) in one batch.
+        edge_start_points = grid.node_xyz_array[edge_node_indices]
+        edge_end_points = grid.node_xyz_array[edge_neighbour_node_indices]
+        edge_is_blocked = _get_great_circle_arcs_intersecting(
+                edge_start_points,
+                edge_end_points,
+                obstacle_segment_start_points,
+                obstacle_segment_end_points)
+        edge_is_blocked |= _get_great_circle_arcs_containing_points(
+                edge_start_points,
+                edge_end_points,
+                obstacle_points)
+        
+        # Record the blocked edges in the blocked-edge bitmap.
+        edge_node_indices = np.array(edge_node_indices, dtype=int)
+        edge_neighbour_indices = np.array(edge_neighbour_indices, dtype=int)
+        self.blocked_neighbour_edges[edge_node_indices[edge_is_blocked], edge_neighbour_indices[edge_is_blocked]] = True
 
 
 class ObstacleGridNode(object):
     def __init__(self):
         self._neighbours = None
-        self._nearby_obstacle_geometries = None
+
+
+# Returns the segments of a polyline or polygon as a 2-tuple of (start_points, end_points) where each is a (num_segments, 3) array of unit vectors.
+# The segments of a polygon include those of its interior rings (supported by pyGPlates 0.36 and above).
+# Point and multi-point geometries have no segments (see '_get_geometry_points()' instead).
+def _get_geometry_segments(geometry):
+    if isinstance(geometry, pygplates.PolylineOnSphere):
+        points = np.asarray(geometry.to_xyz_array(), dtype=float).reshape(-1, 3)
+        segment_start_points = points[:-1]
+        segment_end_points = points[1:]
+    elif isinstance(geometry, pygplates.PolygonOnSphere):
+        # The exterior ring, and any interior rings.
+        rings = [np.asarray(geometry.to_xyz_array(), dtype=float).reshape(-1, 3)]
+        if hasattr(geometry, 'get_number_of_interior_rings'):
+            for interior_ring_index in range(geometry.get_number_of_interior_rings()):
+                rings.append(np.array([point.to_xyz() for point in geometry.get_interior_ring_points(interior_ring_index)], dtype=float).reshape(-1, 3))
+        # Each ring is closed (its last point connects to its first point).
+        segment_start_points = np.concatenate(rings)
+        segment_end_points = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])
+    else:
+        return np.empty((0, 3), dtype=float), np.empty((0, 3), dtype=float)
+    
+    # Remove zero-length segments (eg, duplicate consecutive points) since they have no great circle plane.
+    # The adjacent segments cover the same position anyway.
+    non_zero_length_segments = np.any(segment_start_points != segment_end_points, axis=1)
+    return segment_start_points[non_zero_length_segments], segment_end_points[non_zero_length_segments]
+
+
+# Returns the points of a point or multi-point as a (num_points, 3) array of unit vectors.
+# Polylines and polygons have no points (their segments are returned by '_get_geometry_segments()' instead).
+def _get_geometry_points(geometry):
+    if isinstance(geometry, pygplates.PointOnSphere):
+        return np.array([geometry.to_xyz()], dtype=float)
+    if isinstance(geometry, pygplates.MultiPointOnSphere):
+        return np.asarray(geometry.to_xyz_array(), dtype=float).reshape(-1, 3)
+    
+    return np.empty((0, 3), dtype=float)
+
+
+# Returns a simplified version of a polyline or polygon (or the geometry itself if it cannot be simplified).
+def _simplify_geometry(geometry, tolerance_radians):
+    if isinstance(geometry, pygplates.PolylineOnSphere):
+        is_ring = False
+    elif isinstance(geometry, pygplates.PolygonOnSphere):
+        # Polygons with interior rings (supported by pyGPlates 0.36 and above) are not simplified.
+        if hasattr(geometry, 'get_number_of_interior_rings') and geometry.get_number_of_interior_rings() > 0:
+            return geometry
+        is_ring = True
+    else:
+        return geometry
+    
+    points = geometry.get_points()
+    points_xyz = np.asarray(geometry.to_xyz_array(), dtype=float).reshape(-1, 3)
+    num_points = len(points_xyz)
+    
+    if is_ring:
+        if num_points <= 3:
+            return geometry
+        # Split the ring into two polylines at the point furthest from the first point, and simplify each polyline.
+        furthest_point_index = int(np.argmin(points_xyz @ points_xyz[0]))
+        closed_points_xyz = np.concatenate((points_xyz, points_xyz[:1]))
+        keep_points = np.zeros(num_points, dtype=bool)
+        keep_points[:furthest_point_index + 1] = _get_douglas_peucker_points_to_keep(
+                closed_points_xyz[:furthest_point_index + 1], tolerance_radians)
+        keep_points[furthest_point_index:] |= _get_douglas_peucker_points_to_keep(
+                closed_points_xyz[furthest_point_index:], tolerance_radians)[:-1]
+        if np.count_nonzero(keep_points) < 3:
+            return geometry
+    else:
+        if num_points <= 2:
+            return geometry
+        keep_points = _get_douglas_peucker_points_to_keep(points_xyz, tolerance_radians)
+    
+    # Nothing to simplify.
+    if np.all(keep_points):
+        return geometry
+    
+    # Keep the original geometry if simplification introduces self-intersections (which would change its topology).
+    if _is_self_intersecting(points_xyz[keep_points], is_ring):
+        return geometry
+    
+    simplified_points = [points[point_index] for point_index in np.flatnonzero(keep_points)]
+    if is_ring:
+        return pygplates.PolygonOnSphere(simplified_points)
+    else:
+        return pygplates.PolylineOnSphere(simplified_points)
+
+
+# Returns a boolean array (one per point) that is True for points retained by Douglas-Peucker simplification of the
+# polyline 'points_xyz' (a (num_points, 3) array of unit vectors). The first and last points are always retained.
+def _get_douglas_peucker_points_to_keep(points_xyz, tolerance_radians):
+    num_points = len(points_xyz)
+    keep_points = np.zeros(num_points, dtype=bool)
+    keep_points[0] = keep_points[-1] = True
+    
+    # Use a stack instead of recursion (since polylines can have many points).
+    point_ranges = [(0, num_points - 1)]
+    while point_ranges:
+        first_point_index, last_point_index = point_ranges.pop()
+        if last_point_index - first_point_index < 2:
+            continue
+        
+        # Find the point (between first and last) furthest from the arc joining the first and last points.
+        distances = _get_distances_to_great_circle_arc(
+                points_xyz[first_point_index + 1 : last_point_index],
+                points_xyz[first_point_index],
+                points_xyz[last_point_index])
+        furthest_point_offset = int(np.argmax(distances))
+        
+        # If the furthest point is within tolerance then all points between first and last can be removed.
+        if distances[furthest_point_offset] <= tolerance_radians:
+            continue
+        
+        furthest_point_index = first_point_index + 1 + furthest_point_offset
+        keep_points[furthest_point_index] = True
+        point_ranges.append((first_point_index, furthest_point_index))
+        point_ranges.append((furthest_point_index, last_point_index))
+    
+    return keep_points
+
+
+# Returns the distances (in radians) from each point in 'points_xyz' to the great circle arc from 'arc_start_xyz' to 'arc_end_xyz'.
+def _get_distances_to_great_circle_arc(points_xyz, arc_start_xyz, arc_end_xyz):
+    distances_to_arc_end_points = np.minimum(
+            np.arccos(np.clip(points_xyz @ arc_start_xyz, -1.0, 1.0)),
+            np.arccos(np.clip(points_xyz @ arc_end_xyz, -1.0, 1.0)))
+    
+    arc_normal = np.cross(arc_start_xyz, arc_end_xyz)
+    arc_normal_magnitude = np.linalg.norm(arc_normal)
+    # If arc has zero length then the closest arc point is its start (or end) point.
+    if arc_normal_magnitude < 1e-12:
+        return distances_to_arc_end_points
+    arc_normal /= arc_normal_magnitude
+    
+    # Points that project onto the great circle *within* the arc are closest to the great circle itself,
+    # otherwise they're closest to one of the arc end points.
+    projects_within_arc = ((np.cross(arc_start_xyz, points_xyz) @ arc_normal >= 0) &
+                           (np.cross(points_xyz, arc_end_xyz) @ arc_normal >= 0))
+    distances_to_great_circle = np.arcsin(np.clip(np.abs(points_xyz @ arc_normal), 0.0, 1.0))
+    
+    return np.where(projects_within_arc, distances_to_great_circle, distances_to_arc_end_points)
+
+
+# Returns True if any two non-adjacent segments of the polyline (or ring if 'is_ring' is True) 'points_xyz' intersect.
+def _is_self_intersecting(points_xyz, is_ring):
+    segment_start_points = points_xyz if is_ring else points_xyz[:-1]
+    segment_end_points = np.roll(points_xyz, -1, axis=0) if is_ring else points_xyz[1:]
+    num_segments = len(segment_start_points)
+    if num_segments < 3:
+        return False
+    
+    segment_indices = np.arange(num_segments)
+    
+    # Process the segments in batches to limit memory usage (of the num_segments x num_segments x 3 intersection points).
+    max_segments_per_batch = 256
+    for segment_base_index in range(0, num_segments, max_segments_per_batch):
+        segment_slice = slice(segment_base_index, segment_base_index + max_segments_per_batch)
+        intersections = _get_great_circle_arc_intersections(
+                segment_start_points[segment_slice], segment_end_points[segment_slice],
+                segment_start_points, segment_end_points)
+        
+        # Adjacent segments share an end point (and hence always touch), so exclude them (and each segment with itself).
+        segment_offsets = np.abs(segment_indices[segment_slice, np.newaxis] - segment_indices[np.newaxis, :])
+        non_adjacent = segment_offsets > 1
+        if is_ring:
+            # First and last segments of a ring are also adjacent.
+            non_adjacent &= segment_offsets != num_segments - 1
+        
+        if np.any(intersections & non_adjacent):
+            return True
+    
+    return False
+
+
+# Returns a boolean array (one per arc in 'arc_start_points'/'arc_end_points') that is True if the arc intersects (or touches)
+# any of the segments in 'segment_start_points'/'segment_end_points'.
+#
+# All arcs and segments are great circle arcs (shorter than 180 degrees) specified by (N, 3) arrays of unit vectors.
+def _get_great_circle_arcs_intersecting(arc_start_points, arc_end_points, segment_start_points, segment_end_points):
+    num_arcs = len(arc_start_points)
+    arc_is_intersecting = np.zeros(num_arcs, dtype=bool)
+    if num_arcs == 0 or len(segment_start_points) == 0:
+        return arc_is_intersecting
+    
+    # Only the segments near the arcs can intersect them, so cull the remaining segments.
+    #
+    # All arcs are contained in a small circle centred on the normalised sum of arc points.
+    # And each segment is contained in a small circle (centred at its midpoint) with a radius of half its length.
+    # The two small circles must overlap for any arc to intersect the segment.
+    arcs_centre = np.sum(arc_start_points, axis=0) + np.sum(arc_end_points, axis=0)
+    arcs_centre /= np.linalg.norm(arcs_centre)
+    arcs_radius = np.arccos(np.clip(min(np.min(arc_start_points @ arcs_centre), np.min(arc_end_points @ arcs_centre)), -1.0, 1.0))
+    segment_mid_points = segment_start_points + segment_end_points
+    segment_mid_points /= np.linalg.norm(segment_mid_points, axis=1)[:, np.newaxis]
+    segment_half_lengths = 0.5 * np.arccos(np.clip(np.einsum('ij,ij->i', segment_start_points, segment_end_points), -1.0, 1.0))
+    segment_is_near = (np.arccos(np.clip(segment_mid_points @ arcs_centre, -1.0, 1.0)) <=
+                       # A little extra tolerance for numerical precision...
+                       arcs_radius + segment_half_lengths + 1e-6)
+    if not np.any(segment_is_near):
+        return arc_is_intersecting
+    segment_start_points = segment_start_points[segment_is_near]
+    segment_end_points = segment_end_points[segment_is_near]
+    
+    # Process the segments in batches to limit memory usage (of the num_arcs x num_segments x 3 intersection points).
+    max_segments_per_batch = 1024
+    for segment_base_index in range(0, len(segment_start_points), max_segments_per_batch):
+        segment_slice = slice(segment_base_index, segment_base_index + max_segments_per_batch)
+        arc_is_intersecting |= np.any(
+                _get_great_circle_arc_intersections(
+                        arc_start_points, arc_end_points,
+                        segment_start_points[segment_slice], segment_end_points[segment_slice]),
+                axis=1)
+    
+    return arc_is_intersecting
+
+
+# Returns a boolean array (one per arc) that is True if the arc passes through (or touches) any of the specified points.
+#
+# Arcs are great circle arcs (shorter than 180 degrees) and points are unit vectors, both specified by (N, 3) arrays.
+def _get_great_circle_arcs_containing_points(arc_start_points, arc_end_points, points):
+    num_arcs = len(arc_start_points)
+    arc_contains_points = np.zeros(num_arcs, dtype=bool)
+    if num_arcs == 0 or len(points) == 0:
+        return arc_contains_points
+    
+    arc_normals = np.cross(arc_start_points, arc_end_points)
+    arc_normal_lengths = np.linalg.norm(arc_normals, axis=1)
+    # Exclude zero-length arcs (their normals are zero).
+    non_zero_length_arcs = arc_normal_lengths > 0
+    arc_unit_normals = np.zeros_like(arc_normals)
+    arc_unit_normals[non_zero_length_arcs] = arc_normals[non_zero_length_arcs] / arc_normal_lengths[non_zero_length_arcs, np.newaxis]
+    
+    # Only points on the great circle of an arc can be on the arc.
+    arc_indices, point_indices = np.nonzero(
+            non_zero_length_arcs[:, np.newaxis] &
+            (np.abs(arc_unit_normals @ points.T) <= _COPLANAR_GREAT_CIRCLES_SINE_ANGLE_THRESHOLD))
+    if len(arc_indices) > 0:
+        points_on_arcs = _are_points_on_coplanar_great_circle_arcs(
+                points[point_indices], arc_start_points[arc_indices], arc_end_points[arc_indices], arc_unit_normals[arc_indices])
+        arc_contains_points[arc_indices[points_on_arcs]] = True
+    
+    return arc_contains_points
+
+
+# Returns a (num_arcs, num_segments) boolean array that is True where an arc intersects (or touches) a segment.
+#
+# All arcs and segments are great circle arcs (shorter than 180 degrees) specified by (N, 3) arrays of unit vectors.
+def _get_great_circle_arc_intersections(arc_start_points, arc_end_points, segment_start_points, segment_end_points):
+    # Normals to the great circle planes of the arcs and segments.
+    arc_normals = np.cross(arc_start_points, arc_end_points)
+    segment_normals = np.cross(segment_start_points, segment_end_points)
+    
+    # Each arc must straddle the great circle of the segment, and each segment must straddle the great circle of the arc.
+    # A point on a great circle has a zero dot product with its normal, so it counts as straddling (ie, touching intersects).
+    arcs_straddle_segments = (
+            (arc_start_points @ segment_normals.T) *
+            (arc_end_points @ segment_normals.T)) <= 0
+    segments_straddle_arcs = (
+            (segment_start_points @ arc_normals.T) *
+            (segment_end_points @ arc_normals.T)).T <= 0
+    
+    # When both straddle, the two great circles intersect at two antipodal points and each arc (and segment)
+    # contains one of them. They only intersect each other if they contain the *same* one.
+    # Since arcs and segments are shorter than 180 degrees, each is within 90 degrees of the intersection point it contains
+    # (when measured from its midpoint). So their midpoints must both be on the same side of the intersection point.
+    great_circle_intersections = np.cross(arc_normals[:, np.newaxis, :], segment_normals[np.newaxis, :, :])
+    same_intersection = (
+            np.einsum('ijk,ik->ij', great_circle_intersections, arc_start_points + arc_end_points) *
+            np.einsum('ijk,jk->ij', great_circle_intersections, segment_start_points + segment_end_points)) > 0
+    
+    arc_intersections = arcs_straddle_segments & segments_straddle_arcs & same_intersection
+    
+    # If an arc and a segment are on the same great circle (eg, a grid edge along a meridian and a polygon side along the same meridian)
+    # then the cross product of their normals is (near) zero and the above test is meaningless.
+    # Instead they intersect if they overlap along their shared great circle (ie, an end point of one is on the other).
+    arc_normal_lengths = np.linalg.norm(arc_normals, axis=1)
+    segment_normal_lengths = np.linalg.norm(segment_normals, axis=1)
+    normal_lengths = np.outer(arc_normal_lengths, segment_normal_lengths)
+    coplanar_arc_indices, coplanar_segment_indices = np.nonzero(
+            # Exclude zero-length arcs and segments (their normals are zero)...
+            (normal_lengths > 0) &
+            (np.linalg.norm(great_circle_intersections, axis=2) <= _COPLANAR_GREAT_CIRCLES_SINE_ANGLE_THRESHOLD * normal_lengths))
+    if len(coplanar_arc_indices) > 0:
+        coplanar_arc_start_points = arc_start_points[coplanar_arc_indices]
+        coplanar_arc_end_points = arc_end_points[coplanar_arc_indices]
+        coplanar_arc_unit_normals = arc_normals[coplanar_arc_indices] / arc_normal_lengths[coplanar_arc_indices, np.newaxis]
+        coplanar_segment_start_points = segment_start_points[coplanar_segment_indices]
+        coplanar_segment_end_points = segment_end_points[coplanar_segment_indices]
+        coplanar_segment_unit_normals = segment_normals[coplanar_segment_indices] / segment_normal_lengths[coplanar_segment_indices, np.newaxis]
+        
+        # Arcs are shorter than 180 degrees, so if the arc and segment overlap then either the arc contains an end point of
+        # the segment or the segment contains the arc (and hence its end points).
+        arc_intersections[coplanar_arc_indices, coplanar_segment_indices] = (
+                _are_points_on_coplanar_great_circle_arcs(
+                        coplanar_segment_start_points, coplanar_arc_start_points, coplanar_arc_end_points, coplanar_arc_unit_normals) |
+                _are_points_on_coplanar_great_circle_arcs(
+                        coplanar_segment_end_points, coplanar_arc_start_points, coplanar_arc_end_points, coplanar_arc_unit_normals) |
+                _are_points_on_coplanar_great_circle_arcs(
+                        coplanar_arc_start_points, coplanar_segment_start_points, coplanar_segment_end_points, coplanar_segment_unit_normals))
+    
+    return arc_intersections
+
+
+# Arcs and segments whose great circles are within this angle (sine of angle between their planes) are on the same great circle.
+_COPLANAR_GREAT_CIRCLES_SINE_ANGLE_THRESHOLD = 1e-10
+
+
+# Returns a boolean array that is True where each point is on the great circle arc with the same index.
+#
+# Each point is assumed to be on the great circle of its arc (within numerical precision), so it's only on the arc if it's
+# between the arc's start and end points (arcs are shorter than 180 degrees). Points at the arc end points are on the arc.
+def _are_points_on_coplanar_great_circle_arcs(points, arc_start_points, arc_end_points, arc_unit_normals):
+    # Sine of the (signed) angles from the arc start point to each point, and from each point to the arc end point
+    # (measured around the arc normal). Both are non-negative if the point is between the arc end points.
+    sine_angles_from_arc_start_points = np.einsum('ij,ij->i', np.cross(arc_start_points, points), arc_unit_normals)
+    sine_angles_to_arc_end_points = np.einsum('ij,ij->i', np.cross(points, arc_end_points), arc_unit_normals)
+    # Also exclude points *antipodal* to the arc (they also have zero sine angles, but a negative dot product with the arc).
+    return ((sine_angles_from_arc_start_points >= -_COPLANAR_GREAT_CIRCLES_SINE_ANGLE_THRESHOLD) &
+            (sine_angles_to_arc_end_points >= -_COPLANAR_GREAT_CIRCLES_SINE_ANGLE_THRESHOLD) &
+            (np.einsum('ij,ij->i', points, arc_start_points + arc_end_points) > 0))
 
 
 class DistanceGrid(object):
@@ -646,6 +1132,68 @@ class DistanceGrid(object):
             # Multipoints, polylines and polygons use the code below.
             pass
         
+        return self._shortest_distance_using_quad_tree(target_geometry)
+    
+    # Same as 'shortest_distance()' except returns a 2-tuple (distance, lower bound distance) where 'distance' is
+    # only returned if it's guaranteed to equal the shortest distance without a distance threshold (otherwise it's None).
+    #
+    # When 'distance' is None, 'lower bound distance' is a lower bound on the shortest distance without a distance threshold.
+    # This is useful when only distances below some cutoff are needed exactly (and the cutoff is below the distance threshold).
+    # Note that if there is no distance threshold then both distances are equal to the distance returned by 'shortest_distance()'.
+    def shortest_distance_and_lower_bound(self, target_geometry):
+        distance_threshold_radians = self.distance_threshold_radians
+        if distance_threshold_radians is None:
+            distance = self.shortest_distance(target_geometry)
+            return distance, distance
+        
+        # If target geometry is a point then use an optimised path.
+        try:
+            nearest_grid_nodes = self.grid.get_nearest_grid_nodes(target_geometry)
+            
+            sum_weights = 0.0
+            sum_weighted_distances = 0.0
+            min_node_distance = None
+            any_node_outside_obstacles = False
+            any_unreached_node_outside_obstacles = False
+            for distance_node_to_target, node_index in nearest_grid_nodes:
+                node = self.nodes[node_index]
+                if node is not None:
+                    any_node_outside_obstacles = True
+                    if distance_node_to_target == 0.0:
+                        return node.distance_radians, node.distance_radians
+                    weight = 1.0 / distance_node_to_target
+                    sum_weights += weight
+                    sum_weighted_distances += weight * node.distance_radians
+                    if min_node_distance is None or node.distance_radians < min_node_distance:
+                        min_node_distance = node.distance_radians
+                elif self.obstacle_grid.node_is_outside_obstacle_polygons[node_index]:
+                    # Node has no distance, but without a threshold it might have had a distance (exceeding the threshold).
+                    any_node_outside_obstacles = True
+                    any_unreached_node_outside_obstacles = True
+            
+            if any_node_outside_obstacles:
+                if not any_unreached_node_outside_obstacles:
+                    # All weighted nodes are reached, so the smoothed distance is the same as without a threshold.
+                    distance = sum_weighted_distances / sum_weights
+                    return distance, distance
+                # The smoothed distance without a threshold is a weighted average of the reached node distances and
+                # (possibly) the unreached node distances (which exceed the threshold), so it's no less than the smallest of these.
+                if min_node_distance is not None and min_node_distance < distance_threshold_radians:
+                    return None, min_node_distance
+                return None, distance_threshold_radians
+            # else all nearest nodes are inside obstacles so we fall through and use code below...
+            
+        except AttributeError:
+            # Multipoints, polylines and polygons use the code below.
+            pass
+        
+        # Paths via unreached nodes exceed the threshold, so a distance within the threshold is the same as without a threshold.
+        distance = self._shortest_distance_using_quad_tree(target_geometry)
+        if distance is not None and distance <= distance_threshold_radians:
+            return distance, distance
+        return None, distance_threshold_radians
+    
+    def _shortest_distance_using_quad_tree(self, target_geometry):
         # Use a quad tree for efficiency - enables to visit closer groups of nodes first and hence
         # reduce the distance threshold such that the further groups (visited afterwards) are culled.
         node_to_target_infos = []
@@ -699,19 +1247,22 @@ class DistanceGrid(object):
         distance_heap = []
         
         #print('Adding source nodes...')
-        for source in source_geometries:
-            
-            # Find the grid nodes that we will initialise with our source geometries.
-            #
-            # Use a quad tree for efficiency - enables to visit closer groups of nodes first and hence
-            # reduce the distance threshold such that the further groups (visited afterwards) are culled.
-            node_to_source_infos = []
-            self._get_node_to_geometry_distances(
-                    grid.root_quad_tree_nodes,
-                    source,
-                    node_to_source_infos,
-                    # If threshold is None then set it to PI so we have something to compare against...
-                    distance_threshold_radians if distance_threshold_radians is not None else math.pi)
+        
+        # Find the grid nodes that we will initialise with our source geometries.
+        #
+        # Use a single quad tree traversal for all source geometries (rather than one traversal per source geometry).
+        # Each quad tree node carries the list of source geometries that are near it, so that far away source geometries
+        # are culled at the coarsest quad tree level possible (similar to 'ObstacleGrid._init_obstacle_geometries_near_nodes()').
+        source_geometries = list(source_geometries)
+        node_to_source_infos_list = [[] for _ in source_geometries]
+        self._get_node_to_geometries_distances(
+                grid.root_quad_tree_nodes,
+                source_geometries,
+                range(len(source_geometries)),
+                node_to_source_infos_list,
+                self._get_initial_node_to_geometry_distance_thresholds(source_geometries))
+        
+        for node_to_source_infos in node_to_source_infos_list:
             
             if node_to_source_infos:
                 node_to_source_infos.sort()
@@ -739,6 +1290,8 @@ class DistanceGrid(object):
                         nodes[node_index].distance_radians = distance_node_to_source
                         heapq.heappush(distance_heap, (distance_node_to_source, node_index))
         
+        del node_to_source_infos_list  # free memory
+        
         # Keep track of which grid nodes have been processed by Dijkstra's algorithm below.
         processed_nodes = [False] * num_nodes
         
@@ -787,6 +1340,89 @@ class DistanceGrid(object):
                         # and rejecting the second, third, etc, entries.
                         heapq.heappush(distance_heap, (neighbour_distance, neighbour_node_index))
     
+    # Returns a list of initial node-to-geometry distance thresholds (one per geometry) for '_get_node_to_geometries_distances()'.
+    #
+    # Without a good initial threshold a geometry would not be culled from any quad tree node until the traversal first reaches
+    # a grid node near it. So we find an upper bound on the distance from each geometry to its closest grid node outside all
+    # obstacle polygons (using the grid nodes nearest to one of its points) and add the node-to-geometry distance threshold.
+    # This upper bound cannot cull any grid nodes that '_get_node_to_geometry_distances()' would have included.
+    def _get_initial_node_to_geometry_distance_thresholds(self, geometries):
+        grid = self.grid
+        grid_nodes = grid.nodes
+        node_is_outside_obstacle_polygons = self.obstacle_grid.node_is_outside_obstacle_polygons
+        
+        # If threshold is None then set it to PI so we have something to compare against...
+        max_distance_threshold_radians = self.distance_threshold_radians if self.distance_threshold_radians is not None else math.pi
+        
+        distance_thresholds = []
+        for geometry in geometries:
+            distance_threshold_radians = max_distance_threshold_radians
+            
+            # Any point on the geometry will do.
+            try:
+                geometry_point = geometry.get_points()[0]
+            except AttributeError:  # PointOnSphere
+                geometry_point = geometry
+            
+            for _, node_index in grid.get_nearest_grid_nodes(geometry_point):
+                if node_is_outside_obstacle_polygons[node_index]:
+                    distance_node_to_geometry = pygplates.GeometryOnSphere.distance(grid_nodes[node_index].point, geometry)
+                    if distance_node_to_geometry + self._node_to_geometry_distance_threshold < distance_threshold_radians:
+                        distance_threshold_radians = distance_node_to_geometry + self._node_to_geometry_distance_threshold
+            
+            distance_thresholds.append(distance_threshold_radians)
+        
+        return distance_thresholds
+    
+    # Similar to '_get_node_to_geometry_distances()' except finds the node distances to multiple geometries in a single traversal of the quad tree.
+    #
+    # 'node_to_geometry_infos_list' and 'current_distance_thresholds_radians' contain one entry per geometry in 'geometries'
+    # (the latter is reduced as closer grid nodes are found). Only geometries indexed by 'candidate_geometry_indices' are tested.
+    def _get_node_to_geometries_distances(self, quad_tree_nodes, geometries, candidate_geometry_indices, node_to_geometry_infos_list, current_distance_thresholds_radians):
+        for quad_tree_node in quad_tree_nodes:
+            # See which candidate geometries are near the current quad tree node.
+            nearby_geometry_indices = []
+            for geometry_index in candidate_geometry_indices:
+                current_distance_threshold_radians = current_distance_thresholds_radians[geometry_index]
+                distance_geometry_to_quad_tree_node = pygplates.GeometryOnSphere.distance(
+                        quad_tree_node.bounding_polygon,
+                        geometries[geometry_index],
+                        current_distance_threshold_radians,
+                        geometry1_is_solid = True)
+                if (distance_geometry_to_quad_tree_node is not None and
+                    distance_geometry_to_quad_tree_node < current_distance_threshold_radians):
+                    nearby_geometry_indices.append(geometry_index)
+            
+            # If quad tree node is not near any geometries then there's nothing to do for its grid nodes.
+            if not nearby_geometry_indices:
+                continue
+            
+            # Visit child nodes (if internal node) or test each grid point (if leaf node).
+            if quad_tree_node.child_quad_tree_nodes:
+                self._get_node_to_geometries_distances(
+                        quad_tree_node.child_quad_tree_nodes, geometries, nearby_geometry_indices,
+                        node_to_geometry_infos_list, current_distance_thresholds_radians)
+            else:
+                grid_nodes = self.grid.nodes
+                node_to_geometry_distance_threshold = self._node_to_geometry_distance_threshold
+                node_is_outside_obstacle_polygons = self.obstacle_grid.node_is_outside_obstacle_polygons
+                for node_index in quad_tree_node.grid_node_indices:
+                    if node_is_outside_obstacle_polygons[node_index]:
+                        node_point = grid_nodes[node_index].point
+                        for geometry_index in nearby_geometry_indices:
+                            current_distance_threshold_radians = current_distance_thresholds_radians[geometry_index]
+                            distance_node_to_geometry = pygplates.GeometryOnSphere.distance(
+                                    node_point,
+                                    geometries[geometry_index],
+                                    current_distance_threshold_radians)
+                            
+                            if distance_node_to_geometry is not None:
+                                # Reduce the distance threshold if possible, so we can converge quicker.
+                                if distance_node_to_geometry + node_to_geometry_distance_threshold < current_distance_threshold_radians:
+                                    current_distance_thresholds_radians[geometry_index] = distance_node_to_geometry + node_to_geometry_distance_threshold
+                                
+                                node_to_geometry_infos_list[geometry_index].append((distance_node_to_geometry, node_index))
+    
     def _get_node_to_geometry_distances(self, quad_tree_nodes, geometry, node_to_geometry_infos, current_distance_threshold_radians):
         # Sort quad tree nodes by distance.
         # This makes it very quick to converge on the minimum distance and means we can skip